@@ -11,8 +11,14 @@ import time
 import base64
 import sqlite3
 import hashlib
+import hmac
+import csv
+import io
+import atexit
+import threading
 from pathlib import Path
 from contextlib import contextmanager
+from concurrent.futures import TimeoutError as FutureTimeout
 from urllib.parse import urlencode
 import sys
 import traceback
@@ -20,19 +26,42 @@ import traceback
 # Third-party
 from flask import (
     Flask, render_template, request, jsonify, redirect,
-    url_for, session, send_from_directory, Response
+    url_for, session, send_from_directory, Response,
+    stream_with_context, g, has_request_context
 )
-import requests
-import stripe
-import yaml
 from jinja2 import TemplateNotFound
 
+from utils.avatars import AvatarManifest, DEFAULT_AVATAR_SIZE
+from utils.cache import TTLCache, MISS
+from utils.context import ContextBuilder, lead_summary
+from utils.conv_store import make_conv_store
+from utils.guardrails import GuardrailEngine, engine_for_pack
+from utils.lead import LeadState, client_lead_fields
+from utils.lead_ingest import LeadIngest
+from utils.lead_store import EXPORT_COLUMNS, decode_cursor, encode_cursor, fetch_page, iter_leads
+from utils.lead_ledger import LeadLedger
+from utils.llm_client import get_client
+from utils.metrics import Metrics, request_id_from
+from utils.outbox import MailOutbox, MAILJET_SEND_URL
+from utils.packs import PackRegistry
+from utils.provisioning import BotImporter
+from utils.qualification import QualificationFlow, flow_for_pack
+from utils.response_cache import ResponseCache
+from utils.singleflight import SingleFlight, StillRunning, turn_key
+
 # --- Gestion globale des exceptions non interceptées (log) ---
 sys.excepthook = lambda t, v, tb: traceback.print_exception(t, v, tb)
 
+# Démarrage à froid (Vercel / Lambda) : schéma SQLite créé à la première connexion,
+# packs et parcours chargés au premier usage. Stripe, requests (et PyYAML en dev) sont
+# toujours importés au premier usage.
+SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_VERSION"))
+LAZY_STARTUP = os.getenv("LAZY_STARTUP", "1" if SERVERLESS else "0") == "1"
+
 # ==== APP FLASK ====
 app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
+DEFAULT_SECRET_KEY = "dev-secret-change-me"
+app.secret_key = os.getenv("FLASK_SECRET_KEY", DEFAULT_SECRET_KEY)
 
 # ---- Cookies / sécurité iframe ----
 SESSION_SECURE = os.getenv("SESSION_SECURE", "true").lower() == "true"
@@ -42,12 +71,16 @@ app.config.update(
 )
 
 # ---- Config LLM / Stripe / Mailjet / Base ----
-TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY", "").strip()
-TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
-LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo").strip()
-LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "180"))
+# Client Together partagé (TOGETHER_API_KEY, LLM_MODEL, LLM_MAX_TOKENS, LLM_DEADLINE, LLM_BREAKER_*)
+LLM = get_client()
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "").strip()
+# Durées par étape, tentatives LLM, caches et file d'emails => /metrics (METRICS_ENABLED=false : désactivé).
+# Détail [TIMING] par requête au niveau debug du logger Flask seulement.
+METRICS = Metrics(enabled=os.getenv("METRICS_ENABLED", "true").lower() == "true", log=app.logger.debug)
+if METRICS.enabled:
+    LLM.observer = METRICS.observe_llm
+
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "").strip()
 PRICE_ID = os.getenv("STRIPE_PRICE_ID", "").strip()
 
 BASE_URL = (os.getenv("BASE_URL", "http://127.0.0.1:5000")).rstrip("/")
@@ -56,6 +89,7 @@ MJ_API_KEY    = os.getenv("MJ_API_KEY", "").strip()
 MJ_API_SECRET = os.getenv("MJ_API_SECRET", "").strip()
 MJ_FROM_EMAIL = os.getenv("MJ_FROM_EMAIL", "no-reply@spectramedia.online").strip()
 MJ_FROM_NAME  = os.getenv("MJ_FROM_NAME", "Spectra Media AI").strip()
+MJ_API_URL    = os.getenv("MJ_API_URL", MAILJET_SEND_URL).strip()
 
 # ➕ Nouveaux env pour routage des leads en démo
 DEMO_LEAD_EMAIL = os.getenv("DEMO_LEAD_EMAIL", "").strip()
@@ -68,8 +102,7 @@ def pick_db_path() -> Path:
     if env_forced:
         p = Path(env_forced)
     else:
-        is_serverless = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_VERSION"))
-        p = Path("/tmp/bots.db") if is_serverless else Path("data/app.db")
+        p = Path("/tmp/bots.db") if SERVERLESS else Path("data/app.db")
     try:
         p.parent.mkdir(parents=True, exist_ok=True)
     except Exception:
@@ -78,65 +111,175 @@ def pick_db_path() -> Path:
 
 DB_PATH = pick_db_path()
 
+# Une connexion persistante par thread (et par process, pour survivre à un fork) :
+# les PRAGMA ne sont exécutés qu'une fois et le cache de requêtes préparées est conservé.
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA busy_timeout=5000;",
+    "PRAGMA temp_store=MEMORY;",
+    f"PRAGMA cache_size=-{int(os.getenv('DB_CACHE_KB', '16384'))};",
+    f"PRAGMA mmap_size={int(os.getenv('DB_MMAP_BYTES', str(64 * 1024 * 1024)))};",
+)
+_db_local = threading.local()
+
+def _db_open() -> sqlite3.Connection:
+    con = sqlite3.connect(str(DB_PATH), check_same_thread=False, cached_statements=256)
+    con.row_factory = sqlite3.Row
+    for pragma in DB_PRAGMAS:
+        con.execute(pragma)
+    return con
+
 @contextmanager
 def db_connect():
-    con = sqlite3.connect(str(DB_PATH), check_same_thread=False)
-    con.row_factory = sqlite3.Row
+    con = getattr(_db_local, "con", None)
+    if con is None or getattr(_db_local, "pid", None) != os.getpid():
+        con = _db_local.con = _db_open()
+        _db_local.pid = os.getpid()
+        if LAZY_STARTUP:
+            _db_ensure_schema(con)
     try:
-        con.execute("PRAGMA journal_mode=WAL;")
         yield con
-    finally:
-        con.close()
+    except Exception:
+        if con.in_transaction:
+            con.rollback()
+        raise
+
+# File d'attente des e-mails (Mailjet), vidée par un thread de fond ; en serverless,
+# vidée dans la requête qui met en file (l'instance est gelée après la réponse)
+OUTBOX = MailOutbox(
+    db_connect,
+    auth=(MJ_API_KEY, MJ_API_SECRET),
+    url=MJ_API_URL,
+    batch_size=int(os.getenv("MJ_BATCH_SIZE", "50")),
+    max_attempts=int(os.getenv("MJ_MAX_ATTEMPTS", "6")),
+    inline=SERVERLESS,
+)
+# Leads déjà transmis (un email par lead, mises à jour regroupées en digest différé)
+LEADS = LeadLedger(db_connect, OUTBOX, digest_delay=float(os.getenv("LEAD_DIGEST_DELAY", "900")))
+# Table `leads` (chat + embed) : écrite par lots, une transaction par lot ;
+# en serverless, écrite dans la requête (ni thread ni atexit fiables sur une instance gelée)
+LEAD_INGEST = LeadIngest(
+    db_connect,
+    batch_size=int(os.getenv("LEAD_INGEST_BATCH", "200")),
+    flush_interval=float(os.getenv("LEAD_INGEST_INTERVAL", "0.5")),
+    max_queue=int(os.getenv("LEAD_INGEST_MAX_QUEUE", "10000")),
+    sync=SERVERLESS,
+)
+atexit.register(LEAD_INGEST.stop)
+# /api/lead ne répond qu'une fois le lead commité (attente max du lot, en secondes)
+LEAD_WRITE_WAIT = float(os.getenv("LEAD_WRITE_WAIT", "5"))
+
+# ==== Mémoire conversations ====
+# CONV_STORE = memory (défaut, par process) | sqlite (partagé entre workers) | redis (REDIS_URL) | local
+CONVS = make_conv_store(
+    os.getenv("CONV_STORE", "memory"),
+    connect=db_connect,
+    url=os.getenv("REDIS_URL", ""),
+    max_items=int(os.getenv("CONV_MAX_ITEMS", "5000")),
+    max_bytes=int(os.getenv("CONV_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl=float(os.getenv("CONV_TTL", str(6 * 3600))),
+)
+
+def _db_create_schema(con):
+    OUTBOX.init_db(con)
+    LEADS.init_db(con)
+    LEAD_INGEST.init_db(con)
+    CONVS.init_db(con)
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS bots (
+        public_id    TEXT PRIMARY KEY,
+        bot_key      TEXT NOT NULL,
+        pack         TEXT NOT NULL,
+        name         TEXT,
+        color        TEXT,
+        avatar_file  TEXT,
+        greeting     TEXT,
+        buyer_email  TEXT,
+        owner_name   TEXT,
+        profile_json TEXT
+    )
+    """)
+    con.commit()
+
+_db_schema_pid = None
+_db_schema_lock = threading.Lock()
+
+def _db_ensure_schema(con):
+    """Mode LAZY_STARTUP : DDL exécutées une fois par process, à la première connexion."""
+    global _db_schema_pid
+    with _db_schema_lock:
+        if _db_schema_pid != os.getpid():
+            _db_create_schema(con)
+            _db_schema_pid = os.getpid()
 
 def db_init():
     with db_connect() as con:
-        con.execute("""
-        CREATE TABLE IF NOT EXISTS bots (
-            public_id    TEXT PRIMARY KEY,
-            bot_key      TEXT NOT NULL,
-            pack         TEXT NOT NULL,
-            name         TEXT,
-            color        TEXT,
-            avatar_file  TEXT,
-            greeting     TEXT,
-            buyer_email  TEXT,
-            owner_name   TEXT,
-            profile_json TEXT
-        )
-        """)
-        con.commit()
+        _db_create_schema(con)
+
+# Cache des bots résolus (profil déjà décodé), avec cache négatif pour les ids inconnus
+BOT_CACHE = TTLCache(
+    max_items=int(os.getenv("BOT_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("BOT_CACHE_TTL", "60")),
+    negative_ttl=float(os.getenv("BOT_CACHE_NEGATIVE_TTL", "30")),
+)
+
+BOT_UPSERT_SQL = """
+INSERT INTO bots(public_id, bot_key, pack, name, color, avatar_file, greeting, buyer_email, owner_name, profile_json)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(public_id) DO UPDATE SET
+  pack=excluded.pack,
+  name=excluded.name,
+  color=excluded.color,
+  avatar_file=excluded.avatar_file,
+  greeting=excluded.greeting,
+  buyer_email=excluded.buyer_email,
+  owner_name=excluded.owner_name,
+  profile_json=excluded.profile_json
+"""
+
+def _bot_params(bot: dict) -> tuple:
+    return (
+        bot.get("public_id"),
+        bot.get("bot_key"),
+        bot.get("pack"),
+        bot.get("name"),
+        bot.get("color"),
+        bot.get("avatar_file"),
+        bot.get("greeting"),
+        bot.get("buyer_email"),
+        bot.get("owner_name"),
+        json.dumps(bot.get("profile") or {}, ensure_ascii=False)
+    )
 
 def db_upsert_bot(bot: dict):
     with db_connect() as con:
-        con.execute("""
-        INSERT INTO bots(public_id, bot_key, pack, name, color, avatar_file, greeting, buyer_email, owner_name, profile_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(public_id) DO UPDATE SET
-          pack=excluded.pack,
-          name=excluded.name,
-          color=excluded.color,
-          avatar_file=excluded.avatar_file,
-          greeting=excluded.greeting,
-          buyer_email=excluded.buyer_email,
-          owner_name=excluded.owner_name,
-          profile_json=excluded.profile_json
-        """, (
-            bot.get("public_id"),
-            bot.get("bot_key"),
-            bot.get("pack"),
-            bot.get("name"),
-            bot.get("color"),
-            bot.get("avatar_file"),
-            bot.get("greeting"),
-            bot.get("buyer_email"),
-            bot.get("owner_name"),
-            json.dumps(bot.get("profile") or {}, ensure_ascii=False)
-        ))
+        con.execute(BOT_UPSERT_SQL, _bot_params(bot))
+        con.commit()
+    # Les autres workers voient la modification au plus tard après BOT_CACHE_TTL
+    BOT_CACHE.delete(bot.get("public_id"))
+
+def db_upsert_bots(bots: list[dict]) -> int:
+    """Import en masse : un seul executemany, une seule transaction (un seul fsync)."""
+    with db_connect() as con:
+        con.executemany(BOT_UPSERT_SQL, [_bot_params(b) for b in bots])
         con.commit()
+    for b in bots:
+        BOT_CACHE.delete(b.get("public_id"))
+    return len(bots)
 
 def db_get_bot(public_id: str):
     if not public_id:
         return None
+    bot = BOT_CACHE.get(public_id)
+    if bot is MISS:
+        bot = _db_fetch_bot(public_id)
+        BOT_CACHE.set(public_id, bot)
+    if bot is None:
+        return None
+    return {**bot, "profile": dict(bot.get("profile") or {})}
+
+def _db_fetch_bot(public_id: str):
     with db_connect() as con:
         row = con.execute("SELECT * FROM bots WHERE public_id = ? LIMIT 1", (public_id,)).fetchone()
     if not row:
@@ -150,7 +293,8 @@ def db_get_bot(public_id: str):
             d["profile"] = {}
     return d
 
-db_init()
+if not LAZY_STARTUP:
+    db_init()
 
 # ==== Favicons & manifest (anti 404->500) ====
 @app.route("/favicon.ico")
@@ -189,9 +333,38 @@ def site_manifest():
     return jsonify({"name":"Betty Bots","short_name":"Betty","icons":[]}), 200
 
 # ==== Helpers ====
-def static_url(filename: str) -> str:
+AVATARS = AvatarManifest(os.path.join(app.root_path, "static"))
+
+def static_url(filename: str, size: int = DEFAULT_AVATAR_SIZE) -> str:
+    """URL statique ; pour un avatar, la variante redimensionnée adaptée à l'en-tête Accept."""
+    if has_request_context():
+        variant = AVATARS.variant(filename, request.headers.get("Accept", ""), size)
+        if variant:
+            g.vary_accept = True
+            return url_for("static", filename=variant)
     return url_for("static", filename=filename)
 
+def current_request_id() -> str:
+    """Identifiant de la requête (en-tête X-Request-ID entrant, sinon généré), renvoyé dans la réponse."""
+    rid = g.get("request_id")
+    if rid is None:
+        rid = g.request_id = request_id_from(request.headers.get("X-Request-ID"))
+    return rid
+
+@app.after_request
+def _request_id_header(resp):
+    resp.headers["X-Request-ID"] = current_request_id()
+    return resp
+
+@app.after_request
+def _cache_headers(resp):
+    # Variantes d'avatars : nom contenant un hash du contenu => cache immuable
+    if request.path.startswith("/static/avatars/") and resp.status_code in (200, 304):
+        resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    if g.get("vary_accept"):
+        resp.vary.add("Accept")
+    return resp
+
 def parse_contact_info(raw: str) -> dict:
     raw = (raw or "").strip()
     if not raw:
@@ -220,19 +393,24 @@ def build_business_block(profile: dict) -> str:
     lines.append("---\n")
     return "\n".join(lines)
 
-def build_system_prompt(pack_name: str, profile: dict, greeting: str = "") -> str:
-    path = f"data/packs/{pack_name}.yaml"
-    base = (
-        "Tu es l'assistante AI du professionnel. Ta mission prioritaire est de QUALIFIER TRÈS VITE "
-        "(2 échanges maximum avant de demander les coordonnées), puis de proposer un rappel."
-    )
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                data = yaml.safe_load(f) or {}
-            base = data.get("prompt", base)
-        except Exception:
-            pass
+# ==== Packs métier (bundle précompilé ; en dev, YAML rechargés s'ils changent) ====
+# `python app.py` ou FLASK_DEBUG=1 : lecture directe des YAML (PACKS_DEV=0/1 pour forcer)
+PACKS_DEV = os.getenv("PACKS_DEV", "1" if __name__ == "__main__" or os.getenv("FLASK_DEBUG") == "1" else "0") == "1"
+PACKS = PackRegistry(
+    os.path.join(app.root_path, "data", "packs"),
+    bundle_path=os.path.join(app.root_path, "data", "packs.bundle.json"),
+    dev=PACKS_DEV,
+)
+if not LAZY_STARTUP:
+    PACKS.load_all()
+
+DEFAULT_PACK_PROMPT = (
+    "Tu es l'assistante AI du professionnel. Ta mission prioritaire est de QUALIFIER TRÈS VITE "
+    "(2 échanges maximum avant de demander les coordonnées), puis de proposer un rappel."
+)
+
+def _render_system_prompt(pack_data: dict | None, profile: dict, greeting: str = "") -> str:
+    base = (pack_data or {}).get("prompt", DEFAULT_PACK_PROMPT)
     biz  = build_business_block(profile)
     guide = """
 RÈGLES OBLIGATOIRES (communes à TOUS les métiers) :
@@ -256,124 +434,113 @@ RAPPEL :
     greet = f"\nMessage d'accueil recommandé : {greeting}\n" if greeting else ""
     return f"{base}\n{biz}\n{guide}\n{greet}"
 
+def build_system_prompt(pack_name: str, profile: dict, greeting: str = "") -> str:
+    return PACKS.system_prompt(pack_name, profile, greeting, _render_system_prompt)
+
 # ==== LLM ====
-def call_llm_with_history(system_prompt: str, history: list, user_input: str) -> str:
-    if not TOGETHER_API_KEY:
-        return ""
-    headers = {"Authorization": f"Bearer {TOGETHER_API_KEY}", "Content-Type": "application/json"}
-    messages = [{"role": "system", "content": system_prompt}]
-    messages.extend(history or [])
-    messages.append({"role": "user", "content": user_input})
-    payload = {
-        "model": LLM_MODEL,
-        "max_tokens": LLM_MAX_TOKENS,
-        "temperature": 0.3,
-        "messages": messages
-    }
-    backoffs = [0.4, 0.8, 1.6]
+# Réponses LLM déjà produites pour les questions fréquentes de la démo (bots achetés : scriptés)
+RESPONSES = ResponseCache(
+    max_items=int(os.getenv("RESPONSE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", str(6 * 3600))),
+    similarity=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.8")),
+)
 
-    last_err_text = None
-    for wait in backoffs:
-        try:
-            r = requests.post(TOGETHER_API_URL, headers=headers, json=payload, timeout=30)
-            if r.ok:
-                data = r.json()
-                content = (data.get("choices", [{}])[0].get("message", {}).get("content", "")).strip()
-                if content:
-                    return content
-                last_err_text = "Réponse vide du modèle."
-            else:
-                try:
-                    err = r.json()
-                    last_err_text = f"{err.get('error',{}).get('message') or err}"
-                except Exception:
-                    last_err_text = f"HTTP {r.status_code}: {r.text[:200]}"
-        except Exception as e:
-            last_err_text = f"{type(e).__name__}: {e}"
-        time.sleep(wait)
-    print("[LLM][Together][FAIL]", last_err_text or "unknown")
-    return ""
+# Fenêtre d'historique bornée en tokens ; les tours plus anciens sont résumés par le lead
+CONTEXT = ContextBuilder(budget=int(os.getenv("LLM_INPUT_BUDGET", "1000")))
+HISTORY_MAX = int(os.getenv("CONV_HISTORY_MAX", "12"))
+
+def call_llm_with_history(system_prompt: str, history: list, user_input: str, summary: str = "") -> str:
+    messages, tokens = CONTEXT.build(system_prompt, history, user_input, summary)
+    t0 = time.perf_counter()
+    text = LLM.complete(messages)
+    print(f"[LLM] entrée ≈{tokens} tokens, {len(messages) - 2}/{len(history or [])} messages d'historique, "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+    return text
+
+def call_llm_stream(system_prompt: str, history: list, user_input: str, summary: str = ""):
+    messages, tokens = CONTEXT.build(system_prompt, history, user_input, summary)
+    print(f"[LLM][STREAM] entrée ≈{tokens} tokens, {len(messages) - 2}/{len(history or [])} messages d'historique")
+    return LLM.stream(messages)
 
 # ==== LEAD JSON helpers ====
 LEAD_TAG_RE = re.compile(
-    r"<\s*LEAD_?JSON\s*>\s*(\{.*?\})\s*</\s*LEAD_?JSON\s*>",
+    r"<\s*LEAD_?JSON\s*>(.*?)</\s*LEAD_?JSON\s*>",
     re.IGNORECASE | re.DOTALL
 )
 
 def extract_lead_json(text: str):
-    """Renvoie (message_sans_balises, lead_dict_ou_None). Prend la DERNIÈRE balise."""
+    """
+    Renvoie (message_sans_balises, lead_dict_ou_None). Prend la DERNIÈRE balise.
+    Un seul passage : les balises sont retirées et la dernière est décodée au vol.
+    """
     if not text:
         return text, None
-    matches = list(LEAD_TAG_RE.finditer(text))
+    pieces, last, lead_raw = [], 0, None
+    for m in LEAD_TAG_RE.finditer(text):
+        pieces.append(text[last:m.start()])
+        last = m.end()
+        lead_raw = m.group(1)
+    if lead_raw is None:
+        return text.strip(), None
+    pieces.append(text[last:])
     lead = None
-    if matches:
-        m = matches[-1]
-        lead_raw = (m.group(1) or "").strip()
-        try:
-            lead = json.loads(lead_raw)
-        except Exception:
-            lead = None
-        text = LEAD_TAG_RE.sub("", text)
-    return (text or "").strip(), lead
+    try:
+        lead = json.loads(lead_raw.strip())
+    except Exception:
+        lead = None
+    if not isinstance(lead, dict):
+        lead = None
+    return "".join(pieces).strip(), lead
 
-def _lead_from_history(history: list) -> dict:
+class LeadTagFilter:
     """
-    Extraction robuste à partir de l'historique utilisateur (LLM + texte brut).
-    Tolère : MAJUSCULES, tirets, apostrophes, 'nom prénom' sans intro, etc.
-    Ne dépend plus du 'dernier message' pour le nom : fouille tout l'historique.
+    Filtre incrémental pour le streaming : laisse passer le texte mais masque
+    la balise <LEAD_JSON>…</LEAD_JSON> (et tout ce qui suit), même coupée entre deux fragments.
     """
-    user_msgs = [ (m.get("content") or "").strip() for m in history if m.get("role") == "user" ]
-    user_text = " ".join(user_msgs)
-    d = {"reason": "", "email": "", "phone": "", "name": "", "availability": "", "stage": "collecting"}
-
-    if not user_msgs:
-        return d
-
-    # Email — premier match trouvé dans tout l'historique (on lit depuis la fin)
-    m_email = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', user_text, flags=re.I)
-    if m_email:
-        d["email"] = m_email.group(0)
-
-    # Téléphone — simple mais tolérant (on normalise en enlevant espaces/().-)
-    m_phone = re.search(r'(\+?\d[\d \.\-\(\)]{6,})', user_text)
-    if m_phone:
-        d["phone"] = re.sub(r'[^0-9\+]', '', m_phone.group(1)).strip()
-
-    # Nom — 1) formulations explicites
-    m_name = re.search(r"(?:je m(?:'|e)appelle|nom\s*:?)\s*([A-Za-zÀ-ÖØ-öø-ÿ'\-\s]{2,80})", user_text, re.I)
-    if m_name:
-        d["name"] = m_name.group(1).strip()
-
-    # Nom — 2) fallback robuste : balaye l'historique à l'envers et prend
-    # le PREMIER message "propre" comportant 2 à 3 tokens alphabétiques (pas de chiffres, pas d'@)
-    if not d["name"]:
-        for msg in reversed(user_msgs):
-            txt = msg.strip()
-            if not txt or '@' in txt or re.search(r'\d', txt):
-                continue
-            # uniquement lettres/accent/apostrophes/tirets/espaces, et longueur raisonnable
-            if not re.fullmatch(r"[A-Za-zÀ-ÖØ-öø-ÿ' \-]{3,80}", txt):
-                continue
-            tokens = [t for t in re.split(r"\s+", txt) if t]
-            if 2 <= len(tokens) <= 3:
-                # Évite des faux positifs super génériques (ex: "bonjour", "oui merci")
-                lower = txt.lower()
-                if any(w in lower for w in ["bonjour", "bonsoir", "merci", "svp", "rdv", "rendez", "appel", "mail"]):
-                    continue
-                d["name"] = " ".join(t.capitalize() for t in tokens)
+    _TAGS = ("LEAD_JSON", "LEADJSON")
+
+    def __init__(self):
+        self.pending = ""
+        self.closed = False
+
+    def _maybe_tag(self, s: str) -> bool | None:
+        """True = balise certaine, None = encore ambigu, False = pas une balise."""
+        rest = s[1:].lstrip().upper()
+        if any(rest.startswith(t) for t in self._TAGS):
+            return True
+        if any(t.startswith(rest) for t in self._TAGS):
+            return None
+        return False
+
+    def feed(self, delta: str) -> str:
+        if self.closed:
+            return ""
+        buf = self.pending + delta
+        self.pending = ""
+        out = []
+        while buf:
+            i = buf.find("<")
+            if i < 0:
+                out.append(buf)
                 break
+            out.append(buf[:i])
+            verdict = self._maybe_tag(buf[i:])
+            if verdict is True:
+                self.closed = True
+                break
+            if verdict is None:
+                self.pending = buf[i:]
+                break
+            out.append("<")
+            buf = buf[i + 1:]
+        return "".join(out)
 
-    # Motif / disponibilité (indicatif)
-    m_reason = re.search(r'(?:souhaite|veux|voudrais|besoin|motif|pour)\s*:?(.{5,140})', user_text, re.I)
-    if m_reason:
-        d["reason"] = m_reason.group(1).strip()
-    m_avail = re.search(r'(demain|matin|après-midi|soir|lundi|mardi|mercredi|jeudi|vendredi)[^\.!?]{0,60}', user_text, re.I)
-    if m_avail:
-        d["availability"] = m_avail.group(0).strip()
-
-    if d["phone"] and d["name"] and d["email"]:
-        d["stage"] = "ready"
-    return d
+def _lead_from_history(history: list, pack: str = "") -> dict:
+    """
+    Extraction complète à partir de l'historique utilisateur (rejoue LeadState).
+    Le chemin chaud (/api/bettybot) utilise plutôt l'état sauvegardé avec la conversation.
+    """
+    return LeadState.from_history(history).as_lead(qualification_for(pack))
 
 # Limitation à 1 question / 2 phrases
 SENT_SPLIT_RE = re.compile(r"(?<=[\.\!\?])\s+")
@@ -390,17 +557,37 @@ def enforce_single_question(text: str, max_sentences: int = 2) -> str:
     return text
 
 # ==== Intent & consentement ====
-INTENT_RDV_RE = re.compile(r"\b(rendez[- ]?vous|rdv|prise? (de )?rendez[- ]?vous|prendre un rdv|booking|appointment)\b", re.I)
-CONSENT_RE    = re.compile(r"\b(oui|ok|okay|yes|si|d['’ ]?accord|vas[- ]?y|go|let.?s go|ça marche|ca marche)\b", re.I)
-
-def guardrailed_reply(history: list, user_input: str, llm_text: str, pack: str) -> tuple[str, dict, bool, str]:
+# Motifs compilés une fois (utils/guardrails.py), enrichissables par pack via la clé YAML `guardrails`
+def guardrails_for(pack: str) -> GuardrailEngine:
+    return engine_for_pack(pack, PACKS.get(pack))
+
+def qualification_for(pack: str) -> QualificationFlow:
+    """Parcours de qualification du pack (mandatory_fields / questions du YAML)."""
+    return flow_for_pack(pack, PACKS.get(pack))
+
+# Parcours compilés une fois au démarrage (recompilés si le YAML du pack change)
+if not LAZY_STARTUP:
+    for _pack_name in PACKS.names():
+        qualification_for(_pack_name)
+
+def _history_has_intent(engine: GuardrailEngine, history: list) -> bool:
+    return any("intent_rdv" in engine.scan(m.get("content") or "")
+               for m in history if m.get("role") in ("user", "assistant"))
+
+def guardrailed_reply(history: list, user_input: str, llm_text: str, pack: str,
+                      lead: dict | None = None, signals: set | None = None,
+                      intent_seen: bool | None = None) -> tuple[str, dict, bool, str]:
     """
     Retourne (response_text, lead_dict, should_send_now, stage)
-    Séquence déterministe : Nom -> Téléphone -> Email (+ consentement optionnel).
+    Séquence déterministe du parcours du pack (défaut : Nom -> Téléphone -> Email)
+    + consentement optionnel.
     Envoi autorisé si stage=ready OU consentement explicite avec au moins 1 info utile.
+    `signals` = motifs trouvés dans le message courant ; `intent_seen` = intention RDV
+    déjà exprimée plus tôt (sinon on rescanne l'historique).
     """
     augmented_history = history + ([{"role":"user","content": user_input}] if user_input else [])
-    lead = _lead_from_history(augmented_history)
+    if lead is None:
+        lead = _lead_from_history(augmented_history, pack)
 
     # 1) Premier tour : ouverture imposée
     if len(history) == 0:
@@ -408,15 +595,16 @@ def guardrailed_reply(history: list, user_input: str, llm_text: str, pack: str)
         return enforce_single_question(msg), lead, False, "collecting"
 
     # 2) Intent & consent
-    INTENT_RDV_RE = re.compile(r"\b(rendez[- ]?vous|rdv|prise? (de )?rendez[- ]?vous|prendre un rdv|booking|appointment)\b", re.I)
-    CONSENT_RE    = re.compile(r"\b(oui|ok|okay|yes|si|d['’ ]?accord|vas[- ]?y|go|let.?s go|ça marche|ca marche)\b", re.I)
-    text_window = " ".join([m["content"] for m in augmented_history if m.get("role") in ("user","assistant")]) or ""
-    intent_rdv  = bool(INTENT_RDV_RE.search(text_window))
-    consent     = bool(CONSENT_RE.search(user_input or ""))
-
-    # 3) Nettoyage texte LLM
+    engine = guardrails_for(pack)
+    if signals is None:
+        signals = engine.scan(user_input or "")
+    if intent_seen is None:
+        intent_seen = _history_has_intent(engine, history)
+    intent_rdv  = intent_seen or "intent_rdv" in signals
+    consent     = "consent" in signals
+
+    # 3) Nettoyage texte LLM (balises retirées en un seul passage)
     response_text_llm, _ = extract_lead_json(llm_text or "")
-    response_text_llm = re.sub(r"<\s*LEAD_?JSON\s*>.*?</\s*LEAD_?JSON\s*>", "", response_text_llm or "", flags=re.DOTALL|re.IGNORECASE).strip()
     must_take_control = intent_rdv or not response_text_llm or (len(response_text_llm) < 6)
 
     # Helper pour enchaîner proprement une question après le texte LLM
@@ -425,50 +613,33 @@ def guardrailed_reply(history: list, user_input: str, llm_text: str, pack: str)
         txt = f"{base} {q}".strip()
         return enforce_single_question(txt)
 
-    # 4) Contrôle (ordre = NOM → TÉLÉPHONE → EMAIL)
+    # 4) Contrôle (ordre = parcours du pack)
+    flow = qualification_for(pack)
     if must_take_control:
-        if not lead["name"]:
-            q = "Pour commencer, quel est votre nom et prénom complets ?"
-            return enforce_single_question(q), lead, consent, "collecting"
-        if not lead["phone"]:
-            q = "Merci. Quel est votre numéro de téléphone ?"
-            return enforce_single_question(q), lead, consent, "collecting"
-        if not lead["email"]:
-            q = "Parfait. Quelle est votre adresse e-mail ?"
-            return enforce_single_question(q), lead, consent, "collecting"
-        ok = "Parfait, je transmets vos coordonnées pour vous proposer un rendez-vous."
-        return enforce_single_question(ok), {**lead, "stage":"ready"}, True, "ready"
+        step = flow.next_step(lead)
+        if step:
+            return enforce_single_question(step[1]), lead, consent, "collecting"
+        return enforce_single_question(flow.done_message), {**lead, "stage":"ready"}, True, "ready"
 
     # 5) Sinon on conserve le LLM mais on impose la prochaine question manquante
-    if not lead["name"]:
-        return enforce_single_question("Pour commencer, quel est votre nom et prénom complets ?"), lead, consent, "collecting"
-    if not lead["phone"]:
-        return enforce_single_question("Merci. Quel est votre numéro de téléphone ?"), lead, consent, "collecting"
-    if not lead["email"]:
-        return enforce_single_question("Parfait. Quelle est votre adresse e-mail ?"), lead, consent, "collecting"
-
-    ok = "Parfait, je transmets vos coordonnées pour vous proposer un rendez-vous."
-    return enforce_single_question(ok), {**lead, "stage":"ready"}, True, "ready"
-
-def rule_based_next_question(pack: str, history: list) -> str:
-    lead = _lead_from_history(history)
-    if not lead["phone"]:
-        msg = "Quel est votre numéro de téléphone ?"
-    elif not lead["name"]:
-        msg = "Quel est votre nom et prénom complets ?"
-    elif not lead["email"]:
-        msg = "Quelle est votre adresse e-mail ?"
+    step = flow.next_step(lead)
+    if step:
+        return enforce_single_question(step[1]), lead, consent, "collecting"
+    return enforce_single_question(flow.done_message), {**lead, "stage":"ready"}, True, "ready"
+
+def rule_based_next_question(pack: str, history: list, lead: dict | None = None) -> str:
+    lead = dict(lead) if lead is not None else _lead_from_history(history, pack)
+    step = qualification_for(pack).next_step(lead)
+    if step:
+        msg = step[1]
     else:
         msg = "Parfait, je transmets vos coordonnées. Vous serez rappelé rapidement."
         lead["stage"] = "ready"
     return f"{msg}\n<LEAD_JSON>{json.dumps(lead, ensure_ascii=False)}</LEAD_JSON>"
 
 # ==== Email lead (Mailjet) ====
-def send_lead_email(to_email: str, lead: dict, bot_name: str = "Betty Bot"):
-    if not (MJ_API_KEY and MJ_API_SECRET and to_email):
-        print("[LEAD][MAILJET] Config manquante ou email vide, email non envoyé.")
-        return
-    subject = f"Nouveau lead qualifié via {bot_name}"
+def lead_email_message(to_email: str, lead: dict, bot_name: str = "Betty Bot", update: bool = False) -> dict:
+    subject = f"Mise à jour d'un lead via {bot_name}" if update else f"Nouveau lead qualifié via {bot_name}"
     text = (
         f"Motif        : {lead.get('reason','')}\n"
         f"Nom          : {lead.get('name','')}\n"
@@ -477,24 +648,37 @@ def send_lead_email(to_email: str, lead: dict, bot_name: str = "Betty Bot"):
         f"Disponibilités : {lead.get('availability','')}\n"
         f"Statut       : {lead.get('stage','')}\n"
     )
-    payload = {
-        "Messages": [{
-            "From": {"Email": MJ_FROM_EMAIL, "Name": MJ_FROM_NAME},
-            "To":   [{"Email": to_email}],
-            "Subject": subject,
-            "TextPart": text
-        }]
+    return {
+        "From": {"Email": MJ_FROM_EMAIL, "Name": MJ_FROM_NAME},
+        "To":   [{"Email": to_email}],
+        "Subject": subject,
+        "TextPart": text
     }
-    try:
-        r = requests.post(
-            "https://api.mailjet.com/v3.1/send",
-            auth=(MJ_API_KEY, MJ_API_SECRET),
-            json=payload,
-            timeout=15
-        )
-        print("[LEAD][MAILJET]", "OK" if r.ok else f"KO {r.status_code} {r.text[:200]}")
-    except Exception as e:
-        print("[LEAD][MAILJET][EXC]", type(e).__name__, e)
+
+def send_lead_email(to_email: str, lead: dict, bot_name: str = "Betty Bot",
+                    public_id: str | None = None, conv_id: str = "") -> str:
+    """
+    Avec `public_id` : passe par le registre des leads (pas de doublon, digest pour les mises à jour).
+    Sans : envoi direct (email de test).
+    """
+    if not (MJ_API_KEY and MJ_API_SECRET and to_email):
+        print("[LEAD][MAILJET] Config manquante ou email vide, email non envoyé.")
+        return "skipped"
+    if public_id is None:
+        OUTBOX.enqueue(lead_email_message(to_email, lead, bot_name), kind="lead")
+        print("[LEAD][MAILJET] Email mis en file.")
+        return "sent"
+    outcome = LEADS.deliver(
+        public_id, lead,
+        lambda data, update: lead_email_message(to_email, data, bot_name, update),
+        fallback_key=conv_id,
+    )
+    print("[LEAD][MAILJET]", {
+        "sent": "Email mis en file.",
+        "duplicate": "Lead déjà transmis, pas d'email.",
+        "digest": "Mise à jour regroupée dans le digest différé.",
+    }[outcome])
+    return outcome
 
 # ⬇⬇⬇ COLLE ICI la nouvelle fonction ⬇⬇⬇
 
@@ -511,6 +695,8 @@ def send_purchase_email(to_email: str, bot: dict):
     name      = bot.get("name") or "Betty Bot"
 
     embed_url = f"{BASE_URL}/chat?public_id={public_id}&embed=1"
+    export_url = leads_export_url(public_id, "csv")
+    export_line = f"- Export de vos leads (CSV) : {export_url}\n" if export_url else ""
 
     iframe_snippet = (
         f'<iframe src="{embed_url}" title="{name}" '
@@ -528,32 +714,22 @@ def send_purchase_email(to_email: str, bot: dict):
         f"- Métier : {pack}\n"
         f"- Nom du bot : {name}\n"
         f"- Code public : {public_id}\n"
-        f"- Lien de test : {embed_url}\n\n"
+        f"- Lien de test : {embed_url}\n"
+        f"{export_line}\n"
         "Pour intégrer Betty sur votre site, copiez/collez ce code HTML :\n\n"
         f"{iframe_snippet}\n\n"
         "À très vite,\n"
         "Spectra Media AI\n"
     )
 
-    payload = {
-        "Messages": [{
-            "From": {"Email": MJ_FROM_EMAIL, "Name": MJ_FROM_NAME},
-            "To":   [{"Email": to_email}],
-            "Subject": subject,
-            "TextPart": text
-        }]
+    message = {
+        "From": {"Email": MJ_FROM_EMAIL, "Name": MJ_FROM_NAME},
+        "To":   [{"Email": to_email}],
+        "Subject": subject,
+        "TextPart": text
     }
-
-    try:
-        r = requests.post(
-            "https://api.mailjet.com/v3.1/send",
-            auth=(MJ_API_KEY, MJ_API_SECRET),
-            json=payload,
-            timeout=15
-        )
-        print("[PURCHASE][MAILJET]", "OK" if r.ok else f"KO {r.status_code} {r.text[:200]}")
-    except Exception as e:
-        print("[PURCHASE][MAILJET][EXC]", type(e).__name__, e)
+    OUTBOX.enqueue(message, kind="purchase")
+    print("[PURCHASE][MAILJET] Email mis en file.")
 
 # ==== Bots en mémoire ====
 BOTS = {
@@ -597,8 +773,38 @@ def find_bot_by_public_id(public_id: str):
     b2 = dict(b); b2["bot_key"] = bot_key; b2["public_id"] = public_id
     return bot_key, b2
 
-# ==== Mémoire conversations ====
-CONVS = {}
+# ==== Import en masse (revendeurs) ====
+# ADMIN_TOKEN vide => route désactivée
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+BOT_IMPORTER = BotImporter(
+    write=db_upsert_bots,
+    parse_contact=parse_contact_info,
+    gen_public_id=_gen_public_id,
+    known_pack=lambda name: PACKS.get(name) is not None,
+    templates=BOTS,
+    max_rows=int(os.getenv("BULK_MAX_ROWS", "10000")),
+)
+
+@app.route("/api/bots/bulk", methods=["POST"])
+def bots_bulk_import():
+    """
+    Corps JSON Lines (défaut) ou CSV (?format=csv ou Content-Type text/csv), une ligne par bot.
+    ?dry_run=1 : validation seule. Réponse : rapport (valides, écrits, erreurs par ligne, débit).
+    """
+    auth = request.headers.get("Authorization", "")
+    token = auth[7:].strip() if auth.startswith("Bearer ") else ""
+    if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+        return jsonify({"error": "unauthorized"}), 401
+    fmt = (request.args.get("format") or "").lower()
+    if not fmt:
+        fmt = "csv" if "csv" in (request.content_type or "") else "jsonl"
+    if fmt not in ("jsonl", "csv"):
+        return jsonify({"error": "format must be jsonl or csv"}), 400
+    data = request.get_data(as_text=True)
+    report = BOT_IMPORTER.run(data, fmt, dry_run=request.args.get("dry_run") in ("1", "true"))
+    app.logger.info(f"[BULK] {report['written']}/{report['received']} bots écrits, "
+                    f"{len(report['errors'])} erreurs, {report['rows_per_s']} lignes/s")
+    return jsonify(report), (200 if report["valid"] or not report["errors"] else 400)
 
 # ==== Pages ====
 @app.get("/api")
@@ -664,6 +870,12 @@ def config_page():
         </form>
         """, 200
 
+def stripe_api():
+    """Module stripe importé au premier paiement (≈0,7 s d'import évité à chaque démarrage à froid)."""
+    import stripe
+    stripe.api_key = STRIPE_SECRET_KEY
+    return stripe
+
 @app.route("/inscription", methods=["GET", "POST"])
 def inscription_page():
     if request.method == "POST":
@@ -696,11 +908,11 @@ def inscription_page():
         }
         db_upsert_bot(bot_db)
 
-        if not stripe.api_key or not PRICE_ID:
+        if not STRIPE_SECRET_KEY or not PRICE_ID:
             return redirect(f"{BASE_URL}/recap?pack={pack}&public_id={public_id}&session_id=fake_checkout_dev", code=303)
 
         try:
-            session_obj = stripe.checkout.Session.create(
+            session_obj = stripe_api().checkout.Session.create(
                 mode="subscription",
                 line_items=[{"price": PRICE_ID, "quantity": 1}],
                 customer_email=email,
@@ -857,35 +1069,7 @@ def chat_page():
         return "<!doctype html><meta charset='utf-8'><h1>Chat</h1><p>Template manquant.</p>", 200
 
 # ==== API bot ====
-@app.route("/api/bettybot", methods=["POST"])
-def bettybot_reply():
-    payload    = request.get_json(force=True, silent=True) or {}
-    user_input = (payload.get("message") or "").strip()
-    public_id  = (payload.get("bot_id") or payload.get("public_id") or "").strip()
-    conv_id    = (payload.get("conv_id") or "").strip()
-
-    if not user_input:
-        return jsonify({"response": "Dites-moi ce dont vous avez besoin 🙂"}), 200
-
-    bot_key, bot = find_bot_by_public_id(public_id)
-    if not bot:
-        bot_key = "avocat-001"
-        bot = BOTS[bot_key]
-
-    # Historique (6 derniers messages)
-    if conv_id:
-        history = CONVS.get(conv_id, [])
-    else:
-        key = f"conv_{public_id or bot_key}"
-        history = session.get(key, [])
-    history = history[-6:]
-
-    # --- Détection mode démo ---
-    demo_mode = (public_id == "spectra-demo")
-
-    # --- Choix du prompt : Demo vs Acheté ---
-    if demo_mode:
-        system_prompt = """
+DEMO_SYSTEM_PROMPT = """
 Tu es Betty, l’assistante virtuelle de Spectra Media AI. Tu es la démo officielle de Betty Bots.
 
 Objectif principal :
@@ -925,22 +1109,105 @@ Important :
 - Quand la personne semble intéressée et t’a donné au moins son e-mail, tu peux conclure par une phrase du type :
   "Parfait, je transmets vos coordonnées à l'équipe Spectra Media pour qu'on vous prépare une démo Betty adaptée à votre activité."
 """
-    else:
-        system_prompt = build_system_prompt(
-            bot.get("pack", "avocat"),
-            bot.get("profile", {}),
-            bot.get("greeting", "") or "Bonjour, qu’est-ce que je peux faire pour vous ?"
-        )
 
-    # --- Appel LLM ---
-    llm_text = call_llm_with_history(
-        system_prompt=system_prompt,
-        history=history,
-        user_input=user_input
-    )
+def _session_conv_id(bot_ref: str) -> str:
+    """Identifiant de conversation serveur dérivé d'un id opaque stocké dans le cookie."""
+    sid = session.get("sid")
+    if not sid:
+        sid = session["sid"] = uuid.uuid4().hex
+    legacy = session.pop(f"conv_{bot_ref}", None)
+    conv_id = f"s:{sid}:{bot_ref}"
+    # Anciens cookies qui contenaient l'historique complet : on le migre côté serveur
+    if isinstance(legacy, list) and legacy:
+        CONVS.set(conv_id, {"history": legacy[-6:]})
+    return conv_id
+
+def _chat_context(payload: dict) -> dict:
+    """Résout bot, historique et prompt système pour un tour de conversation."""
+    user_input = (payload.get("message") or "").strip()
+    public_id  = (payload.get("bot_id") or payload.get("public_id") or "").strip()
+    conv_id    = (payload.get("conv_id") or "").strip()
+    timer = METRICS.timer(current_request_id())
+
+    with timer.stage("bot_lookup"):
+        bot_key, bot = find_bot_by_public_id(public_id)
+    if not bot:
+        bot_key = "avocat-001"
+        bot = BOTS[bot_key]
+
+    # Sans conv_id explicite : le cookie ne porte qu'un identifiant opaque,
+    # l'historique reste côté serveur (taille du cookie constante)
+    if not conv_id:
+        conv_id = _session_conv_id(public_id or bot_key)
+
+    # Historique (borné ; la fenêtre envoyée au LLM est choisie au budget de tokens)
+    # + état du lead sauvegardé avec la conversation
+    with timer.stage("session_read"):
+        record = CONVS.get(conv_id) or {}
+        if isinstance(record, list):  # ancien format : historique seul
+            record = {"history": record}
+        history = list(record.get("history") or [])
+        if record.get("lead") is not None:
+            lead_state = LeadState.from_dict(record["lead"])
+        else:
+            lead_state = LeadState.from_history(history)
+            lead_state.intent_rdv = _history_has_intent(guardrails_for(bot.get("pack", "")), history)
+    history = history[-HISTORY_MAX:]
+
+    # --- Détection mode démo ---
+    demo_mode = (public_id == "spectra-demo")
+
+    # Bot acheté : la réponse est entièrement dictée par le parcours de qualification
+    # (guardrailed_reply n'utilise jamais le texte du LLM) => aucun appel LLM
+    scripted = not demo_mode
 
-    # Fallback si le modèle ne répond pas
-    if not llm_text:
+    # --- Choix du prompt : Demo vs Acheté (aucun prompt à construire pour un tour scripté) ---
+    system_prompt = ""
+    if demo_mode:
+        system_prompt = DEMO_SYSTEM_PROMPT
+    elif not scripted:
+        with timer.stage("prompt"):
+            system_prompt = build_system_prompt(
+                bot.get("pack", "avocat"),
+                bot.get("profile", {}),
+                bot.get("greeting", "") or "Bonjour, qu’est-ce que je peux faire pour vous ?"
+            )
+
+    return {
+        "payload": payload,
+        "user_input": user_input,
+        "public_id": public_id,
+        "conv_id": conv_id,
+        "bot_key": bot_key,
+        "bot": bot,
+        "history": history,
+        "lead_state": lead_state,
+        "demo_mode": demo_mode,
+        "scripted": scripted,
+        "system_prompt": system_prompt,
+        "timer": timer,
+    }
+
+def _chat_finish(ctx: dict, llm_text: str) -> dict:
+    """Garde-fous, persistance de l'historique et envoi du lead. Renvoie le JSON de réponse."""
+    payload    = ctx["payload"]
+    user_input = ctx["user_input"]
+    public_id  = ctx["public_id"]
+    conv_id    = ctx["conv_id"]
+    bot        = ctx["bot"]
+    history    = ctx["history"]
+    demo_mode  = ctx["demo_mode"]
+    timer      = ctx["timer"]
+
+    # Un seul message analysé par tour, quelle que soit la longueur de la conversation
+    with timer.stage("guardrails"):
+        lead_state = ctx["lead_state"].update(user_input)
+        engine = guardrails_for(bot.get("pack", ""))
+        signals = engine.scan(user_input)
+    flow = qualification_for(bot.get("pack", ""))
+
+    # Fallback si le modèle ne répond pas (inutile pour un tour scripté)
+    if not llm_text and not ctx.get("scripted"):
         if demo_mode:
             llm_text = (
                 "Je suis Betty, l’assistante virtuelle de démonstration de Spectra Media AI. "
@@ -950,7 +1217,8 @@ Important :
         else:
             llm_text = rule_based_next_question(
                 bot.get("pack", ""),
-                history + [{"role": "user", "content": user_input}]
+                history + [{"role": "user", "content": user_input}],
+                lead=lead_state.as_lead(flow)
             )
 
     # ======================
@@ -963,7 +1231,7 @@ Important :
 
         # Cas typique : "qui es tu ?"
         if not response_text or len(response_text) < 4:
-            if re.search(r"\b(qui es[- ]?tu|t'es qui|tu es qui)\b", user_input.lower()):
+            if "who_are_you" in signals:
                 response_text = (
                     "Je suis Betty, l’assistante virtuelle de démonstration de Spectra Media AI. "
                     "Je te montre comment un bot peut accueillir tes clients, répondre à leurs questions "
@@ -979,9 +1247,8 @@ Important :
         # On garde les messages courts
         response_text = enforce_single_question(response_text)
 
-        # Extraction légère du lead (nom, email, téléphone…) pour t’envoyer un mail si complet
-        augmented_history = history + [{"role": "user", "content": user_input}]
-        lead = _lead_from_history(augmented_history)
+        # Lead (nom, email, téléphone…) déjà extrait incrémentalement, pour t’envoyer un mail si complet
+        lead = lead_state.as_lead(flow)
         stage = lead.get("stage", "collecting")
         should_send_now = False  # on laisse la condition globale décider
 
@@ -989,26 +1256,33 @@ Important :
         # ======================
         #  MODE BOT ACHETÉ : garde-fous RDV + séquence nom/tel/email
         # ======================
-        response_text, lead, should_send_now, stage = guardrailed_reply(
-            history, user_input, llm_text, bot.get("pack", "")
-        )
+        with timer.stage("guardrails"):
+            response_text, lead, should_send_now, stage = guardrailed_reply(
+                history, user_input, llm_text, bot.get("pack", ""), lead=lead_state.as_lead(flow),
+                signals=signals, intent_seen=lead_state.intent_rdv
+            )
+        # Champ attendu au prochain tour (réponse libre acceptée pour le besoin)
+        step = flow.next_step(lead) if stage != "ready" else None
+        lead_state.asked = step[0] if step and len(history) else ""
+
+    # Intention RDV mémorisée (message utilisateur ou réponse) : plus besoin de rescanner l'historique
+    if not lead_state.intent_rdv:
+        lead_state.intent_rdv = "intent_rdv" in signals or "intent_rdv" in engine.scan(response_text)
 
     # --- Persistance historique ---
     history.append({"role": "user", "content": user_input})
     history.append({"role": "assistant", "content": response_text})
-    if conv_id:
-        CONVS[conv_id] = history
-    else:
-        session[f"conv_{public_id or bot_key}"] = history
+    with timer.stage("session_write"):
+        CONVS.set(conv_id, {"history": history, "lead": lead_state.to_dict()})
 
     # --- Résolution de l'adresse de destination pour les leads ---
     default_fallback = os.getenv("DEFAULT_LEAD_EMAIL", "").strip() or MJ_FROM_EMAIL
     if demo_mode:
         buyer_email_ctx = (DEMO_LEAD_EMAIL or default_fallback)
     else:
+        # `bot` est déjà la ligne DB quand elle existe : pas de second SELECT
         buyer_email_ctx = (
             (payload.get("buyer_email") or "").strip()
-            or ((db_get_bot(public_id) or {}).get("buyer_email") if public_id else "")
             or (bot or {}).get("buyer_email")
             or default_fallback
         )
@@ -1021,108 +1295,510 @@ Important :
         isinstance(lead, dict) and lead.get("reason"),
     ])
 
+    # Prêt = plus aucune étape du parcours du pack (mandatory_fields compilés), pas seulement nom/tel/email
     effective_stage = None
     if isinstance(lead, dict):
-        effective_stage = (
-            "ready" if (lead.get("phone") and lead.get("name") and lead.get("email"))
-            else lead.get("stage", "collecting")
-        )
+        effective_stage = "ready" if flow.next_step(lead) is None else "collecting"
 
     may_send = (
         (effective_stage == "ready")
         or (not demo_mode and should_send_now and have_any_info)
-        or (demo_mode and effective_stage == "ready")
     )
 
     if may_send and isinstance(lead, dict):
+        # Lead conservé en base (export propriétaire), que l'email parte ou non
+        LEAD_INGEST.submit({
+            "public_id": public_id or (bot or {}).get("public_id") or ctx["bot_key"],
+            "conv_id": conv_id,
+            "name": lead.get("name", ""),
+            "email": lead.get("email", ""),
+            "phone": lead.get("phone", ""),
+            "reason": lead.get("reason", ""),
+            "source": "demo" if demo_mode else "chat",
+        })
         if not buyer_email_ctx:
             app.logger.warning(f"[LEAD] buyer_email introuvable pour bot_id={public_id or 'N/A'} ; email non envoyé.")
         else:
             try:
-                send_lead_email(
-                    to_email=buyer_email_ctx,
-                    lead={
-                        "reason": lead.get("reason", ""),
-                        "name": lead.get("name", ""),
-                        "email": lead.get("email", ""),
-                        "phone": lead.get("phone", ""),
-                        "availability": lead.get("availability", ""),
-                        "stage": effective_stage or "ready",
-                    },
-                    bot_name=(bot or {}).get("name") or ("Betty Bot (Démo)" if demo_mode else "Betty Bot"),
-                )
+                with timer.stage("email"):
+                    outcome = send_lead_email(
+                        to_email=buyer_email_ctx,
+                        lead={
+                            "reason": lead.get("reason", ""),
+                            "name": lead.get("name", ""),
+                            "email": lead.get("email", ""),
+                            "phone": lead.get("phone", ""),
+                            "availability": lead.get("availability", ""),
+                            "stage": effective_stage or "ready",
+                        },
+                        bot_name=(bot or {}).get("name") or ("Betty Bot (Démo)" if demo_mode else "Betty Bot"),
+                        public_id=public_id or (bot or {}).get("public_id") or ctx["bot_key"],
+                        conv_id=conv_id,
+                    )
                 if isinstance(lead, dict):
                     lead["stage"] = effective_stage or "ready"
-                app.logger.info(f"[LEAD] Email ({effective_stage or 'ready'}) envoyé à {buyer_email_ctx} pour bot {public_id or ('demo' if demo_mode else 'N/A')}")
+                app.logger.info(f"[LEAD] Email ({effective_stage or 'ready'}, {outcome}) pour {buyer_email_ctx}, bot {public_id or ('demo' if demo_mode else 'N/A')}")
             except Exception as e:
                 app.logger.exception(f"[LEAD] Erreur envoi email -> {e}")
 
-    return jsonify({
+    return {
         "response": response_text,
         "stage": (lead.get("stage") if isinstance(lead, dict) else None)
-    })
-@app.route("/api/embed_meta")
-def embed_meta():
+    }
+
+def _response_cache_key(ctx: dict) -> tuple[str, str] | None:
+    """
+    Clé de la démo si la réponse ne dépend pas de la conversation : premier tour, ou
+    question courte de type FAQ (« vous êtes ouverts le samedi ? »). Les bots achetés
+    sont scriptés (aucun appel LLM), seule la démo passe par le cache.
+    """
+    user_input = ctx["user_input"]
+    if not ctx["demo_mode"] or not RESPONSES.cacheable(user_input):
+        return None
+    if ctx["history"] and not user_input.rstrip().endswith("?"):
+        return None
+    return "demo", ""
+
+def _chat_cache_lookup(ctx: dict) -> tuple[tuple | None, str | None]:
+    """
+    Avant l'appel LLM : (clé de cache, texte déjà connu).
+    Texte "" pour un tour scripté, None quand il faut appeler le modèle.
+    """
+    if ctx["scripted"]:
+        return None, ""
+    key = _response_cache_key(ctx)
+    return key, (RESPONSES.get(*key, ctx["user_input"]) if key else None)
+
+def _chat_cache_store(key: tuple | None, ctx: dict, llm_text: str):
+    if key and llm_text:
+        RESPONSES.set(*key, ctx["user_input"], llm_text)
+
+EMPTY_MESSAGE_REPLY = {"response": "Dites-moi ce dont vous avez besoin 🙂"}
+
+# Double-clic, iframe rechargée… : un même (conversation, message) en cours n'est traité qu'une fois
+TURNS = SingleFlight()
+# Réponses rejouées pour un même en-tête Idempotency-Key (par conversation)
+IDEMPOTENT = TTLCache(
+    max_items=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "600")),
+)
+TURN_WAIT = LLM.deadline + 10
+# Doublon dont le tour de référence dépasse TURN_WAIT : 202, le client renvoie plus tard
+PENDING_TURN_REPLY = {
+    "response": "Je traite encore votre message, renvoyez-le dans un instant.",
+    "stage": None,
+    "pending": True,
+}
+PENDING_RETRY_AFTER = "2"
+
+def _pending_response(body: dict):
+    resp = jsonify(body)
+    resp.status_code = 202
+    resp.headers["Retry-After"] = PENDING_RETRY_AFTER
+    return resp
+
+def _idempotency_key(ctx: dict, header: str | None) -> tuple | None:
+    header = (header or "").strip()[:128]
+    return (ctx["conv_id"], header) if header else None
+
+def _chat_turn(ctx: dict) -> dict:
+    """Un tour complet (cache, LLM, garde-fous, persistance, lead) ; exécuté une seule fois par clé."""
+    timer = ctx["timer"]
+    with timer.stage("cache"):
+        cache_key, llm_text = _chat_cache_lookup(ctx)
+
+    # --- Appel LLM ---
+    if llm_text is None:
+        with timer.stage("llm"):
+            llm_text = call_llm_with_history(
+                system_prompt=ctx["system_prompt"],
+                history=ctx["history"],
+                user_input=ctx["user_input"],
+                summary=lead_summary(ctx["lead_state"].as_lead()),
+            )
+        _chat_cache_store(cache_key, ctx, llm_text)
+    return _chat_finish(ctx, llm_text)
+
+@app.route("/api/bettybot", methods=["POST"])
+def bettybot_reply():
+    payload = request.get_json(force=True, silent=True) or {}
+    if not (payload.get("message") or "").strip():
+        return jsonify(EMPTY_MESSAGE_REPLY), 200
+
+    ctx = _chat_context(payload)
+    idem = _idempotency_key(ctx, request.headers.get("Idempotency-Key"))
+    if idem:
+        stored = IDEMPOTENT.get(idem)
+        if stored is not MISS:
+            ctx["timer"].finish("/api/bettybot")
+            resp = jsonify(stored)
+            resp.headers["Idempotent-Replayed"] = "true"
+            return resp
+
+    try:
+        result = TURNS.do(turn_key(ctx["conv_id"], ctx["user_input"]), lambda: _chat_turn(ctx), timeout=TURN_WAIT)
+    except StillRunning:
+        ctx["timer"].finish("/api/bettybot")
+        return _pending_response(PENDING_TURN_REPLY)
+    if idem:
+        IDEMPOTENT.set(idem, result)
+    ctx["timer"].finish("/api/bettybot")
+    return jsonify(result)
+
+@app.route("/api/chat", methods=["POST"])
+def api_chat():
+    """
+    Endpoint de l'embed (templates/embed.html) : même moteur que /api/bettybot, réponse
+    {"reply", "stage"}. Le lead déjà collecté par le client (nom, prénom, téléphone, email)
+    est repris tel quel ; l'historique de référence reste celui du serveur.
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    if not (payload.get("message") or "").strip():
+        return jsonify({"reply": EMPTY_MESSAGE_REPLY["response"], "stage": None}), 200
+
+    ctx = _chat_context(payload)
+    ctx["lead_state"].seed(client_lead_fields(payload.get("lead")))
+    try:
+        result = TURNS.do(turn_key(ctx["conv_id"], ctx["user_input"]), lambda: _chat_turn(ctx), timeout=TURN_WAIT)
+    except StillRunning:
+        ctx["timer"].finish("/api/chat")
+        return _pending_response({"reply": PENDING_TURN_REPLY["response"], "stage": None, "pending": True})
+    ctx["timer"].finish("/api/chat")
+    return jsonify({"reply": result["response"], "stage": result.get("stage")})
+
+@app.route("/api/lead", methods=["POST"])
+def api_lead():
+    """Lead complet envoyé par l'embed : écrit en base (lot groupé) avant de répondre 201."""
+    payload = request.get_json(force=True, silent=True) or {}
+    email = str(payload.get("email") or "").strip()[:254]
+    phone = str(payload.get("phone") or payload.get("telephone") or "").strip()[:40]
+    if not (email or phone):
+        return jsonify({"ok": False, "error": "missing_contact"}), 400
+    extra = payload.get("extra") if isinstance(payload.get("extra"), dict) else None
+    if extra and len(json.dumps(extra, ensure_ascii=False)) > 2000:
+        extra = None
+    stored = LEAD_INGEST.submit({
+        "public_id": str(payload.get("bot_id") or payload.get("public_id") or "").strip()[:128],
+        "name": str(payload.get("name") or "").strip()[:200],
+        "email": email,
+        "phone": phone,
+        "message": str(payload.get("message") or "").strip()[:2000],
+        "source": "embed",
+        "extra": extra,
+    }, wait=LEAD_WRITE_WAIT)
+    if not stored:
+        return jsonify({"ok": False, "error": "busy"}), 503
+    return jsonify({"ok": True}), 201
+
+# ==== Export des leads (propriétaire du bot) ====
+LEADS_PAGE_MAX = 500
+# Clé des jetons d'export : LEADS_EXPORT_SECRET, sinon FLASK_SECRET_KEY s'il n'a pas sa valeur
+# par défaut (publique : n'importe qui calculerait les jetons). Vide => export désactivé.
+LEADS_EXPORT_SECRET = os.getenv("LEADS_EXPORT_SECRET", "").strip() or (
+    app.secret_key if app.secret_key != DEFAULT_SECRET_KEY else "")
+
+def leads_export_token(public_id: str) -> str:
+    """Jeton d'accès aux leads d'un bot (HMAC de LEADS_EXPORT_SECRET), transmis dans l'email d'achat."""
+    return hmac.new(LEADS_EXPORT_SECRET.encode("utf-8"), f"leads:{public_id}".encode("utf-8"),
+                    hashlib.sha256).hexdigest()[:32]
+
+def leads_export_url(public_id: str, fmt: str = "csv") -> str:
+    """Lien d'export signé, ou "" si l'export est désactivé."""
+    if not LEADS_EXPORT_SECRET:
+        return ""
+    query = urlencode({"public_id": public_id, "format": fmt, "token": leads_export_token(public_id)})
+    return f"{BASE_URL}/api/leads/export?{query}"
+
+def _leads_owner() -> str | None:
+    """public_id demandé si le jeton (Bearer ou ?token=) correspond, sinon None (toujours sans secret)."""
+    if not LEADS_EXPORT_SECRET:
+        return None
     public_id = (request.args.get("public_id") or "").strip()
+    auth = request.headers.get("Authorization", "")
+    token = auth[7:].strip() if auth.startswith("Bearer ") else (request.args.get("token") or "").strip()
+    if public_id and token and hmac.compare_digest(token, leads_export_token(public_id)):
+        return public_id
+    return None
+
+@app.route("/api/leads")
+def leads_page():
+    """Page de leads d'un bot : ?public_id=&token=&limit=&cursor= => {"leads", "next_cursor"}."""
+    public_id = _leads_owner()
     if not public_id:
-        return jsonify({"error": "missing public_id"}), 400
+        return jsonify({"error": "unauthorized"}), 401
+    try:
+        after = decode_cursor(request.args.get("cursor"))
+        limit = max(1, min(LEADS_PAGE_MAX, int(request.args.get("limit") or 100)))
+    except ValueError:
+        return jsonify({"error": "bad_cursor"}), 400
+    with db_connect() as con:
+        leads = fetch_page(con, public_id, after, limit)
+    return jsonify({
+        "leads": leads,
+        "next_cursor": encode_cursor(leads[-1]) if len(leads) == limit else None,
+    })
 
-    _, bot = find_bot_by_public_id(public_id)
-    if not bot:
-        return jsonify({"error": "bot_not_found"}), 404
+@app.route("/api/leads/export")
+def leads_export():
+    """Export complet d'un bot en flux (CSV ou tableau JSON), lu par pages via le curseur (created_at, id)."""
+    public_id = _leads_owner()
+    if not public_id:
+        return jsonify({"error": "unauthorized"}), 401
+    fmt = (request.args.get("format") or "csv").lower()
+    rows = iter_leads(db_connect, public_id)
+    filename = f"leads-{re.sub(r'[^A-Za-z0-9_-]', '', public_id) or 'bot'}.{'json' if fmt == 'json' else 'csv'}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+
+    if fmt == "json":
+        def generate_json():
+            yield "["
+            for i, row in enumerate(rows):
+                yield ("," if i else "") + json.dumps(row, ensure_ascii=False)
+            yield "]\n"
+        return Response(generate_json(), mimetype="application/json", headers=headers)
+
+    def generate_csv():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        for i, row in enumerate(rows, 1):
+            writer.writerow([row[c] for c in EXPORT_COLUMNS])
+            # Envoi par paquets de lignes (~ quelques Ko), mémoire constante
+            if i % 200 == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+    return Response(generate_csv(), mimetype="text/csv", headers=headers)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route("/api/bettybot/stream", methods=["POST"])
+def bettybot_stream():
+    """
+    Variante SSE de /api/bettybot : événements `token` ({"t": ...}) au fil de la génération,
+    puis `done` avec la réponse finale après garde-fous ({"response", "stage"}).
+    Le client doit remplacer le texte streamé par `done.response`.
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    if not (payload.get("message") or "").strip():
+        return jsonify(EMPTY_MESSAGE_REPLY), 200
+    # Le contexte (et l'éventuel cookie `sid`) est résolu avant l'envoi des en-têtes
+    ctx = _chat_context(payload)
+    idem = _idempotency_key(ctx, request.headers.get("Idempotency-Key"))
+    stored = IDEMPOTENT.get(idem) if idem else MISS
+    timer = ctx["timer"]
+
+    def generate():
+        # Rejeu (Idempotency-Key connue) ou doublon d'un tour en cours : seulement `done`
+        if stored is not MISS:
+            timer.finish("/api/bettybot/stream")
+            yield _sse("done", stored)
+            return
+        key = turn_key(ctx["conv_id"], ctx["user_input"])
+        future, leader = TURNS.begin(key)
+        if not leader:
+            try:
+                yield _sse("done", future.result(TURN_WAIT))
+            except FutureTimeout:
+                yield _sse("done", PENDING_TURN_REPLY)
+            except Exception as e:
+                app.logger.exception(f"[STREAM] {e}")
+                yield _sse("done", {"response": "Désolé, pas de réponse", "stage": None})
+            timer.finish("/api/bettybot/stream")
+            return
 
-    return jsonify({
-        "bot_id": public_id,
+        result = {"response": "Désolé, pas de réponse", "stage": None}
+        try:
+            parts = []
+            hide = LeadTagFilter()
+            with timer.stage("cache"):
+                cache_key, cached = _chat_cache_lookup(ctx)
+            if cached is not None:
+                deltas = (cached,) if cached else ()
+            else:
+                deltas = call_llm_stream(ctx["system_prompt"], ctx["history"], ctx["user_input"],
+                                         lead_summary(ctx["lead_state"].as_lead()))
+            # Durée du flux complet (génération + envoi au client)
+            with timer.stage("llm"):
+                for delta in deltas:
+                    parts.append(delta)
+                    visible = hide.feed(delta)
+                    if visible:
+                        yield _sse("token", {"t": visible})
+            llm_text = "".join(parts).strip()
+            if cached is None:
+                _chat_cache_store(cache_key, ctx, llm_text)
+            try:
+                result = _chat_finish(ctx, llm_text)
+            except Exception as e:
+                app.logger.exception(f"[STREAM] {e}")
+        finally:
+            # Libère les doublons en attente, même si le client a coupé le flux
+            TURNS.finish(key, future, result)
+        if idem:
+            IDEMPOTENT.set(idem, result)
+        timer.finish("/api/bettybot/stream")
+        yield _sse("done", result)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ==== Bootstrap embed (remplace embed_meta / bot_meta, cachable par CDN et navigateur) ====
+BOOTSTRAP_VERSION = 1
+BOOTSTRAP_MAX_AGE = int(os.getenv("BOOTSTRAP_MAX_AGE", "60"))
+BOOTSTRAP_SWR     = int(os.getenv("BOOTSTRAP_SWR", "600"))
+
+DEMO_GREETINGS = {
+    "avocat-001":  "Bonjour et bienvenue au cabinet Werner & Werner. Que puis-je faire pour vous ?",
+    "immo-002":    "Bonjour et bienvenue à l’agence Werner Immobilier. Comment puis-je vous aider ?",
+    "medecin-003": "Bonjour et bienvenue au cabinet Werner Santé. Que puis-je faire pour vous ?",
+}
+
+def bot_bootstrap(bot_id: str) -> dict | None:
+    """Payload unique pour l'embed : union des anciens champs embed_meta et bot_meta."""
+    if bot_id in BOTS:
+        bot = BOTS[bot_id]
+        greeting = bot.get("greeting") or DEMO_GREETINGS.get(bot_id)
+    else:
+        _, bot = find_bot_by_public_id(bot_id)
+        if not bot:
+            return None
+        greeting = bot.get("greeting")
+    name = bot.get("name") or "Betty Bot"
+    return {
+        "v": BOOTSTRAP_VERSION,
+        "bot_id": bot_id,
+        "name": name,
+        "display_name": name,
         "owner_name": bot.get("owner_name") or "Client",
-        "display_name": bot.get("name") or "Betty Bot",
         "color_hex": bot.get("color") or "#4F46E5",
         "avatar_url": static_url(bot.get("avatar_file") or "avocat.jpg"),
-        "greeting": bot.get("greeting") or "Bonjour, qu’est-ce que je peux faire pour vous ?"
-    })
+        "greeting": greeting or "Bonjour, qu’est-ce que je peux faire pour vous ?",
+    }
+
+def _bootstrap_response(bot_id: str):
+    if not bot_id:
+        return jsonify({"error": "missing public_id"}), 400
+    data = bot_bootstrap(bot_id)
+    if data is None:
+        resp = jsonify({"error": "bot_not_found"})
+        resp.status_code = 404
+        resp.headers["Cache-Control"] = "public, max-age=30"
+        return resp
+    body = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    resp = Response(body, mimetype="application/json")
+    # ETag fort : hash du payload, lui-même dérivé de la ligne bot (+ variante d'avatar)
+    resp.set_etag(hashlib.sha1(body.encode("utf-8")).hexdigest()[:20])
+    resp.headers["Cache-Control"] = (
+        f"public, max-age={BOOTSTRAP_MAX_AGE}, stale-while-revalidate={BOOTSTRAP_SWR}"
+    )
+    return resp.make_conditional(request)
+
+@app.route("/api/bootstrap")
+def bootstrap():
+    bot_id = (request.args.get("public_id") or request.args.get("bot_id") or "").strip()
+    return _bootstrap_response(bot_id)
+
+# Anciennes routes conservées pour les snippets déjà installés chez les clients
+@app.route("/api/embed_meta")
+def embed_meta():
+    return _bootstrap_response((request.args.get("public_id") or "").strip())
 
 @app.route("/api/bot_meta")
 def bot_meta():
-    bot_id = (request.args.get("bot_id") or request_args.get("public_id") or "").strip() if False else (request.args.get("bot_id") or request.args.get("public_id") or "").strip()
-    if bot_id == "spectra-demo":
-        b = BOTS["spectra-demo"]
-        return jsonify({
-            "name": "Betty Bot (Spectra Media)",
-            "color_hex": b.get("color") or "#4F46E5",
-            "avatar_url": static_url(b.get("avatar_file") or "avocat.jpg"),
-            "greeting": b.get("greeting") or "Bonjour et bienvenue chez Spectra Media. Souhaitez-vous créer votre Betty Bot métier ?"
-        })
-    if bot_id in BOTS:
-        b = BOTS[bot_id]
-        demo_greetings = {
-            "avocat-001":  "Bonjour et bienvenue au cabinet Werner & Werner. Que puis-je faire pour vous ?",
-            "immo-002":    "Bonjour et bienvenue à l’agence Werner Immobilier. Comment puis-je vous aider ?",
-            "medecin-003": "Bonjour et bienvenue au cabinet Werner Santé. Que puis-je faire pour vous ?",
-        }
-        return jsonify({
-            "name": b.get("name") or "Betty Bot",
-            "color_hex": b.get("color") or "#4F46E5",
-            "avatar_url": static_url(b.get("avatar_file") or "avocat.jpg"),
-            "greeting": demo_greetings.get(bot_id, "Bonjour, qu’est-ce que je peux faire pour vous ?")
-        })
-    _, bot = find_bot_by_public_id(bot_id)
-    if not bot:
-        return jsonify({"error": "bot_not_found"}), 404
-    return jsonify({
-        "name": bot.get("name") or "Betty Bot",
-        "color_hex": bot.get("color") or "#4F46E5",
-        "avatar_url": static_url(bot.get("avatar_file") or "avocat.jpg"),
-        "greeting": bot.get("greeting") or "Bonjour, qu’est-ce que je peux faire pour vous ?"
-    })
+    return _bootstrap_response((request.args.get("bot_id") or request.args.get("public_id") or "").strip())
 
 @app.route("/healthz")
 def healthz():
     return "ok", 200
 
+@app.route("/api/stats")
+def cache_stats():
+    """Taux de succès des caches (réponses par pack, prompts, bots) et état des files et magasins."""
+    return jsonify({
+        "responses": RESPONSES.stats(),
+        "prompts": PACKS.stats(),
+        "bots": BOT_CACHE.stats(),
+        "llm": LLM.stats(),
+        "turns": TURNS.stats(),
+        "lead_ingest": LEAD_INGEST.stats(),
+        "conversations": CONVS.stats(),
+    })
+
+# ---- Métriques Prometheus (lues au scrape, rien sur le chemin chaud) ----
+# Clients LLM du process ("async" ajouté par asgi.py)
+LLM_CLIENTS = {"sync": LLM}
+
+def _llm_counter(field: str):
+    return lambda: {(mode,): c.stats()[field] for mode, c in LLM_CLIENTS.items()}
+
+def _response_cache_lookups() -> dict:
+    packs = RESPONSES.stats()["packs"].values()
+    return {(result,): sum(s[result] for s in packs) for result in ("hits", "near_hits", "misses")}
+
+def _conv_gauge(field: str):
+    """Valeur du magasin de conversations, étiquetée par backend (absente si le backend ne la fournit pas)."""
+    def read():
+        s = CONVS.stats()
+        return {} if s.get(field) is None else {(s["backend"],): s[field]}
+    return read
+
+def _conv_evictions() -> dict:
+    s = CONVS.stats()
+    return {(s["backend"], reason): s[f"evicted_{reason}"]
+            for reason in ("lru", "ttl", "bytes") if f"evicted_{reason}" in s}
+
+def _cache_hit_ratios() -> dict:
+    packs = RESPONSES.stats()["packs"].values()
+    hits = sum(s["hits"] + s["near_hits"] for s in packs)
+    total = hits + sum(s["misses"] for s in packs)
+    return {
+        ("responses",): round(hits / total, 4) if total else 0.0,  # démo uniquement
+        ("bots",): BOT_CACHE.stats()["hit_ratio"],
+        ("idempotency",): IDEMPOTENT.stats()["hit_ratio"],
+    }
+
+METRICS.collector("betty_llm_calls_total", "Appels LLM.", "counter", _llm_counter("calls"), ("mode",))
+METRICS.collector("betty_llm_retries_total", "Retries LLM.", "counter", _llm_counter("retries"), ("mode",))
+METRICS.collector("betty_llm_failures_total", "Appels LLM en échec.", "counter", _llm_counter("failures"), ("mode",))
+METRICS.collector("betty_llm_short_circuits_total", "Appels LLM court-circuités par le disjoncteur.", "counter",
+                  _llm_counter("short_circuits"), ("mode",))
+METRICS.collector("betty_llm_prompt_tokens_total", "Tokens d'entrée facturés.", "counter",
+                  _llm_counter("prompt_tokens"), ("mode",))
+METRICS.collector("betty_response_cache_lookups_total", "Consultations du cache de réponses (démo).", "counter",
+                  _response_cache_lookups, ("result",))
+METRICS.collector("betty_cache_hit_ratio", "Taux de succès des caches.", "gauge", _cache_hit_ratios, ("cache",))
+METRICS.collector("betty_conversations", "Conversations conservées.", "gauge",
+                  _conv_gauge("conversations"), ("backend",))
+METRICS.collector("betty_conversation_bytes", "Taille des historiques conservés (octets).", "gauge",
+                  _conv_gauge("bytes"), ("backend",))
+METRICS.collector("betty_conversation_evictions_total", "Conversations évincées.", "counter",
+                  _conv_evictions, ("backend", "reason"))
+METRICS.collector("betty_mail_outbox_depth", "Emails en attente d'envoi.", "gauge", OUTBOX.depth)
+METRICS.collector("betty_lead_ingest_pending", "Leads de l'embed en attente d'écriture.", "gauge",
+                  LEAD_INGEST.pending)
+METRICS.collector("betty_lead_ingest_written_total", "Leads de l'embed écrits en base.", "counter",
+                  lambda: LEAD_INGEST.written)
+METRICS.collector("betty_turns_in_flight", "Tours de chat en cours.", "gauge", lambda: TURNS.stats()["in_flight"])
+METRICS.collector("betty_turns_shared_total", "Requêtes servies par un tour déjà en cours.", "counter",
+                  lambda: TURNS.stats()["shared"])
+
+@app.route("/metrics")
+def metrics():
+    if not METRICS.enabled:
+        return "metrics disabled", 404
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/api/reset", methods=["POST"])
 def reset_conv():
     key = (request.get_json(silent=True) or {}).get("key")
-    if key and key in CONVS:
-        CONVS.pop(key, None)
+    if key:
+        CONVS.delete(key)
     return jsonify({"ok": True})
 
 @app.route("/api/test_mailjet")
@@ -1147,7 +1823,10 @@ def avatar(slug: str):
     filename = f"logo-{slug}.jpg"
     path = os.path.join(static_dir, filename)
     if os.path.exists(path):
-        return send_from_directory(static_dir, filename)
+        variant = AVATARS.variant(filename, request.headers.get("Accept", ""), request.args.get("s", type=int) or DEFAULT_AVATAR_SIZE)
+        resp = send_from_directory(static_dir, variant or filename, max_age=86400)
+        resp.vary.add("Accept")
+        return resp
     transparent_png = base64.b64decode(
         "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mP8/x8AAwMCAO+Xad8AAAAASUVORK5CYII="
     )
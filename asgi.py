@@ -0,0 +1,281 @@
+# asgi.py — mode de service asynchrone (ASGI) de l'API de chat
+#
+#   uvicorn asgi:app --workers 2
+#
+# /api/bettybot, /api/bettybot/stream et /api/chat (embed) sont servis en asyncio : mêmes
+# routes, même schéma de réponse que l'app Flask, mais l'attente du LLM ne bloque aucun
+# thread. Les étapes courtes (contexte, garde-fous, SQLite) réutilisent le code Flask tel
+# quel dans le pool de threads ; la file d'emails est envoyée à Mailjet depuis la boucle
+# (utils/mail_async.py). Toutes les autres routes passent par Flask.
+
+import io
+import sys
+import time
+import asyncio
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request, session
+
+from app import (
+    app as flask_app, LLM, LLM_CLIENTS, CONTEXT, EMPTY_MESSAGE_REPLY, LeadTagFilter, TURNS, IDEMPOTENT, TURN_WAIT,
+    PENDING_TURN_REPLY, PENDING_RETRY_AFTER, OUTBOX,
+    _chat_context, _chat_finish, _chat_cache_lookup, _chat_cache_store, _idempotency_key, _sse,
+)
+from utils.cache import MISS
+from utils.context import lead_summary
+from utils.lead import client_lead_fields
+from utils.llm_async import get_async_client
+from utils.mail_async import AsyncMailDispatcher
+from utils.singleflight import turn_key
+
+ALLM = get_async_client(LLM)
+LLM_CLIENTS["async"] = ALLM
+# Emails (leads, achats) envoyés depuis la boucle d'événements plutôt que par le thread de l'outbox
+MAIL = AsyncMailDispatcher(OUTBOX)
+WSGI = WsgiToAsgi(flask_app)
+
+
+def _environ(scope: dict, body: bytes) -> dict:
+    """Environ WSGI minimal, pour ouvrir un contexte de requête Flask (session, JSON)."""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin1").upper().replace("-", "_")
+        value = raw_value.decode("latin1")
+        if name == "CONTENT_LENGTH":
+            continue
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _open_turn(environ: dict, seed_lead: bool = False):
+    """
+    Dans un contexte de requête Flask : (ctx, en-têtes Set-Cookie, clé d'idempotence),
+    ou (None, [], None) si le message est vide. `seed_lead` : lead déjà collecté par
+    l'embed (/api/chat), repris tel quel.
+    """
+    with flask_app.request_context(environ):
+        payload = request.get_json(force=True, silent=True) or {}
+        if not (payload.get("message") or "").strip():
+            return None, [], None
+        ctx = _chat_context(payload)
+        if seed_lead:
+            ctx["lead_state"].seed(client_lead_fields(payload.get("lead")))
+        idem = _idempotency_key(ctx, request.headers.get("Idempotency-Key"))
+        # Le cookie `sid` éventuellement créé doit partir avec les en-têtes de la réponse
+        resp = flask_app.response_class()
+        flask_app.session_interface.save_session(flask_app, session, resp)
+        return ctx, resp.headers.getlist("Set-Cookie"), idem
+
+
+def _messages(ctx: dict) -> list:
+    messages, tokens = CONTEXT.build(ctx["system_prompt"], ctx["history"], ctx["user_input"],
+                                     lead_summary(ctx["lead_state"].as_lead()))
+    print(f"[LLM][ASYNC] entrée ≈{tokens} tokens, {len(messages) - 2}/{len(ctx['history'])} messages d'historique")
+    return messages
+
+
+def _headers(content_type: str, cookies: list, extra: list | None = None, request_id: str = "") -> list:
+    headers = [(b"content-type", content_type.encode("latin1"))]
+    if request_id:
+        headers.append((b"x-request-id", request_id.encode("latin1")))
+    headers += [(b"set-cookie", c.encode("latin1")) for c in cookies]
+    return headers + (extra or [])
+
+
+async def _send_json(send, status: int, data: dict, cookies: list, extra: list | None = None,
+                     request_id: str = ""):
+    body = (flask_app.json.dumps(data) + "\n").encode("utf-8")
+    extra = [(b"content-length", str(len(body)).encode())] + (extra or [])
+    await send({"type": "http.response.start", "status": status,
+                "headers": _headers("application/json", cookies, extra, request_id)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _chat_turn(ctx: dict) -> dict:
+    timer = ctx["timer"]
+    with timer.stage("cache"):
+        cache_key, llm_text = _chat_cache_lookup(ctx)
+    if llm_text is None:
+        t0 = time.perf_counter()
+        with timer.stage("llm"):
+            llm_text = await ALLM.complete(_messages(ctx))
+        print(f"[LLM][ASYNC] {(time.perf_counter() - t0) * 1000:.0f} ms")
+        _chat_cache_store(cache_key, ctx, llm_text)
+    return await asyncio.to_thread(_chat_finish, ctx, llm_text)
+
+
+async def _coalesced_turn(ctx: dict) -> dict | None:
+    """Tour exécuté une fois par (conversation, message) ; None si le tour de référence dépasse TURN_WAIT."""
+    key = turn_key(ctx["conv_id"], ctx["user_input"])
+    future, leader = TURNS.begin(key)
+    if not leader:
+        try:
+            # shield : l'expiration ne doit pas annuler le Future partagé avec le tour de référence
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), TURN_WAIT)
+        except asyncio.TimeoutError:
+            return None
+    try:
+        result = await _chat_turn(ctx)
+    except BaseException as e:
+        TURNS.finish(key, future, error=e)
+        raise
+    TURNS.finish(key, future, result)
+    return result
+
+
+async def chat_reply(scope, receive, send):
+    """POST /api/bettybot — même JSON que la route Flask ({"response", "stage"})."""
+    ctx, cookies, idem = await asyncio.to_thread(_open_turn, _environ(scope, await _read_body(receive)))
+    if ctx is None:
+        return await _send_json(send, 200, EMPTY_MESSAGE_REPLY, [])
+    if idem:
+        stored = IDEMPOTENT.get(idem)
+        if stored is not MISS:
+            ctx["timer"].finish("/api/bettybot")
+            return await _send_json(send, 200, stored, cookies, [(b"idempotent-replayed", b"true")],
+                                    ctx["timer"].request_id)
+
+    # Doublon concurrent du même (conversation, message) : on attend le tour déjà lancé
+    result = await _coalesced_turn(ctx)
+    ctx["timer"].finish("/api/bettybot")
+    if result is None:
+        return await _send_json(send, 202, PENDING_TURN_REPLY, cookies,
+                                [(b"retry-after", PENDING_RETRY_AFTER.encode())], ctx["timer"].request_id)
+    if idem:
+        IDEMPOTENT.set(idem, result)
+    await _send_json(send, 200, result, cookies, request_id=ctx["timer"].request_id)
+
+
+async def chat_api(scope, receive, send):
+    """POST /api/chat — endpoint de l'embed, même JSON que la route Flask ({"reply", "stage"})."""
+    ctx, cookies, _ = await asyncio.to_thread(_open_turn, _environ(scope, await _read_body(receive)), True)
+    if ctx is None:
+        return await _send_json(send, 200, {"reply": EMPTY_MESSAGE_REPLY["response"], "stage": None}, [])
+    result = await _coalesced_turn(ctx)
+    ctx["timer"].finish("/api/chat")
+    if result is None:
+        return await _send_json(send, 202, {"reply": PENDING_TURN_REPLY["response"], "stage": None, "pending": True},
+                                cookies, [(b"retry-after", PENDING_RETRY_AFTER.encode())], ctx["timer"].request_id)
+    await _send_json(send, 200, {"reply": result["response"], "stage": result.get("stage")}, cookies,
+                     request_id=ctx["timer"].request_id)
+
+
+async def _replay(cached: str):
+    if cached:
+        yield cached
+
+
+async def chat_stream(scope, receive, send):
+    """POST /api/bettybot/stream — événements SSE `token` puis `done`, comme la route Flask."""
+    ctx, cookies, idem = await asyncio.to_thread(_open_turn, _environ(scope, await _read_body(receive)))
+    if ctx is None:
+        return await _send_json(send, 200, EMPTY_MESSAGE_REPLY, [])
+
+    timer = ctx["timer"]
+    await send({"type": "http.response.start", "status": 200,
+                "headers": _headers("text/event-stream; charset=utf-8", cookies,
+                                    [(b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")],
+                                    timer.request_id)})
+
+    async def emit(event: str, data, more: bool = True):
+        await send({"type": "http.response.body", "body": _sse(event, data).encode("utf-8"), "more_body": more})
+
+    # Rejeu (Idempotency-Key connue) ou doublon d'un tour en cours : seulement `done`
+    stored = IDEMPOTENT.get(idem) if idem else MISS
+    if stored is not MISS:
+        timer.finish("/api/bettybot/stream")
+        return await emit("done", stored, more=False)
+    key = turn_key(ctx["conv_id"], ctx["user_input"])
+    future, leader = TURNS.begin(key)
+    if not leader:
+        try:
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), TURN_WAIT)
+        except asyncio.TimeoutError:
+            result = PENDING_TURN_REPLY
+        except Exception as e:
+            flask_app.logger.exception(f"[STREAM] {e}")
+            result = {"response": "Désolé, pas de réponse", "stage": None}
+        timer.finish("/api/bettybot/stream")
+        return await emit("done", result, more=False)
+
+    result = {"response": "Désolé, pas de réponse", "stage": None}
+    try:
+        with timer.stage("cache"):
+            cache_key, cached = _chat_cache_lookup(ctx)
+        deltas = _replay(cached) if cached is not None else ALLM.stream(_messages(ctx))
+        parts = []
+        hide = LeadTagFilter()
+        with timer.stage("llm"):
+            async for delta in deltas:
+                parts.append(delta)
+                visible = hide.feed(delta)
+                if visible:
+                    await emit("token", {"t": visible})
+        llm_text = "".join(parts).strip()
+        if cached is None:
+            _chat_cache_store(cache_key, ctx, llm_text)
+        try:
+            result = await asyncio.to_thread(_chat_finish, ctx, llm_text)
+        except Exception as e:
+            flask_app.logger.exception(f"[STREAM] {e}")
+    finally:
+        # Libère les doublons en attente, même si le client a coupé le flux
+        TURNS.finish(key, future, result)
+    if idem:
+        IDEMPOTENT.set(idem, result)
+    timer.finish("/api/bettybot/stream")
+    await emit("done", result, more=False)
+
+
+CHAT_ROUTES = {
+    "/api/bettybot": chat_reply,
+    "/api/bettybot/stream": chat_stream,
+    "/api/chat": chat_api,
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await MAIL.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await MAIL.aclose()
+                await ALLM.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] == "http" and scope["method"] == "POST":
+        handler = CHAT_ROUTES.get(scope["path"].rstrip("/"))
+        if handler:
+            return await handler(scope, receive, send)
+    return await WSGI(scope, receive, send)
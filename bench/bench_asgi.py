@@ -0,0 +1,99 @@
+# bench/bench_asgi.py — débit de /api/bettybot : app Flask (WSGI, N workers) vs asgi.py (1 process asyncio)
+#
+#   python bench/bench_asgi.py [--requests 400] [--concurrency 200] [--workers 8] [--latency 1.0]
+#
+# Un faux endpoint Together (bench/fakes.py) répond après `--latency` secondes ; le serveur
+# WSGI est limité à `--workers` requêtes simultanées (équivalent de workers synchrones
+# gunicorn), le serveur ASGI tourne dans un seul process uvicorn.
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.fakes import fake_env, free_port, start_app, start_fakes, wait_ready
+
+
+async def load(url: str, total: int, concurrency: int) -> dict:
+    import aiohttp
+
+    latencies, errors = [], 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency),
+                                     timeout=aiohttp.ClientTimeout(total=120)) as client:
+        async def one(i: int):
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    async with client.post(url, json={
+                        "message": f"Bonjour, je suis le visiteur {i} et je voudrais un bot pour mon entreprise",
+                        "bot_id": "spectra-demo", "conv_id": f"bench-{i}",
+                    }) as r:
+                        if r.status != 200 or "response" not in await r.json(content_type=None):
+                            errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "errors": errors,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--latency", type=float, default=1.0)
+    args = ap.parse_args()
+
+    fakes_port, wsgi_port, asgi_port = free_port(), free_port(), free_port()
+    tmp = tempfile.mkdtemp(prefix="betty-bench-")
+    env = {
+        **os.environ,
+        **fake_env(fakes_port),
+        "RESPONSE_CACHE_SIZE": "0",  # chaque requête doit atteindre le LLM
+    }
+    # Réponse instantanée une fois la latence écoulée : on mesure le serveur, pas la génération
+    procs = [start_fakes(fakes_port, args.latency, token_rate=0)]
+    try:
+        wait_ready(fakes_port)
+        procs.append(start_app("wsgi", wsgi_port, {**env, "DB_PATH": os.path.join(tmp, "wsgi.db")}, args.workers))
+        procs.append(start_app("asgi", asgi_port, {**env, "DB_PATH": os.path.join(tmp, "asgi.db")}))
+        wait_ready(wsgi_port)
+        wait_ready(asgi_port)
+
+        print(f"{args.requests} requêtes, {args.concurrency} en parallèle, LLM {args.latency:.1f}s\n")
+        results = {}
+        for label, port in ((f"WSGI ({args.workers} workers)", wsgi_port), ("ASGI (1 process)", asgi_port)):
+            r = asyncio.run(load(f"http://127.0.0.1:{port}/api/bettybot", args.requests, args.concurrency))
+            results[label] = r
+            print(f"{label:<22} {r['rps']:>8.1f} req/s   p50 {r['p50']:.2f}s   p95 {r['p95']:.2f}s   erreurs {r['errors']}")
+        wsgi, asgi = results.values()
+        print(f"{'gain':<22} {asgi['rps'] / wsgi['rps']:>8.1f}x")
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+if __name__ == "__main__":
+    main()
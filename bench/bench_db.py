@@ -0,0 +1,80 @@
+# bench/bench_db.py — lookups de bots par seconde : connexion par appel (ancien) vs connexion persistante
+#
+#   python bench/bench_db.py [--rows 1000] [--lookups 20000]
+#
+# Le gain ne compare que les deux accès SQLite (`_db_fetch_bot`, sans cache) ; le cache
+# mémoire de db_get_bot (BOT_CACHE) est mesuré à part, sur sa propre ligne.
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_get_bot(db_path: str, public_id: str):
+    """Reproduction de l'ancien db_get_bot : nouvelle connexion + PRAGMA à chaque appel."""
+    con = sqlite3.connect(db_path, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    try:
+        con.execute("PRAGMA journal_mode=WAL;")
+        row = con.execute("SELECT * FROM bots WHERE public_id = ? LIMIT 1", (public_id,)).fetchone()
+    finally:
+        con.close()
+    if not row:
+        return None
+    d = dict(row)
+    d["profile"] = json.loads(d["profile_json"]) if d.get("profile_json") else {}
+    return d
+
+
+def run(label: str, fn, ids: list, lookups: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(lookups):
+        fn(ids[i % len(ids)])
+    dt = time.perf_counter() - t0
+    rate = lookups / dt
+    print(f"{label:<28} {rate:>12,.0f} lookups/s")
+    return rate
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1000)
+    ap.add_argument("--lookups", type=int, default=20000)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="betty-bench-")
+    os.environ["DB_PATH"] = os.path.join(tmp, "bench.db")
+    import app as betty
+
+    ids = []
+    for i in range(args.rows):
+        pid = f"avocat-001-{i:08x}"
+        ids.append(pid)
+        betty.db_upsert_bot({
+            "public_id": pid, "bot_key": "avocat-001", "pack": "avocat", "name": f"Bot {i}",
+            "color": "#4F46E5", "avatar_file": "avocat.jpg", "greeting": "",
+            "buyer_email": f"owner{i}@example.com", "owner_name": "Client",
+            "profile": {"name": f"Cabinet {i}", "phone": "0102030405"},
+        })
+    random.shuffle(ids)
+
+    before = run("avant (connexion par appel)", lambda p: legacy_get_bot(str(betty.DB_PATH), p), ids, args.lookups)
+    after = run("après (connexion par thread)", betty._db_fetch_bot, ids, args.lookups)
+    print(f"{'gain':<28} {after / before:>12.1f}x")
+    # Cache chaud (--rows <= BOT_CACHE_SIZE) : dictionnaire en mémoire, sans SQLite
+    for pid in ids:
+        betty.db_get_bot(pid)
+    run("db_get_bot (BOT_CACHE chaud)", betty.db_get_bot, ids, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# bench/bench_guardrails.py — messages/s des garde-fous sur des conversations synthétiques
+#
+#   python bench/bench_guardrails.py [--conversations 2000] [--turns 12]
+#
+# "rescan"      : appel historique, lead et intention ré-extraits de tout l'historique à chaque tour
+# "incrémental" : LeadState + un seul scan du message courant (chemin de /api/bettybot)
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+OPENERS = ["bonjour", "bonsoir, j'ai une question", "salut", "vous êtes ouverts le samedi ?", "c'est combien ?"]
+NEEDS = ["je voudrais un rendez-vous pour un divorce", "besoin d'un devis pour une fuite", "je souhaite un rdv demain matin",
+         "pour un conseil sur mon bail", "motif : licenciement abusif", "c'est pour vendredi après-midi si possible"]
+NAMES = ["Jean Dupont", "Marie-Claire Martin", "je m'appelle Luc Bernard", "Nom : Sophie Leroy", "Paul Henri Durand"]
+PHONES = ["06 12 34 56 78", "+33 6 98 76 54 32", "mon numéro 07.11.22.33.44", "0145678901"]
+EMAILS = ["jean.dupont@example.com", "c'est marie@exemple.fr", "luc_b@mail.org"]
+FILLERS = ["ok", "oui d'accord", "merci", "ça marche", "vous pouvez me rappeler ?", "et ça prend combien de temps ?"]
+LLM_REPLIES = [
+    "Bien sûr, je peux vous aider. Quel est votre nom ?\n<LEAD_JSON>{\"reason\":\"\",\"name\":\"\",\"email\":\"\",\"phone\":\"\",\"availability\":\"\",\"stage\":\"collecting\"}</LEAD_JSON>",
+    "Merci ! Pouvez-vous me donner votre téléphone ?",
+    "Parfait, je transmets vos coordonnées. <LEAD_JSON>{\"stage\":\"ready\"}</LEAD_JSON>",
+]
+
+
+def synthetic_conversation(rng: random.Random, turns: int) -> list[str]:
+    script = [rng.choice(OPENERS), rng.choice(NEEDS), rng.choice(NAMES), rng.choice(PHONES), rng.choice(EMAILS)]
+    while len(script) < turns:
+        script.append(rng.choice(FILLERS + NEEDS))
+    return script[:turns]
+
+
+def run(betty, conversations, incremental: bool) -> float:
+    pack = "avocat"
+    n = 0
+    t0 = time.perf_counter()
+    for conv in conversations:
+        history, state = [], betty.LeadState()
+        engine = betty.guardrails_for(pack)
+        for i, msg in enumerate(conv):
+            llm_text = LLM_REPLIES[i % len(LLM_REPLIES)]
+            if incremental:
+                state.update(msg)
+                signals = engine.scan(msg)
+                reply, _, _, _ = betty.guardrailed_reply(
+                    history[-6:], msg, llm_text, pack,
+                    lead=state.as_lead(), signals=signals, intent_seen=state.intent_rdv
+                )
+                if not state.intent_rdv:
+                    state.intent_rdv = "intent_rdv" in signals or "intent_rdv" in engine.scan(reply)
+            else:
+                reply, _, _, _ = betty.guardrailed_reply(history, msg, llm_text, pack)
+            history += [{"role": "user", "content": msg}, {"role": "assistant", "content": reply}]
+            n += 1
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--conversations", type=int, default=2000)
+    ap.add_argument("--turns", type=int, default=12)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="betty-bench-"), "bench.db"))
+    import app as betty
+
+    rng = random.Random(args.seed)
+    conversations = [synthetic_conversation(rng, args.turns) for _ in range(args.conversations)]
+    before = run(betty, conversations, incremental=False)
+    after = run(betty, conversations, incremental=True)
+    print(f"{'rescan (historique complet)':<30} {before:>12,.0f} messages/s")
+    print(f"{'incrémental (LeadState)':<30} {after:>12,.0f} messages/s")
+    print(f"{'gain':<30} {after / before:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench/bench_startup.py — démarrage à froid : `import app` puis première requête, LAZY_STARTUP=1 vs 0
+#
+#   python bench/bench_startup.py [--runs 7] [--top 12]
+#
+# Chaque mesure tourne dans un process neuf (base SQLite temporaire vide) : durée de
+# `import app`, de la première requête /healthz, du premier tour /api/chat (sans clé
+# Together, réponse de repli), et liste des modules lourds chargés. Le détail par module
+# vient de `python -X importtime`.
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("stripe", "yaml", "requests", "urllib3")
+
+PROBE = r"""
+import sys, json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+client.get("/healthz")
+t2 = time.perf_counter()
+client.post("/api/chat", json={"bot_id": "spectra-demo", "message": "Bonjour"})
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "healthz_ms": (t2 - t1) * 1000,
+    "chat_ms": (t3 - t2) * 1000,
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY,)
+
+
+def _env(lazy: bool, db_path: str) -> dict:
+    return dict(os.environ, DB_PATH=db_path, LAZY_STARTUP="1" if lazy else "0",
+                TOGETHER_API_KEY="", METRICS_ENABLED="0", PYTHONPATH=ROOT)
+
+
+def probe(lazy: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True,
+                             env=_env(lazy, os.path.join(tmp, "app.db")), check=True).stdout
+    # La dernière ligne est le JSON (l'app logue sur stdout)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def importtime(lazy: bool, top: int) -> list:
+    """Imports directs de app.py les plus coûteux (temps cumulé, µs) d'après -X importtime."""
+    with tempfile.TemporaryDirectory() as tmp:
+        err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT,
+                             capture_output=True, text=True, env=_env(lazy, os.path.join(tmp, "app.db")),
+                             check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        # Imports directs de app.py : profondeur 1 (" " + deux espaces par niveau)
+        if len(name) - len(name.lstrip(" ")) != 3:
+            continue
+        rows.append((int(cumulative), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--top", type=int, default=12)
+    args = ap.parse_args()
+
+    for lazy in (False, True):
+        runs = [probe(lazy) for _ in range(args.runs)]
+        med = {k: statistics.median(r[k] for r in runs) for k in ("import_ms", "healthz_ms", "chat_ms")}
+        print(f"\n== LAZY_STARTUP={int(lazy)} ({args.runs} process, médianes) ==")
+        print(f"import app      {med['import_ms']:7.1f} ms")
+        print(f"1re /healthz    {med['healthz_ms']:7.1f} ms")
+        print(f"1er /api/chat   {med['chat_ms']:7.1f} ms")
+        print(f"total           {sum(med.values()):7.1f} ms")
+        print(f"modules lourds chargés : {', '.join(runs[-1]['heavy']) or 'aucun'}")
+        print("import le plus coûteux (cumulé) :")
+        for cumulative, self_us, name in importtime(lazy, args.top):
+            print(f"  {cumulative / 1000:7.1f} ms  (propre {self_us / 1000:5.1f})  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# bench/fakes.py — faux Together + faux Mailjet (ASGI) pour les benchmarks, sans appel réseau externe
+#
+#   python bench/fakes.py --port 8770 [--latency 0.8] [--token-rate 60] [--error-rate 0.02]
+#
+# POST /v1/chat/completions : réponse (ou SSE si "stream": true) après `latency` secondes
+#                             + durée de génération au rythme de `token_rate` tokens/s ;
+#                             503 avec la probabilité `error_rate`.
+# POST /v3.1/send           : accepte tous les messages (Status "success" par message).
+# GET  /stats               : compteurs (appels LLM, erreurs, lots et messages Mailjet).
+#
+# Contient aussi les utilitaires de lancement partagés par les benchmarks (ports, sous-process,
+# app Flask derrière un serveur WSGI borné à N workers).
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPLY = ("Bien sûr, je peux vous aider. Pouvez-vous me préciser votre besoin "
+         "et vos disponibilités pour être rappelé ?")
+
+
+def make_app(latency: float = 0.8, token_rate: float = 60.0, error_rate: float = 0.0):
+    stats = {"llm_calls": 0, "llm_errors": 0, "llm_streams": 0, "prompt_tokens": 0,
+             "mailjet_batches": 0, "mailjet_messages": 0}
+    words = REPLY.split(" ")
+
+    async def read_json(receive) -> dict:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(body or b"{}")
+        except ValueError:
+            return {}
+
+    async def respond(send, status: int, data: dict):
+        body = json.dumps(data).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def chat(payload: dict, send):
+        stats["llm_calls"] += 1
+        prompt_tokens = len(json.dumps(payload.get("messages") or [])) // 4
+        stats["prompt_tokens"] += prompt_tokens
+        await asyncio.sleep(latency)
+        if random.random() < error_rate:
+            stats["llm_errors"] += 1
+            return await respond(send, 503, {"error": {"message": "fake overload"}})
+        per_token = 1.0 / token_rate if token_rate > 0 else 0.0
+        if not payload.get("stream"):
+            await asyncio.sleep(per_token * len(words))
+            return await respond(send, 200, {
+                "choices": [{"message": {"role": "assistant", "content": REPLY}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(words)},
+            })
+        stats["llm_streams"] += 1
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        for i, word in enumerate(words):
+            await asyncio.sleep(per_token)
+            chunk = {"choices": [{"delta": {"content": (" " if i else "") + word}}]}
+            await send({"type": "http.response.body", "body": f"data: {json.dumps(chunk)}\n\n".encode(),
+                        "more_body": True})
+        await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        path = scope["path"]
+        if scope["method"] == "GET" and path == "/stats":
+            return await respond(send, 200, stats)
+        payload = await read_json(receive)
+        if path.endswith("/chat/completions"):
+            return await chat(payload, send)
+        if path.endswith("/send"):
+            messages = payload.get("Messages") or []
+            stats["mailjet_batches"] += 1
+            stats["mailjet_messages"] += len(messages)
+            return await respond(send, 200, {"Messages": [{"Status": "success"} for _ in messages]})
+        await respond(send, 404, {"error": "not found"})
+
+    return app
+
+
+def serve(port: int, latency: float, token_rate: float, error_rate: float):
+    import uvicorn
+    uvicorn.run(make_app(latency, token_rate, error_rate), host="127.0.0.1", port=port, log_level="warning")
+
+
+# ==== Processus ====
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 30.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"serveur non démarré sur le port {port}")
+
+
+def start(args: list, env: dict) -> subprocess.Popen:
+    """Sous-process Python lancé depuis la racine du dépôt, sorties ignorées."""
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env={**env, "PYTHONPATH": ROOT},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def start_fakes(port: int, latency: float, token_rate: float = 60.0, error_rate: float = 0.0) -> subprocess.Popen:
+    return start([os.path.abspath(__file__), "--port", str(port), "--latency", str(latency),
+                  "--token-rate", str(token_rate), "--error-rate", str(error_rate)], dict(os.environ))
+
+
+def start_app(server: str, port: int, env: dict, workers: int = 8) -> subprocess.Popen:
+    """`server` = "wsgi" (Flask, `workers` requêtes simultanées) ou "asgi" (uvicorn asgi:app)."""
+    if server == "asgi":
+        return start(["-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                      "--log-level", "warning"], env)
+    return start([os.path.abspath(__file__), "--serve-wsgi", str(port), "--workers", str(workers)], env)
+
+
+def serve_wsgi(port: int, workers: int):
+    """App Flask derrière un serveur threadé borné à N requêtes simultanées (≈ workers gunicorn)."""
+    from werkzeug.serving import make_server
+    sys.path.insert(0, ROOT)
+    from app import app
+
+    slots = threading.BoundedSemaphore(workers)
+
+    def bounded(environ, start_response):
+        with slots:
+            return list(app(environ, start_response))
+
+    make_server("127.0.0.1", port, bounded, threaded=True).serve_forever()
+
+
+def fake_env(port: int) -> dict:
+    """Variables d'environnement qui branchent l'app sur les faux Together / Mailjet."""
+    return {
+        "TOGETHER_API_URL": f"http://127.0.0.1:{port}/v1/chat/completions",
+        "TOGETHER_API_KEY": "bench",
+        "MJ_API_KEY": "bench",
+        "MJ_API_SECRET": "bench",
+        "MJ_API_URL": f"http://127.0.0.1:{port}/v3.1/send",
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8770)
+    ap.add_argument("--latency", type=float, default=0.8)
+    ap.add_argument("--token-rate", type=float, default=60.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--serve-wsgi", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--workers", type=int, default=8, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.serve_wsgi:
+        return serve_wsgi(args.serve_wsgi, args.workers)
+    serve(args.port, args.latency, args.token_rate, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
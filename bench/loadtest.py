@@ -0,0 +1,269 @@
+# bench/loadtest.py — charge + latence de bout en bout sur faux Together / faux Mailjet
+#
+#   python bench/loadtest.py [--server wsgi|asgi] [--conversations 120] [--concurrency 40]
+#                            [--latency 0.8] [--token-rate 60] [--error-rate 0.02]
+#                            [--demo-share 0.25] [--stream] [--out bench/results/x.json]
+#                            [--compare bench/results/avant.json]
+#
+# Rejoue des conversations scriptées sur un bot par pack de data/packs (plus une part de
+# conversations de démo, qui passent par le LLM), puis écrit un JSON comparable entre
+# révisions : p50/p95/p99, requêtes/s, appels LLM par conversation, emails Mailjet.
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fakes import fake_env, free_port, start_app, start_fakes, wait_ready
+
+# Conversations rejouées ({name}, {phone}, {email}, {need} propres à chaque conversation)
+SCRIPTS = {
+    "rdv": [
+        "Bonjour",
+        "Je voudrais prendre rendez-vous",
+        "{name}",
+        "{phone}",
+        "{email}",
+        "C'est pour {need}",
+        "Merci beaucoup",
+    ],
+    "faq": [
+        "Bonjour",
+        "Vous êtes ouverts le samedi ?",
+        "C'est combien une première consultation ?",
+        "D'accord, je voudrais un rendez-vous",
+        "{name}",
+        "{phone}",
+        "{email}",
+    ],
+}
+FIRST_NAMES = ("Jean", "Marie", "Paul", "Claire", "Louis", "Emma", "Hugo", "Léa")
+LAST_NAMES = ("Martin", "Bernard", "Dubois", "Thomas", "Robert", "Petit", "Durand", "Leroy")
+
+
+def pack_names() -> list:
+    packs_dir = os.path.join(ROOT, "data", "packs")
+    return sorted(f[:-5] for f in os.listdir(packs_dir) if f.endswith(".yaml"))
+
+
+def provision(db_path: str, packs: list) -> dict:
+    """Un bot par pack dans la base de test (même schéma que l'app). Renvoie {pack: public_id}."""
+    code = (
+        "import json, sys\n"
+        "import app as betty\n"
+        "for pack in json.loads(sys.argv[1]):\n"
+        "    betty.db_upsert_bot({'public_id': f'bench-{pack}', 'bot_key': pack, 'pack': pack,\n"
+        "        'name': f'Betty {pack}', 'color': '#4F46E5', 'avatar_file': 'logo-Betty.png', 'greeting': '',\n"
+        "        'buyer_email': f'owner-{pack}@example.com', 'owner_name': 'Bench',\n"
+        "        'profile': {'name': f'Cabinet {pack}', 'phone': '0102030405', 'hours': 'Lun-Ven 9h-18h'}})\n"
+    )
+    subprocess.run([sys.executable, "-c", code, json.dumps(packs)], cwd=ROOT, check=True,
+                   env={**os.environ, "DB_PATH": db_path, "PYTHONPATH": ROOT},
+                   stdout=subprocess.DEVNULL)
+    return {p: f"bench-{p}" for p in packs}
+
+
+def conversation_plan(i: int, bots: dict, demo_share: float) -> tuple[str, str, list]:
+    """(libellé, bot_id, messages) de la i-ème conversation."""
+    packs = list(bots)
+    demo_every = round(1 / demo_share) if demo_share > 0 else 0
+    if demo_every and i % demo_every == 0:
+        label, bot_id = "demo", "spectra-demo"
+    else:
+        label = packs[i % len(packs)]
+        bot_id = bots[label]
+    script = SCRIPTS["rdv" if i % 2 == 0 else "faq"]
+    fill = {
+        "name": f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}",
+        "phone": f"06 {i // 10000 % 100:02d} {i // 100 % 100:02d} {i % 100:02d} 00",
+        "email": f"visiteur{i}@example.com",
+        "need": "un premier rendez-vous la semaine prochaine",
+    }
+    return label, bot_id, [m.format(**fill) for m in script]
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(values: list) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 0.50) * 1000, 1),
+        "p95": round(percentile(values, 0.95) * 1000, 1),
+        "p99": round(percentile(values, 0.99) * 1000, 1),
+        "mean": round(sum(values) / len(values) * 1000, 1) if values else 0.0,
+    }
+
+
+async def fetch_stats(session, port: int) -> dict:
+    async with session.get(f"http://127.0.0.1:{port}/stats") as r:
+        return await r.json(content_type=None)
+
+
+async def run_load(app_port: int, fakes_port: int, bots: dict, args) -> dict:
+    import aiohttp
+
+    url = f"http://127.0.0.1:{app_port}/api/bettybot" + ("/stream" if args.stream else "")
+    latencies, ttfb, per_label = [], [], {}
+    errors = 0
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.concurrency),
+                                     timeout=aiohttp.ClientTimeout(total=120)) as client:
+        before = await fetch_stats(client, fakes_port)
+
+        async def conversation(i: int):
+            nonlocal errors
+            label, bot_id, messages = conversation_plan(i, bots, args.demo_share)
+            async with sem:
+                for message in messages:
+                    t0 = time.perf_counter()
+                    try:
+                        async with client.post(url, json={"message": message, "bot_id": bot_id,
+                                                          "conv_id": f"load-{args.seed}-{i}"}) as r:
+                            first = None
+                            async for _ in r.content.iter_any():
+                                if first is None:
+                                    first = time.perf_counter() - t0
+                            if r.status != 200:
+                                errors += 1
+                    except Exception:
+                        errors += 1
+                        first = None
+                    dt = time.perf_counter() - t0
+                    latencies.append(dt)
+                    if first is not None:
+                        ttfb.append(first)
+                    per_label.setdefault(label, []).append(dt)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(conversation(i) for i in range(args.conversations)))
+        elapsed = time.perf_counter() - t0
+        # Laisse la file d'emails se vider avant de relever les compteurs Mailjet
+        await asyncio.sleep(args.settle)
+        after = await fetch_stats(client, fakes_port)
+
+    delta = {k: after[k] - before.get(k, 0) for k in after}
+    demo_convs = sum(1 for i in range(args.conversations) if conversation_plan(i, bots, args.demo_share)[0] == "demo")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": summarize(latencies),
+        "ttfb_ms": summarize(ttfb),
+        "llm_calls": delta["llm_calls"],
+        "llm_errors": delta["llm_errors"],
+        "llm_calls_per_conversation": round(delta["llm_calls"] / args.conversations, 2),
+        "llm_calls_per_demo_conversation": round(delta["llm_calls"] / demo_convs, 2) if demo_convs else 0.0,
+        "prompt_tokens": delta["prompt_tokens"],
+        "mailjet_batches": delta["mailjet_batches"],
+        "mailjet_messages": delta["mailjet_messages"],
+        "per_bot": {label: summarize(v) for label, v in sorted(per_label.items())},
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(old: dict, new: dict):
+    keys = [("rps", "req/s"), ("latency_ms.p50", "p50 ms"), ("latency_ms.p95", "p95 ms"),
+            ("latency_ms.p99", "p99 ms"), ("llm_calls_per_conversation", "LLM/conv"),
+            ("mailjet_messages", "emails")]
+
+    def get(d, path):
+        for part in path.split("."):
+            d = (d or {}).get(part)
+        return d
+
+    print(f"\n{'':<12} {old.get('revision', '?'):>10} {new.get('revision', '?'):>10}")
+    for path, label in keys:
+        a, b = get(old.get("results"), path), get(new.get("results"), path)
+        if a is None or b is None:
+            continue
+        change = f"{(b - a) / a * 100:+.0f}%" if a else ""
+        print(f"{label:<12} {a:>10} {b:>10}  {change}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--conversations", type=int, default=120)
+    ap.add_argument("--concurrency", type=int, default=40)
+    ap.add_argument("--latency", type=float, default=0.8)
+    ap.add_argument("--token-rate", type=float, default=60.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--demo-share", type=float, default=0.25)
+    ap.add_argument("--stream", action="store_true")
+    ap.add_argument("--settle", type=float, default=2.0)
+    ap.add_argument("--seed", type=int, default=int(time.time()))
+    ap.add_argument("--out")
+    ap.add_argument("--compare")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="betty-load-")
+    db_path = os.path.join(tmp, "load.db")
+    fakes_port, app_port = free_port(), free_port()
+    env = {**os.environ, **fake_env(fakes_port), "DB_PATH": db_path, "LEAD_DIGEST_DELAY": "1"}
+    os.environ.update(fake_env(fakes_port))
+
+    bots = provision(db_path, pack_names())
+    procs = [start_fakes(fakes_port, args.latency, args.token_rate, args.error_rate)]
+    try:
+        wait_ready(fakes_port)
+        procs.append(start_app(args.server, app_port, env, args.workers))
+        wait_ready(app_port)
+        print(f"{args.conversations} conversations sur {len(bots)} packs (+{args.demo_share:.0%} démo), "
+              f"{args.concurrency} en parallèle, serveur {args.server}, LLM {args.latency}s")
+        results = asyncio.run(run_load(app_port, fakes_port, bots, args))
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+    }
+    lat = results["latency_ms"]
+    print(f"{results['requests']} requêtes, {results['errors']} erreurs, {results['rps']} req/s")
+    print(f"latence p50 {lat['p50']} ms, p95 {lat['p95']} ms, p99 {lat['p99']} ms")
+    print(f"LLM {results['llm_calls']} appels ({results['llm_calls_per_conversation']}/conversation), "
+          f"Mailjet {results['mailjet_messages']} emails en {results['mailjet_batches']} lots")
+
+    out = args.out or os.path.join(ROOT, "bench", "results", f"loadtest-{report['revision']}-{args.server}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("→", out)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# scripts/build_avatars.py — génère les variantes d'avatars (AVIF/WebP/PNG) redimensionnées
+#
+#   pip install -r requirements-dev.txt   (Pillow : dépendance de build uniquement)
+#   python scripts/build_avatars.py [--sizes 64,128,256]
+#
+# Sortie : static/avatars/<nom>-<taille>.<hash>.<ext> + static/avatars/manifest.json,
+# lu au runtime par utils/avatars.py. Les noms contiennent un hash du contenu :
+# ils peuvent être servis avec Cache-Control immutable. Une source identique octet pour
+# octet à une autre (logo-avocat.jpg = avocat.jpg…) n'a pas de variantes à elle : elle
+# est déclarée dans `aliases` du manifest et renvoie aux variantes de la première.
+
+from __future__ import annotations
+
+import io
+import os
+import sys
+import json
+import glob
+import hashlib
+import argparse
+
+from PIL import Image, features
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC = os.path.join(ROOT, "static")
+OUT_DIR = os.path.join(STATIC, "avatars")
+SOURCES = ("Betty_*.png", "*.jpg")
+
+
+def encode(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "avif":
+        img.save(buf, "AVIF", quality=55)
+    elif fmt == "webp":
+        img.save(buf, "WEBP", quality=80, method=6)
+    else:
+        img.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="64,128,256")
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    formats = [f for f in ("avif", "webp") if features.check(f)] + ["png"]
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    old_files = set(glob.glob(os.path.join(OUT_DIR, "*.*"))) - {os.path.join(OUT_DIR, "manifest.json")}
+    manifest = {"version": 1, "sizes": sizes, "formats": formats, "images": {}, "aliases": {}}
+    written = set()
+    total_in = total_out = 0
+
+    # logo-X après X : pour des sources identiques, c'est logo-X qui devient l'alias
+    paths = sorted({p for pattern in SOURCES for p in glob.glob(os.path.join(STATIC, pattern))},
+                   key=lambda p: (os.path.basename(p).startswith("logo-"), p))
+    by_digest = {}
+    for path in paths:
+        name = os.path.basename(path)
+        stem = os.path.splitext(name)[0]
+        with open(path, "rb") as f:
+            source_digest = hashlib.sha1(f.read()).hexdigest()
+        if source_digest in by_digest:
+            manifest["aliases"][name] = by_digest[source_digest]
+            print(f"[AVATARS] {name} = {by_digest[source_digest]}")
+            continue
+        by_digest[source_digest] = name
+        total_in += os.path.getsize(path)
+        with Image.open(path) as src:
+            src = src.convert("RGBA")
+            entry = {}
+            for size in sizes:
+                # Carré centré (les avatars sont affichés en object-fit: cover)
+                side = min(src.size)
+                left, top = (src.width - side) // 2, (src.height - side) // 2
+                img = src.crop((left, top, left + side, top + side)).resize((size, size), Image.LANCZOS)
+                entry[str(size)] = {}
+                for fmt in formats:
+                    data = encode(img, fmt)
+                    digest = hashlib.sha1(data).hexdigest()[:10]
+                    out_name = f"{stem}-{size}.{digest}.{fmt}"
+                    out_path = os.path.join(OUT_DIR, out_name)
+                    if not os.path.exists(out_path):
+                        with open(out_path, "wb") as f:
+                            f.write(data)
+                    written.add(out_path)
+                    total_out += len(data)
+                    entry[str(size)][fmt] = f"avatars/{out_name}"
+            manifest["images"][name] = entry
+        print(f"[AVATARS] {name}")
+
+    for stale in old_files - written:
+        os.remove(stale)
+    with open(os.path.join(OUT_DIR, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    print(f"[AVATARS] {len(manifest['images'])} images (+{len(manifest['aliases'])} alias), {len(written)} variantes — "
+          f"{total_in / 1e6:.1f} Mo sources → {total_out / 1e6:.1f} Mo toutes variantes confondues")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
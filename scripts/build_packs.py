@@ -0,0 +1,61 @@
+# scripts/build_packs.py — valide data/packs/*.yaml et construit le bundle data/packs.bundle.json
+#
+#   python scripts/build_packs.py [--out data/packs.bundle.json] [--check]
+#
+# Chaque pack est validé (utils/pack_bundle.validate_pack) : une seule erreur et rien
+# n'est écrit. Le bundle (JSON compact, hash de version calculé sur le sha1 des YAML)
+# est lu tel quel en production ; à relancer après toute modification d'un pack.
+# --check : n'écrit rien, code 1 si le bundle est absent ou ne correspond plus aux YAML.
+
+from __future__ import annotations
+
+import os
+import sys
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.pack_bundle import PackBundleError, build_bundle, dump_bundle, load_bundle, stale_packs
+
+PACKS_DIR = os.path.join(ROOT, "data", "packs")
+DEFAULT_OUT = os.path.join(ROOT, "data", "packs.bundle.json")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", default=DEFAULT_OUT)
+    ap.add_argument("--check", action="store_true", help="vérifier que le bundle est à jour, sans l'écrire")
+    args = ap.parse_args()
+    out = os.path.relpath(args.out, ROOT)
+
+    if args.check:
+        try:
+            bundle = load_bundle(args.out)
+        except (OSError, PackBundleError) as e:
+            print(f"{out} : {e}")
+            sys.exit(1)
+        stale = stale_packs(bundle, PACKS_DIR)
+        if stale:
+            print(f"{out} (version {bundle['version']}) périmé : {', '.join(stale)}")
+            sys.exit(1)
+        print(f"{out} à jour (version {bundle['version']}, {len(bundle['packs'])} packs)")
+        return
+
+    try:
+        bundle = build_bundle(PACKS_DIR)
+    except PackBundleError as e:
+        print(e)
+        for err in e.errors:
+            print(f"  {err}")
+        sys.exit(1)
+    raw = dump_bundle(bundle)
+    tmp = args.out + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    os.replace(tmp, args.out)
+    print(f"{len(bundle['packs'])} packs -> {out} (version {bundle['version']}, {len(raw) // 1024} Ko)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# scripts/import_bots.py — import en masse de bots dans la base (même validation que POST /api/bots/bulk)
+#
+#   DB_PATH=data/app.db python scripts/import_bots.py bots.jsonl [--format csv] [--dry-run] [--report rapport.json]
+#
+# Une ligne par bot : {"email": ..., "pack": ..., "name"?, "color"?, "avatar_file"?, "greeting"?,
+# "contact"?, "owner_name"?, "public_id"?} (JSON Lines) ou les mêmes colonnes en CSV.
+# Toutes les lignes valides sont écrites en une seule transaction ; les erreurs sont listées par ligne.
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path", help="fichier .jsonl / .csv ('-' = entrée standard)")
+    ap.add_argument("--format", choices=("jsonl", "csv"))
+    ap.add_argument("--dry-run", action="store_true", help="valider sans écrire")
+    ap.add_argument("--report", help="écrire le rapport complet (JSON) dans ce fichier")
+    args = ap.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    if args.path == "-":
+        data = sys.stdin.read()
+    else:
+        with open(args.path, "r", encoding="utf-8-sig") as f:
+            data = f.read()
+
+    from app import BOT_IMPORTER, DB_PATH
+
+    report = BOT_IMPORTER.run(data, fmt, dry_run=args.dry_run)
+    print(f"{DB_PATH} : {report['received']} lignes, {report['valid']} valides, {report['written']} écrites"
+          f"{' (dry-run)' if args.dry_run else ''}")
+    print(f"validation {report['validate_ms']} ms, écriture {report['write_ms']} ms, {report['rows_per_s']} lignes/s")
+    for err in report["errors"][:50]:
+        print(f"  ligne {err['line']} : {err['error']}")
+    if len(report["errors"]) > 50:
+        print(f"  … {len(report['errors']) - 50} autres erreurs")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if report["errors"] and not report["valid"] else 0)
+
+
+if __name__ == "__main__":
+    main()
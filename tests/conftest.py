@@ -0,0 +1,28 @@
+# tests/conftest.py — app importée sur une base SQLite jetable, sans clé Together ni Mailjet
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_TMP = tempfile.mkdtemp(prefix="betty-tests-")
+os.environ["DB_PATH"] = os.path.join(_TMP, "app.db")
+os.environ["TOGETHER_API_KEY"] = ""
+os.environ["MJ_API_KEY"] = ""
+os.environ["MJ_API_SECRET"] = ""
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+
+@pytest.fixture(scope="session")
+def betty():
+    import app
+    return app
+
+
+@pytest.fixture
+def client(betty):
+    return betty.app.test_client()
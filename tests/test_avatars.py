@@ -0,0 +1,33 @@
+# tests/test_avatars.py — les alias du manifest (sources identiques) renvoient aux variantes de l'image d'origine
+
+import os
+import json
+
+from utils.avatars import AvatarManifest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_alias_uses_original_variants(tmp_path):
+    (tmp_path / "avatars").mkdir()
+    entry = {"128": {"png": "avatars/avocat-128.aaaa.png", "webp": "avatars/avocat-128.bbbb.webp"}}
+    (tmp_path / "avatars" / "manifest.json").write_text(json.dumps({
+        "images": {"avocat.jpg": entry},
+        "aliases": {"logo-avocat.jpg": "avocat.jpg"},
+    }), encoding="utf-8")
+    manifest = AvatarManifest(str(tmp_path))
+
+    assert manifest.variant("logo-avocat.jpg", "image/webp") == "avatars/avocat-128.bbbb.webp"
+    assert manifest.variant("logo-avocat.jpg") == manifest.variant("avocat.jpg") == "avatars/avocat-128.aaaa.png"
+    assert manifest.variant("inconnu.jpg") is None
+
+
+def test_shipped_manifest_resolves_every_image():
+    static = os.path.join(ROOT, "static")
+    with open(os.path.join(static, "avatars", "manifest.json"), encoding="utf-8") as f:
+        data = json.load(f)
+    manifest = AvatarManifest(static)
+    for name in list(data["images"]) + list(data.get("aliases") or {}):
+        for accept in ("", "image/webp", "image/avif"):
+            path = manifest.variant(name, accept)
+            assert path and os.path.exists(os.path.join(static, path)), (name, accept)
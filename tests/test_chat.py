@@ -0,0 +1,24 @@
+# tests/test_chat.py — tour d'un bot acheté : réponse du parcours, sans prompt ni appel LLM
+
+import pytest
+
+
+@pytest.fixture
+def purchased_bot(betty):
+    betty.db_upsert_bot({
+        "public_id": "plombier-test", "bot_key": "betty_plombier", "pack": "betty_plombier",
+        "name": "Betty Plombier", "color": "#4F46E5", "avatar_file": "Betty_plombier.png", "greeting": "",
+        "buyer_email": "", "owner_name": "Client", "profile": {},
+    })
+    return "plombier-test"
+
+
+def test_scripted_turn_skips_prompt(betty, client, purchased_bot, monkeypatch):
+    monkeypatch.setattr(betty, "build_system_prompt", lambda *a, **k: pytest.fail("prompt construit"))
+    with betty.app.test_request_context("/api/bettybot", method="POST"):
+        ctx = betty._chat_context({"bot_id": purchased_bot, "message": "Bonjour", "conv_id": "c-scripted"})
+    assert ctx["scripted"] and ctx["system_prompt"] == ""
+
+    r = client.post("/api/bettybot", json={"bot_id": purchased_bot, "message": "Bonjour",
+                                          "conv_id": "c-scripted"})
+    assert r.status_code == 200 and r.get_json()["response"]
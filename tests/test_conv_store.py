@@ -0,0 +1,30 @@
+# tests/test_conv_store.py — expiration des conversations en mémoire par date d'écriture
+
+import time
+
+from utils.conv_store import MemoryConvStore
+
+
+def test_expired_conversation_evicted_even_if_recently_read():
+    store = MemoryConvStore(ttl=0.2)
+    store.set("a", {"history": ["a"]})
+    time.sleep(0.12)
+    store.set("b", {"history": ["b"]})
+    # Relue : "a" passe derrière "b" dans l'ordre LRU, mais reste la plus vieille écriture
+    assert store.get("a") == {"history": ["a"]}
+    time.sleep(0.1)
+
+    store.set("c", {"history": ["c"]})
+    stats = store.stats()
+    assert (stats["conversations"], stats["evicted_ttl"]) == (2, 1)
+    assert store.get("b") == {"history": ["b"]}
+
+
+def test_rewrite_refreshes_write_time():
+    store = MemoryConvStore(ttl=0.2)
+    store.set("a", {"n": 1})
+    time.sleep(0.12)
+    store.set("a", {"n": 2})
+    time.sleep(0.12)
+    store.set("b", {"n": 3})
+    assert store.get("a") == {"n": 2} and store.stats()["evicted_ttl"] == 0
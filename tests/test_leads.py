@@ -0,0 +1,123 @@
+# tests/test_leads.py — un lead complété en plusieurs tours reste un seul lead (registre et table leads)
+
+import hmac
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from utils import lead_store
+from utils.lead_ingest import LeadIngest
+from utils.lead_ledger import LeadLedger
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.messages = []
+
+    def enqueue(self, message, kind="", delay=0.0):
+        self.messages.append((kind, message))
+        return len(self.messages)
+
+    def replace_pending(self, message_id, message):
+        self.messages[message_id - 1] = (self.messages[message_id - 1][0], message)
+        return True
+
+
+@pytest.fixture
+def connect():
+    con = sqlite3.connect(":memory:")
+    con.row_factory = sqlite3.Row
+
+    @contextmanager
+    def _connect():
+        yield con
+    return _connect
+
+
+def test_ledger_email_then_phone_is_one_lead(connect):
+    outbox = FakeOutbox()
+    ledger = LeadLedger(connect, outbox)
+    with connect() as con:
+        ledger.init_db(con)
+    build = lambda lead, update: {"update": update, "lead": dict(lead)}
+
+    assert ledger.deliver("bot", {"name": "Jean", "email": "Jean@Ex.com"}, build, "conv-1") == "sent"
+    assert ledger.deliver("bot", {"name": "Jean", "email": "jean@ex.com", "phone": "06 12 34 56 78"},
+                          build, "conv-1") == "digest"
+    # Retrouvé par le seul téléphone depuis une autre conversation : rien de nouveau
+    assert ledger.deliver("bot", {"phone": "06 12 34 56 78"}, build, "conv-2") == "duplicate"
+
+    assert [kind for kind, _ in outbox.messages] == ["lead", "lead_digest"]
+    assert outbox.messages[1][1]["lead"]["phone"] == "06 12 34 56 78"
+    with connect() as con:
+        assert con.execute("SELECT COUNT(*) FROM lead_ledger").fetchone()[0] == 1
+
+
+def test_leads_table_email_then_phone_is_one_row(connect):
+    with connect() as con:
+        lead_store.init_db(con)
+        lead_store.upsert_rows(con, [
+            lead_store.lead_row({"public_id": "bot", "conv_id": "c", "email": "a@b.co"}, 1.0),
+            lead_store.lead_row({"public_id": "bot", "conv_id": "c", "email": "a@b.co", "phone": "0612345678",
+                                 "reason": "fuite"}, 2.0),
+        ])
+        rows = lead_store.fetch_page(con, "bot")
+    assert len(rows) == 1
+    assert (rows[0]["email"], rows[0]["phone"], rows[0]["reason"]) == ("a@b.co", "0612345678", "fuite")
+
+
+def test_export_refused_with_default_secret(betty, client, monkeypatch):
+    forged = hmac.new(betty.DEFAULT_SECRET_KEY.encode(), b"leads:bot", hashlib.sha256).hexdigest()[:32]
+    assert betty.LEADS_EXPORT_SECRET == ""
+    assert betty.leads_export_url("bot") == ""
+    for path in ("/api/leads", "/api/leads/export"):
+        assert client.get(path, query_string={"public_id": "bot", "token": forged}).status_code == 401
+
+    monkeypatch.setattr(betty, "LEADS_EXPORT_SECRET", "s3cret")
+    token = betty.leads_export_token("bot")
+    assert token != forged
+    assert client.get("/api/leads", query_string={"public_id": "bot", "token": token}).status_code == 200
+    assert client.get("/api/leads", query_string={"public_id": "bot", "token": forged}).status_code == 401
+
+
+def test_ingest_wait_returns_once_committed(tmp_path):
+    path = str(tmp_path / "leads.db")
+
+    @contextmanager
+    def connect():
+        con = sqlite3.connect(path)
+        con.row_factory = sqlite3.Row
+        try:
+            yield con
+        finally:
+            con.close()
+
+    ingest = LeadIngest(connect, flush_interval=60)
+    with connect() as con:
+        ingest.init_db(con)
+        con.commit()
+    try:
+        assert ingest.submit({"public_id": "bot", "email": "a@b.co"}, wait=5)
+        with connect() as con:
+            assert len(lead_store.fetch_page(con, "bot")) == 1
+    finally:
+        ingest.stop()
+
+
+def test_ingest_sync_writes_without_thread(connect):
+    ingest = LeadIngest(connect, sync=True)
+    with connect() as con:
+        ingest.init_db(con)
+    assert ingest.submit({"public_id": "bot", "phone": "0612345678"})
+    assert ingest._thread is None and ingest.pending() == 0
+    with connect() as con:
+        assert len(lead_store.fetch_page(con, "bot")) == 1
+
+
+def test_api_lead_answers_after_write(betty, client):
+    r = client.post("/api/lead", json={"bot_id": "bot-api-lead", "email": "x@y.fr", "name": "X"})
+    assert r.status_code == 201
+    with betty.db_connect() as con:
+        assert [row["email"] for row in lead_store.fetch_page(con, "bot-api-lead")] == ["x@y.fr"]
@@ -0,0 +1,80 @@
+# tests/test_llm_client.py — refus 4xx et disjoncteur, clients synchrone et asynchrone
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.llm_async import AsyncLLMClient
+from utils.llm_client import LLMClient, CircuitBreaker
+
+
+@pytest.fixture
+def provider():
+    """Faux fournisseur local : répond avec le statut de `state["status"]`."""
+    state = {"status": 401, "calls": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            state["calls"] += 1
+            body = b'{"error": {"message": "refus"}}'
+            self.send_response(state["status"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/chat/completions", state
+    server.shutdown()
+
+
+def _client(url, **kw):
+    return LLMClient(url, "mauvaise-cle", "m", breaker=CircuitBreaker(threshold=3, cooldown=60), **kw)
+
+
+def test_bad_key_trips_breaker(provider):
+    url, state = provider
+    client = _client(url)
+    for _ in range(5):
+        assert client.complete([{"role": "user", "content": "x"}]) == ""
+    assert state["calls"] == 3
+    assert client.breaker.state == "open" and client.short_circuits == 2
+
+
+def test_bad_request_leaves_breaker_alone(provider):
+    url, state = provider
+    state["status"] = 400
+    client = _client(url)
+    client.breaker.failures = 2
+    assert client.complete([{"role": "user", "content": "x"}]) == ""
+    assert client.breaker.failures == 2 and client.breaker.state == "closed"
+
+
+def test_zero_attempts_is_clamped(provider):
+    url, state = provider
+    client = _client(url, max_attempts=0)
+    assert client.max_attempts == 1
+    assert client.complete([{"role": "user", "content": "x"}]) == ""
+    assert state["calls"] == 1
+
+
+def test_async_bad_key_trips_shared_breaker(provider):
+    url, state = provider
+    client = AsyncLLMClient(_client(url))
+
+    async def run():
+        try:
+            for _ in range(4):
+                assert await client.complete([{"role": "user", "content": "x"}]) == ""
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert state["calls"] == 3 and client.breaker.state == "open"
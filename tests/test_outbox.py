@@ -0,0 +1,63 @@
+# tests/test_outbox.py — en serverless (inline), l'email part dans la requête qui le met en file
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.outbox import MailOutbox
+
+
+@pytest.fixture
+def mailjet():
+    """Faux Mailjet local : enregistre chaque lot reçu et répond success par message."""
+    batches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            batches.append(body["Messages"])
+            out = json.dumps({"Messages": [{"Status": "success"} for _ in body["Messages"]]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v3.1/send", batches
+    server.shutdown()
+
+
+@pytest.fixture
+def connect():
+    con = sqlite3.connect(":memory:")
+    con.row_factory = sqlite3.Row
+
+    @contextmanager
+    def _connect():
+        yield con
+    return _connect
+
+
+def test_inline_outbox_sends_before_enqueue_returns(mailjet, connect):
+    url, batches = mailjet
+    outbox = MailOutbox(connect, auth=("k", "s"), url=url, inline=True)
+    with connect() as con:
+        outbox.init_db(con)
+
+    outbox.enqueue({"Subject": "lead"}, kind="lead")
+    assert batches == [[{"Subject": "lead"}]]
+    assert outbox.depth() == 0
+    assert outbox._thread is None
+
+    # Différé (digest) : reste en file, sans appel Mailjet
+    outbox.enqueue({"Subject": "digest"}, kind="lead_digest", delay=900)
+    assert len(batches) == 1 and outbox.depth() == 1
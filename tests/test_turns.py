@@ -0,0 +1,69 @@
+# tests/test_turns.py — doublons concurrents d'un même tour de chat (SingleFlight)
+
+import threading
+
+import pytest
+
+from utils.singleflight import SingleFlight, StillRunning
+
+
+def _slow_leader(flight, key, release, result):
+    started = threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return result
+
+    t = threading.Thread(target=lambda: flight.do(key, work))
+    t.start()
+    started.wait(5)
+    return t
+
+
+def test_follower_gets_leader_result():
+    flight, release = SingleFlight(), threading.Event()
+    t = _slow_leader(flight, "k", release, {"response": "ok"})
+    threading.Timer(0.05, release.set).start()
+    assert flight.do("k", lambda: pytest.fail("doublon exécuté"), timeout=5) == {"response": "ok"}
+    t.join(5)
+    assert flight.stats()["shared"] == 1
+
+
+def test_follower_timeout_raises_still_running_and_leader_completes():
+    flight, release = SingleFlight(), threading.Event()
+    t = _slow_leader(flight, "k", release, {"response": "ok"})
+    with pytest.raises(StillRunning):
+        flight.do("k", lambda: pytest.fail("doublon exécuté"), timeout=0.05)
+    release.set()
+    t.join(5)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_bettybot_follower_timeout_returns_202(betty, client, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(betty, "TURN_WAIT", 0.05)
+    monkeypatch.setattr(betty, "_chat_turn", lambda ctx: release.wait(5) and {"response": "ok", "stage": None})
+    payload = {"bot_id": "spectra-demo", "conv_id": "dup-timeout", "message": "Bonjour"}
+
+    leader = {}
+    t = threading.Thread(target=lambda: leader.update(r=client.post("/api/bettybot", json=payload)))
+    t.start()
+    for _ in range(500):
+        if betty.TURNS.stats()["in_flight"]:
+            break
+        threading.Event().wait(0.01)
+
+    r = betty.app.test_client().post("/api/bettybot", json=payload)
+    assert r.status_code == 202
+    assert r.headers["Retry-After"] == betty.PENDING_RETRY_AFTER
+    assert r.get_json()["pending"] is True
+
+    r = betty.app.test_client().post("/api/chat", json=payload)
+    assert r.status_code == 202
+    assert r.get_json()["stage"] is None
+
+    release.set()
+    t.join(5)
+    assert leader["r"].status_code == 200
+    assert leader["r"].get_json()["response"] == "ok"
@@ -0,0 +1,65 @@
+# utils/avatars.py — choix de la variante d'avatar (taille + format) d'après static/avatars/manifest.json
+
+from __future__ import annotations
+
+import os
+import json
+
+# Taille par défaut : en-tête du chat affiché en 64px, x2 pour les écrans HiDPI
+DEFAULT_AVATAR_SIZE = 128
+
+
+class AvatarManifest:
+    """
+    Lit le manifest produit par scripts/build_avatars.py (relu si son mtime change).
+    Sans manifest, `variant()` renvoie None et l'appelant garde le fichier original.
+    Les `aliases` (sources identiques, ex. logo-avocat.jpg) pointent vers l'image dont
+    ils partagent les variantes.
+    """
+
+    def __init__(self, static_dir: str):
+        self.path = os.path.join(static_dir, "avatars", "manifest.json")
+        self._mtime = None
+        self._images: dict = {}
+        self._aliases: dict = {}
+
+    def _load(self) -> dict:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._mtime, self._images, self._aliases = None, {}, {}
+            return self._images
+        if mtime != self._mtime:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f) or {}
+                self._images = manifest.get("images") or {}
+                self._aliases = manifest.get("aliases") or {}
+            except Exception:
+                self._images, self._aliases = {}, {}
+            self._mtime = mtime
+        return self._images
+
+    @staticmethod
+    def best_format(accept: str, available) -> str | None:
+        accept = (accept or "").lower()
+        for fmt in ("avif", "webp"):
+            if fmt in available and f"image/{fmt}" in accept:
+                return fmt
+        if "png" in available:
+            return "png"
+        return next(iter(available), None)
+
+    def variant(self, filename: str, accept: str = "", size: int = DEFAULT_AVATAR_SIZE) -> str | None:
+        """Chemin relatif à /static de la meilleure variante, ou None."""
+        images = self._load()
+        name = os.path.basename(filename or "")
+        entry = images.get(self._aliases.get(name, name))
+        if not entry:
+            return None
+        sizes = sorted(int(s) for s in entry)
+        # Plus petite taille >= demandée, sinon la plus grande disponible
+        chosen = next((s for s in sizes if s >= size), sizes[-1])
+        formats = entry[str(chosen)]
+        fmt = self.best_format(accept, formats)
+        return formats.get(fmt) if fmt else None
@@ -0,0 +1,78 @@
+# utils/cache.py — petit cache LRU à expiration (TTL), thread-safe
+
+from __future__ import annotations
+
+import time
+import threading
+from collections import OrderedDict
+
+MISS = object()
+
+
+class TTLCache:
+    """
+    LRU borné à `max_items` entrées, chacune valable `ttl` secondes.
+    `None` est une valeur cachable (cache négatif), avec son propre `negative_ttl`.
+    `get()` renvoie `MISS` quand la clé est absente ou expirée.
+    """
+
+    def __init__(self, max_items: int = 1024, ttl: float = 60.0, negative_ttl: float | None = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return MISS
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            if value is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.negative_hits) / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,72 @@
+# utils/context.py — fenêtre d'historique bornée par un budget de tokens (au lieu des 6 derniers messages)
+
+from __future__ import annotations
+
+import re
+
+# Approximation locale d'un tokenizer BPE : ~1 token par mot court ou signe,
+# ~4 caractères par token pour les mots longs
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+MESSAGE_OVERHEAD = 4  # rôle + délimiteurs du format chat
+
+LEAD_LABELS = (
+    ("name", "Nom"),
+    ("phone", "Téléphone"),
+    ("email", "Email"),
+    ("reason", "Motif"),
+    ("availability", "Disponibilités"),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return sum((len(p) + 3) // 4 for p in _PIECE_RE.findall(text or ""))
+
+
+def message_tokens(message: dict) -> int:
+    return MESSAGE_OVERHEAD + estimate_tokens(message.get("content") or "")
+
+
+def lead_summary(lead: dict | None) -> str:
+    """Résumé compact des champs déjà extraits, en remplacement des anciens tours."""
+    parts = [f"{label} : {(lead or {}).get(key)}" for key, label in LEAD_LABELS if (lead or {}).get(key)]
+    if not parts:
+        return ""
+    return "Informations déjà recueillies auprès du visiteur (ne pas redemander) : " + " ; ".join(parts) + "."
+
+
+class ContextBuilder:
+    """
+    Construit la liste de messages envoyée au modèle dans `budget` tokens estimés :
+    prompt système + message courant toujours présents, puis les tours les plus récents
+    tant qu'ils tiennent. Les tours écartés sont remplacés par le résumé du lead,
+    ajouté au prompt système. Au moins `min_recent` messages récents sont gardés.
+    """
+
+    def __init__(self, budget: int = 1000, min_recent: int = 1):
+        self.budget = budget
+        self.min_recent = min_recent
+
+    def build(self, system_prompt: str, history: list, user_input: str,
+              summary: str = "") -> tuple[list, int]:
+        """Renvoie (messages, tokens d'entrée estimés)."""
+        history = list(history or [])
+        user_msg = {"role": "user", "content": user_input}
+        fixed = MESSAGE_OVERHEAD + estimate_tokens(system_prompt) + message_tokens(user_msg)
+        costs = [message_tokens(m) for m in history]
+
+        if fixed + sum(costs) <= self.budget:
+            kept, total, system = history, fixed + sum(costs), system_prompt
+        else:
+            system = f"{system_prompt}\n\n{summary}" if summary else system_prompt
+            total = fixed + (estimate_tokens(summary) if summary else 0)
+            start = len(history)
+            while start > 0:
+                cost = costs[start - 1]
+                if total + cost > self.budget and len(history) - start >= self.min_recent:
+                    break
+                total += cost
+                start -= 1
+            kept = history[start:]
+
+        messages = [{"role": "system", "content": system}, *kept, user_msg]
+        return messages, total
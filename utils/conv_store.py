@@ -0,0 +1,304 @@
+# utils/conv_store.py — stockage des conversations (mémoire LRU+TTL, SQLite, partagé)
+#
+# Une conversation est un enregistrement JSON : {"history": [...], "lead": {...}}.
+# `get()` renvoie None si la conversation est inconnue ou expirée.
+
+from __future__ import annotations
+
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+def _encode(record) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode(raw):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except Exception:
+        return None
+
+
+class MemoryConvStore:
+    """
+    Conversations en mémoire du process (sérialisées, donc isolées des appelants),
+    bornées en nombre (`max_items`) et en octets (`max_bytes`). Les entrées plus vieilles
+    que `ttl` secondes sans écriture sont considérées comme expirées.
+    """
+
+    def __init__(self, max_items: int = 5000, max_bytes: int = 32 * 1024 * 1024, ttl: float = 6 * 3600):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # `_data` : ordre de lecture (LRU) ; `_written` : heure d'écriture, dans l'ordre
+        # d'écriture (un dict réinséré à chaque set), donc les plus vieilles écritures en tête
+        self._data: OrderedDict[str, tuple[float, int, str]] = OrderedDict()
+        self._written: dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.evicted_bytes = 0
+
+    def init_db(self, con):
+        pass
+
+    def _drop(self, key: str):
+        _, size, _ = self._data.pop(key)
+        del self._written[key]
+        self._bytes -= size
+
+    def get(self, conv_id: str):
+        with self._lock:
+            item = self._data.get(conv_id)
+            if not item:
+                return None
+            ts, _, raw = item
+            if time.time() - ts > self.ttl:
+                self._drop(conv_id)
+                self.evicted_ttl += 1
+                return None
+            self._data.move_to_end(conv_id)
+        return _decode(raw)
+
+    def set(self, conv_id: str, record):
+        raw = _encode(record)
+        size = len(conv_id) + len(raw.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            if conv_id in self._data:
+                self._drop(conv_id)
+            self._data[conv_id] = (now, size, raw)
+            self._written[conv_id] = now
+            self._bytes += size
+            # D'abord les expirées, par date d'écriture (une conversation relue récemment
+            # peut être expirée sans être en tête du LRU)
+            while self._written:
+                key, ts = next(iter(self._written.items()))
+                if now - ts <= self.ttl:
+                    break
+                self._drop(key)
+                self.evicted_ttl += 1
+            # Puis les moins récemment lues au-delà des plafonds
+            while self._data:
+                key = next(iter(self._data))
+                if len(self._data) > self.max_items:
+                    self._drop(key)
+                    self.evicted_lru += 1
+                    continue
+                if self._bytes > self.max_bytes and key != conv_id:
+                    self._drop(key)
+                    self.evicted_bytes += 1
+                    continue
+                break
+
+    def delete(self, conv_id: str):
+        with self._lock:
+            if conv_id in self._data:
+                self._drop(conv_id)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "conversations": len(self._data),
+            "bytes": self._bytes,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_bytes": self.evicted_bytes,
+        }
+
+
+CONV_DDL = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conv_id      TEXT PRIMARY KEY,
+    history_json TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    updated_at   REAL NOT NULL
+)
+"""
+CONV_INDEX = "CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at)"
+
+
+class SQLiteConvStore:
+    """
+    Conversations dans la base SQLite de l'app : partagés entre workers d'une même
+    machine. L'éviction (TTL puis plus anciennes au-delà des plafonds) est faite
+    toutes les `prune_every` écritures.
+    """
+
+    def __init__(self, connect, max_items: int = 100000, max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 6 * 3600, prune_every: int = 200):
+        self.connect = connect
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.evicted_lru = 0
+        self.evicted_ttl = 0
+        self.evicted_bytes = 0
+
+    def init_db(self, con):
+        con.execute(CONV_DDL)
+        con.execute(CONV_INDEX)
+
+    def get(self, conv_id: str):
+        with self.connect() as con:
+            row = con.execute(
+                "SELECT history_json FROM conversations WHERE conv_id = ? AND updated_at >= ?",
+                (conv_id, time.time() - self.ttl)
+            ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def set(self, conv_id: str, record):
+        raw = _encode(record)
+        with self.connect() as con:
+            con.execute(
+                """INSERT INTO conversations(conv_id, history_json, size, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(conv_id) DO UPDATE SET history_json=excluded.history_json,
+                   size=excluded.size, updated_at=excluded.updated_at""",
+                (conv_id, raw, len(raw.encode("utf-8")), time.time())
+            )
+            con.commit()
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.prune_every == 0
+        if due:
+            self.prune()
+
+    def delete(self, conv_id: str):
+        with self.connect() as con:
+            con.execute("DELETE FROM conversations WHERE conv_id = ?", (conv_id,))
+            con.commit()
+
+    def prune(self):
+        with self.connect() as con:
+            cur = con.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl,))
+            self.evicted_ttl += max(cur.rowcount, 0)
+            count, total = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conversations").fetchone()
+            if count > self.max_items:
+                cur = con.execute(
+                    "DELETE FROM conversations WHERE conv_id IN "
+                    "(SELECT conv_id FROM conversations ORDER BY updated_at LIMIT ?)",
+                    (count - self.max_items,)
+                )
+                self.evicted_lru += max(cur.rowcount, 0)
+            if total > self.max_bytes:
+                # Supprime les plus anciennes jusqu'à repasser sous le plafond
+                cur = con.execute(
+                    """DELETE FROM conversations WHERE conv_id IN (
+                         SELECT conv_id FROM (
+                           SELECT conv_id, SUM(size) OVER (ORDER BY updated_at DESC) AS running
+                           FROM conversations) WHERE running > ?)""",
+                    (self.max_bytes,)
+                )
+                self.evicted_bytes += max(cur.rowcount, 0)
+            con.commit()
+
+    def stats(self) -> dict:
+        with self.connect() as con:
+            count, total = con.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conversations").fetchone()
+        return {
+            "backend": "sqlite",
+            "conversations": count,
+            "bytes": total,
+            "evicted_lru": self.evicted_lru,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_bytes": self.evicted_bytes,
+        }
+
+
+class LocalKV:
+    """Remplaçant local d'un serveur clé-valeur (sous-ensemble de l'API redis-py)."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if not item:
+                return None
+            exp, value = item
+            if exp is not None and exp < time.time():
+                self._data.pop(key, None)
+                return None
+            return value
+
+    def set(self, key: str, value, ex: int | None = None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[key] = ((time.time() + ex) if ex else None, value)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for k in keys if self._data.pop(k, None) is not None)
+
+    def dbsize(self) -> int:
+        return len(self._data)
+
+
+class SharedConvStore:
+    """
+    Conversations dans un serveur clé-valeur partagé par tous les workers/machines
+    (client compatible redis-py : get / set(ex=) / delete). Le TTL et l'éviction
+    sont délégués au serveur (`maxmemory-policy allkeys-lru` côté Redis).
+    """
+
+    def __init__(self, client, ttl: float = 6 * 3600, prefix: str = "betty:conv:"):
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def init_db(self, con):
+        pass
+
+    def get(self, conv_id: str):
+        try:
+            raw = self.client.get(self.prefix + conv_id)
+        except Exception as e:
+            print("[CONV][SHARED][EXC]", type(e).__name__, e)
+            return None
+        return _decode(raw)
+
+    def set(self, conv_id: str, record):
+        try:
+            self.client.set(self.prefix + conv_id, _encode(record), ex=self.ttl)
+        except Exception as e:
+            print("[CONV][SHARED][EXC]", type(e).__name__, e)
+
+    def delete(self, conv_id: str):
+        try:
+            self.client.delete(self.prefix + conv_id)
+        except Exception as e:
+            print("[CONV][SHARED][EXC]", type(e).__name__, e)
+
+    def stats(self) -> dict:
+        try:
+            count = self.client.dbsize()
+        except Exception:
+            count = None
+        return {"backend": "shared", "conversations": count}
+
+
+def make_conv_store(kind: str, connect=None, url: str = "", max_items: int = 5000,
+                    max_bytes: int = 32 * 1024 * 1024, ttl: float = 6 * 3600):
+    """Fabrique selon CONV_STORE : memory (défaut), sqlite, redis (REDIS_URL) ou local (LocalKV)."""
+    kind = (kind or "memory").lower()
+    if kind == "sqlite":
+        return SQLiteConvStore(connect, max_items=max_items, max_bytes=max_bytes, ttl=ttl)
+    if kind == "redis":
+        import redis  # dépendance optionnelle, seulement pour ce backend
+        return SharedConvStore(redis.Redis.from_url(url), ttl=ttl)
+    if kind == "local":
+        return SharedConvStore(LocalKV(), ttl=ttl)
+    return MemoryConvStore(max_items=max_items, max_bytes=max_bytes, ttl=ttl)
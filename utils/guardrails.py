@@ -0,0 +1,79 @@
+# utils/guardrails.py — moteur de garde-fous : tous les motifs compilés une fois, un seul passage par texte
+
+from __future__ import annotations
+
+import re
+
+# Motifs communes à tous les packs (nom -> liste d'expressions, OR entre elles)
+DEFAULT_PATTERNS = {
+    "intent_rdv": [r"\b(rendez[- ]?vous|rdv|prise? (de )?rendez[- ]?vous|prendre un rdv|booking|appointment)\b"],
+    "consent":    [r"\b(oui|ok|okay|yes|si|d['’ ]?accord|vas[- ]?y|go|let.?s go|ça marche|ca marche)\b"],
+    "who_are_you": [r"\b(qui es[- ]?tu|t'es qui|tu es qui)\b"],
+}
+
+_NAME_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class GuardrailEngine:
+    """
+    Regroupe tous les motifs dans une seule regex à groupes nommés :
+    `scan(text)` parcourt le texte une fois et renvoie l'ensemble des noms trouvés.
+    """
+
+    def __init__(self, patterns: dict[str, list[str]] | None = None):
+        self.patterns = {k: list(v) for k, v in (patterns or DEFAULT_PATTERNS).items()}
+        parts = []
+        for name, exprs in self.patterns.items():
+            if not _NAME_RE.match(name) or not exprs:
+                continue
+            alts = "|".join(f"(?:{e})" for e in exprs)
+            parts.append(f"(?P<{name}>{alts})")
+        self.regex = re.compile("|".join(parts), re.IGNORECASE) if parts else None
+
+    def scan(self, text: str) -> set[str]:
+        if not text or self.regex is None:
+            return set()
+        found = set()
+        for m in self.regex.finditer(text):
+            found.add(m.lastgroup)
+            if len(found) == len(self.patterns):
+                break
+        return found
+
+    @classmethod
+    def from_pack(cls, pack_data: dict | None) -> "GuardrailEngine":
+        """
+        Motifs par défaut + ceux du YAML du pack, par ex. :
+            guardrails:
+              intent_rdv: ["\\bdevis\\b", "\\bintervention\\b"]
+        """
+        patterns = {k: list(v) for k, v in DEFAULT_PATTERNS.items()}
+        extra = (pack_data or {}).get("guardrails") or {}
+        if isinstance(extra, dict):
+            for name, exprs in extra.items():
+                if isinstance(exprs, str):
+                    exprs = [exprs]
+                valid = []
+                for e in exprs or []:
+                    try:
+                        re.compile(e)
+                        valid.append(e)
+                    except re.error:
+                        print("[GUARDRAILS] motif invalide ignoré :", name, e)
+                patterns.setdefault(str(name), []).extend(valid)
+        return cls(patterns)
+
+
+DEFAULT_ENGINE = GuardrailEngine()
+_engines: dict[str, tuple[dict, GuardrailEngine]] = {}
+
+def engine_for_pack(name: str, pack_data: dict | None) -> GuardrailEngine:
+    """Moteur compilé une fois par pack ; recompilé si le registre a rechargé le YAML."""
+    if not pack_data or not pack_data.get("guardrails"):
+        return DEFAULT_ENGINE
+    cached = _engines.get(name)
+    if cached and cached[0] is pack_data:
+        return cached[1]
+    engine = GuardrailEngine.from_pack(pack_data)
+    _engines[name] = (pack_data, engine)
+    return engine
@@ -0,0 +1,155 @@
+# utils/lead.py — extraction incrémentale du lead (un seul message analysé par tour)
+
+from __future__ import annotations
+
+import re
+
+from utils.qualification import DEFAULT_FLOW
+
+EMAIL_RE    = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+', re.I)
+PHONE_RE    = re.compile(r'(\+?\d[\d \.\-\(\)]{6,})')
+NAME_RE     = re.compile(r"(?:je m(?:'|e)appelle|nom\s*:?)\s*([A-Za-zÀ-ÖØ-öø-ÿ'\-\s]{2,80})", re.I)
+CLEAN_NAME_RE = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ' \-]{3,80}")
+DIGIT_RE    = re.compile(r'\d')
+REASON_RE   = re.compile(r'(?:souhaite|veux|voudrais|besoin|motif|pour)\s*:?(.{5,140})', re.I)
+AVAIL_RE    = re.compile(r'(demain|matin|après-midi|soir|lundi|mardi|mercredi|jeudi|vendredi)[^\.!?]{0,60}', re.I)
+NAME_STOPWORDS = ("bonjour", "bonsoir", "merci", "svp", "rdv", "rendez", "appel", "mail")
+
+
+class LeadState:
+    """
+    État du lead sauvegardé avec la conversation et mis à jour avec le seul
+    dernier message utilisateur. Mêmes règles que l'ancienne extraction sur
+    tout l'historique : premier email / téléphone / motif / disponibilité
+    trouvés, nom explicite (« je m'appelle… ») prioritaire, sinon le dernier
+    message « propre » de 2 à 3 mots.
+    """
+
+    __slots__ = ("reason", "email", "phone", "name_explicit", "name_guess", "availability",
+                 "intent_rdv", "turns", "asked")
+
+    def __init__(self):
+        self.reason = ""
+        self.email = ""
+        self.phone = ""
+        self.name_explicit = ""
+        self.name_guess = ""
+        self.availability = ""
+        # Intention de rendez-vous déjà exprimée dans la conversation (garde-fous)
+        self.intent_rdv = False
+        self.turns = 0
+        # Champ demandé par la dernière question du parcours de qualification
+        self.asked = ""
+
+    @property
+    def name(self) -> str:
+        return self.name_explicit or self.name_guess
+
+    def update(self, message: str) -> "LeadState":
+        msg = (message or "").strip()
+        self.turns += 1
+        if not msg:
+            return self
+
+        if not self.email:
+            m = EMAIL_RE.search(msg)
+            if m:
+                self.email = m.group(0)
+
+        if not self.phone:
+            m = PHONE_RE.search(msg)
+            if m:
+                self.phone = re.sub(r'[^0-9\+]', '', m.group(1)).strip()
+
+        if not self.name_explicit:
+            m = NAME_RE.search(msg)
+            if m:
+                self.name_explicit = m.group(1).strip()
+
+        # Nom de repli : message composé uniquement de 2 à 3 mots (pas de chiffres, pas d'@)
+        if '@' not in msg and not DIGIT_RE.search(msg) and CLEAN_NAME_RE.fullmatch(msg):
+            tokens = [t for t in re.split(r"\s+", msg) if t]
+            lower = msg.lower()
+            if 2 <= len(tokens) <= 3 and not any(w in lower for w in NAME_STOPWORDS):
+                self.name_guess = " ".join(t.capitalize() for t in tokens)
+
+        if not self.reason:
+            m = REASON_RE.search(msg)
+            if m:
+                self.reason = m.group(1).strip()
+
+        if not self.availability:
+            m = AVAIL_RE.search(msg)
+            if m:
+                self.availability = m.group(0).strip()
+
+        # Réponse libre à la question posée (« décrivez votre besoin… ») : prise telle quelle
+        if self.asked in ("reason", "availability") and not getattr(self, self.asked):
+            if not EMAIL_RE.search(msg) and not PHONE_RE.search(msg):
+                setattr(self, self.asked, msg[:140])
+        return self
+
+    def seed(self, fields: dict) -> "LeadState":
+        """Champs déjà collectés ailleurs (formulaire de l'embed) : repris tels quels, plus extraits."""
+        for key in ("reason", "email", "phone", "availability"):
+            if fields.get(key):
+                setattr(self, key, fields[key])
+        if fields.get("name"):
+            self.name_explicit = fields["name"]
+        return self
+
+    def as_lead(self, flow=None) -> dict:
+        """Lead courant ; "ready" seulement quand le parcours du pack (`flow`) n'a plus d'étape."""
+        lead = {
+            "reason": self.reason,
+            "email": self.email,
+            "phone": self.phone,
+            "name": self.name,
+            "availability": self.availability,
+        }
+        lead["stage"] = "ready" if (flow or DEFAULT_FLOW).next_step(lead) is None else "collecting"
+        return lead
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "LeadState":
+        state = cls()
+        for k in cls.__slots__:
+            if data and k in data:
+                setattr(state, k, data[k])
+        return state
+
+    @classmethod
+    def from_history(cls, history: list) -> "LeadState":
+        state = cls()
+        for m in history or []:
+            if m.get("role") == "user":
+                state.update(m.get("content") or "")
+        return state
+
+
+# Clés du lead tenu par l'embed (templates/embed.html) => clés LeadState
+CLIENT_LEAD_KEYS = {
+    "email": "email", "telephone": "phone", "phone": "phone",
+    "besoin": "reason", "motif": "reason", "reason": "reason",
+    "disponibilite": "availability", "availability": "availability",
+}
+
+
+def client_lead_fields(raw) -> dict:
+    """Lead envoyé par le client ({nom, prenom, telephone, email…}) => champs LeadState non vides."""
+    if not isinstance(raw, dict):
+        return {}
+    out = {}
+    for key, field in CLIENT_LEAD_KEYS.items():
+        value = str(raw.get(key) or "").strip()[:140]
+        if value and field not in out:
+            out[field] = value
+    name = " ".join(str(raw.get(k) or "").strip() for k in ("prenom", "nom")).strip() or str(raw.get("name") or "").strip()
+    if name:
+        out["name"] = name[:80]
+    if out.get("email") and not EMAIL_RE.fullmatch(out["email"]):
+        del out["email"]
+    return out
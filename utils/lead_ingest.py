@@ -0,0 +1,139 @@
+# utils/lead_ingest.py — écriture groupée des leads dans la table `leads` (une transaction par lot)
+
+from __future__ import annotations
+
+import time
+import threading
+from collections import deque
+
+from utils import lead_store
+
+
+class LeadIngest:
+    """
+    Les routes appellent `submit()` (ajout en mémoire, O(1)) et rendent la main ;
+    un lead déjà connu (même bot, même empreinte email/téléphone) est complété.
+    Un thread de fond vide la file par lots de `batch_size` lignes, écrits dans une
+    seule transaction (un commit par lot), au plus tard `flush_interval`
+    secondes après l'arrivée d'un lead. Au-delà de `max_queue` leads en attente
+    (base bloquée), `submit()` refuse plutôt que de consommer toute la mémoire.
+    `submit(lead, wait=s)` attend (au plus `s` secondes) que le lot contenant le lead soit
+    commité : réponse seulement une fois le lead écrit, les écritures concurrentes restant
+    groupées. `sync=True` (serverless : pas de thread qui survive à la réponse, pas
+    d'atexit à l'arrêt de l'instance) : chaque `submit()` écrit la file dans l'appel même.
+    """
+
+    def __init__(self, connect, batch_size: int = 200, flush_interval: float = 0.5, max_queue: int = 10000,
+                 sync: bool = False):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.sync = sync
+        # File de (numéro, ligne) ; `_committed` = numéro de la dernière ligne commitée
+        self._queue: deque = deque()
+        self._seq = 0
+        self._committed = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.rejected = 0
+
+    def init_db(self, con):
+        lead_store.init_db(con)
+
+    def submit(self, lead: dict, wait: float = 0.0) -> bool:
+        """
+        Met un lead en file. False si la file est pleine, ou si le lead n'est pas écrit
+        (mode `sync`, ou dans les `wait` secondes) ; il reste alors en file pour le lot suivant.
+        """
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            return False
+        row = lead_store.lead_row(lead, time.time())
+        with self._cond:
+            self._seq += 1
+            seq = self._seq
+            self._queue.append((seq, row))
+        if self.sync:
+            try:
+                self.flush()
+            except Exception as e:
+                print("[LEADS][INGEST][EXC]", type(e).__name__, e)
+                return False
+            return True
+        self.start()
+        if wait > 0 or len(self._queue) >= self.batch_size:
+            self._wake.set()
+        if wait > 0:
+            with self._cond:
+                return self._cond.wait_for(lambda: self._committed >= seq, wait)
+        return True
+
+    def flush(self) -> int:
+        """Écrit tout ce qui est en file (lots de `batch_size`). Renvoie le nombre de lignes écrites."""
+        total = 0
+        with self._flush_lock:
+            while self._queue:
+                rows = []
+                while self._queue and len(rows) < self.batch_size:
+                    rows.append(self._queue.popleft())
+                try:
+                    with self.connect() as con:
+                        lead_store.upsert_rows(con, [row for _, row in rows])
+                        con.commit()
+                except Exception:
+                    # Remis en tête de file, dans l'ordre, pour le prochain passage
+                    self._queue.extendleft(reversed(rows))
+                    raise
+                with self._cond:
+                    self._committed = rows[-1][0]
+                    self._cond.notify_all()
+                total += len(rows)
+                self.written += len(rows)
+                self.batches += 1
+        return total
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._queue),
+            "written": self.written,
+            "batches": self.batches,
+            "rejected": self.rejected,
+        }
+
+    # ---- Thread de fond ----
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print("[LEADS][INGEST][EXC]", type(e).__name__, e)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lead-ingest", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Arrête le thread et écrit les leads restants."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
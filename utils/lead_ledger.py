@@ -0,0 +1,172 @@
+# utils/lead_ledger.py — registre des leads transmis : un lead complet part une fois, les mises à jour en digest
+
+from __future__ import annotations
+
+import re
+import json
+import time
+import hashlib
+import threading
+
+LEDGER_DDL = """
+CREATE TABLE IF NOT EXISTS lead_ledger (
+    public_id     TEXT NOT NULL,
+    fingerprint   TEXT NOT NULL,
+    lead_json     TEXT NOT NULL,
+    digest_id     INTEGER,
+    updates       INTEGER NOT NULL DEFAULT 0,
+    first_sent_at REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    email_key     TEXT NOT NULL DEFAULT '',
+    phone_key     TEXT NOT NULL DEFAULT '',
+    conv_key      TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (public_id, fingerprint)
+)
+"""
+# Colonnes de rapprochement d'un lead (voir known_fingerprint), ajoutées aux tables existantes
+CONTACT_KEY_COLUMNS = ("email_key", "phone_key", "conv_key")
+
+LEAD_FIELDS = ("reason", "name", "email", "phone", "availability")
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+def normalize_phone(phone: str) -> str:
+    digits = _NON_DIGIT_RE.sub("", phone or "")
+    # +33 6 12 34 56 78 / 0033… / 06 12 34 56 78 => même numéro
+    if digits.startswith("0033"):
+        digits = digits[4:]
+    elif digits.startswith("33") and len(digits) == 11:
+        digits = digits[2:]
+    if len(digits) == 9:
+        digits = "0" + digits
+    return digits
+
+
+def _sha(raw: str) -> str:
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def lead_fingerprint(lead: dict, fallback: str = "") -> str:
+    """Empreinte email + téléphone normalisés ; à défaut, la clé de repli (conversation)."""
+    email = (lead.get("email") or "").strip().lower()
+    phone = normalize_phone(lead.get("phone") or "")
+    return _sha(f"{email}|{phone}") if (email or phone) else _sha(f"conv:{fallback}")
+
+
+def contact_keys(lead: dict, fallback: str = "") -> tuple[str, str, str]:
+    """(email en minuscules, téléphone normalisé, empreinte de la conversation) ; "" si absent."""
+    return (
+        (lead.get("email") or "").strip().lower(),
+        normalize_phone(lead.get("phone") or ""),
+        _sha(f"conv:{fallback}") if fallback else "",
+    )
+
+
+def add_contact_keys(con, table: str) -> bool:
+    """Ajoute les colonnes de rapprochement à une table d'avant leur apparition. True si ajoutées."""
+    columns = {row[1] for row in con.execute(f"PRAGMA table_info({table})")}
+    if "email_key" in columns:
+        return False
+    for column in CONTACT_KEY_COLUMNS:
+        con.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+    return True
+
+
+def contact_key_indexes(table: str) -> list[str]:
+    return [f"CREATE INDEX IF NOT EXISTS idx_{table}_{c} ON {table}(public_id, {c})" for c in CONTACT_KEY_COLUMNS]
+
+
+def known_fingerprint(con, table: str, public_id: str, keys: tuple[str, str, str]) -> str | None:
+    """
+    Empreinte d'un lead déjà enregistré pour ce bot avec le même email, le même téléphone
+    ou la même conversation (dans cet ordre de priorité). L'empreinte email|téléphone
+    change quand un champ arrive après coup (email puis téléphone) : la ligne existante
+    garde la sienne au lieu d'en créer une seconde.
+    """
+    # Une recherche indexée par clé (un OR sur les trois colonnes parcourrait tous les leads du bot)
+    for column, value in zip(CONTACT_KEY_COLUMNS, keys):
+        if not value:
+            continue
+        row = con.execute(
+            f"SELECT fingerprint FROM {table} WHERE public_id = ? AND {column} = ? LIMIT 1",
+            (public_id, value)
+        ).fetchone()
+        if row:
+            return row[0]
+    return None
+
+
+class LeadLedger:
+    """
+    Avant chaque envoi de lead, `deliver()` consulte le registre (public_id, puis même
+    email, même téléphone ou même conversation — voir known_fingerprint) :
+    - lead inconnu            -> email mis en file tout de suite, lead enregistré ("sent")
+    - rien de nouveau         -> aucun email ("duplicate")
+    - champ ajouté ou modifié -> un seul digest différé de `digest_delay` secondes ;
+      les mises à jour suivantes réécrivent ce digest tant qu'il n'est pas parti ("digest").
+    """
+
+    def __init__(self, connect, outbox, digest_delay: float = 900.0):
+        self.connect = connect
+        self.outbox = outbox
+        self.digest_delay = digest_delay
+        self._lock = threading.Lock()
+
+    def init_db(self, con):
+        con.execute(LEDGER_DDL)
+        if add_contact_keys(con, "lead_ledger"):
+            rows = con.execute("SELECT public_id, fingerprint, lead_json FROM lead_ledger").fetchall()
+            con.executemany(
+                "UPDATE lead_ledger SET email_key=?, phone_key=? WHERE public_id=? AND fingerprint=?",
+                [(*contact_keys(json.loads(r[2] or "{}"))[:2], r[0], r[1]) for r in rows]
+            )
+        for ddl in contact_key_indexes("lead_ledger"):
+            con.execute(ddl)
+
+    def deliver(self, public_id: str, lead: dict, build_message, fallback_key: str = "") -> str:
+        """
+        `build_message(lead, is_update)` renvoie le message Mailjet à mettre en file.
+        Renvoie "sent", "duplicate" ou "digest".
+        """
+        fields = {k: (lead.get(k) or "").strip() for k in LEAD_FIELDS}
+        keys = contact_keys(fields, fallback_key)
+        now = time.time()
+        with self._lock:
+            with self.connect() as con:
+                fp = known_fingerprint(con, "lead_ledger", public_id, keys)
+                if fp is None:
+                    fp = lead_fingerprint(fields, fallback_key)
+                    cur = con.execute(
+                        """INSERT OR IGNORE INTO lead_ledger(public_id, fingerprint, lead_json, first_sent_at,
+                                                             updated_at, email_key, phone_key, conv_key)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (public_id, fp, json.dumps(fields, ensure_ascii=False), now, now, *keys)
+                    )
+                    con.commit()
+                    if cur.rowcount == 1:
+                        self.outbox.enqueue(build_message(lead, False), kind="lead")
+                        return "sent"
+                row = con.execute(
+                    "SELECT lead_json, digest_id FROM lead_ledger WHERE public_id=? AND fingerprint=?",
+                    (public_id, fp)
+                ).fetchone()
+
+            known = json.loads(row["lead_json"] or "{}")
+            merged = {k: fields[k] or known.get(k, "") for k in LEAD_FIELDS}
+            if merged == {k: known.get(k, "") for k in LEAD_FIELDS}:
+                return "duplicate"
+
+            message = build_message({**lead, **merged}, True)
+            digest_id = row["digest_id"]
+            if not (digest_id and self.outbox.replace_pending(digest_id, message)):
+                digest_id = self.outbox.enqueue(message, kind="lead_digest", delay=self.digest_delay)
+            email_key, phone_key, _ = contact_keys(merged)
+            with self.connect() as con:
+                con.execute(
+                    """UPDATE lead_ledger SET lead_json=?, digest_id=?, updates=updates+1, updated_at=?,
+                                              email_key=?, phone_key=?
+                       WHERE public_id=? AND fingerprint=?""",
+                    (json.dumps(merged, ensure_ascii=False), digest_id, now, email_key, phone_key, public_id, fp)
+                )
+                con.commit()
+            return "digest"
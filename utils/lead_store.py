@@ -0,0 +1,150 @@
+# utils/lead_store.py — table `leads` : schéma, index, upsert groupé et lecture paginée par curseur
+
+from __future__ import annotations
+
+import json
+
+from utils.lead_ledger import (
+    add_contact_keys, contact_key_indexes, contact_keys, known_fingerprint, lead_fingerprint,
+)
+
+LEADS_DDL = """
+CREATE TABLE IF NOT EXISTS leads (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    public_id   TEXT NOT NULL DEFAULT '',
+    fingerprint TEXT NOT NULL DEFAULT '',
+    name        TEXT NOT NULL DEFAULT '',
+    email       TEXT NOT NULL DEFAULT '',
+    phone       TEXT NOT NULL DEFAULT '',
+    reason      TEXT NOT NULL DEFAULT '',
+    message     TEXT NOT NULL DEFAULT '',
+    source      TEXT NOT NULL DEFAULT '',
+    extra_json  TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL DEFAULT 0,
+    email_key   TEXT NOT NULL DEFAULT '',
+    phone_key   TEXT NOT NULL DEFAULT '',
+    conv_key    TEXT NOT NULL DEFAULT ''
+)
+"""
+# Export d'un bot par ordre d'arrivée (created_at, id) ; un lead = une empreinte par bot
+LEADS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_leads_bot_created ON leads(public_id, created_at)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_fingerprint ON leads(fingerprint, public_id)",
+)
+LEAD_COLUMNS = ("public_id", "fingerprint", "name", "email", "phone", "reason", "message",
+                "source", "extra_json", "created_at", "updated_at", "email_key", "phone_key", "conv_key")
+EXPORT_COLUMNS = ("id", "public_id", "name", "email", "phone", "reason", "message", "source",
+                  "extra_json", "created_at", "updated_at")
+
+# Un lead déjà connu (même bot, même empreinte) est complété : les champs vides ne l'écrasent pas
+UPSERT_SQL = f"""
+INSERT INTO leads({', '.join(LEAD_COLUMNS)}) VALUES ({', '.join('?' * len(LEAD_COLUMNS))})
+ON CONFLICT(fingerprint, public_id) DO UPDATE SET
+  name       = CASE WHEN excluded.name    <> '' THEN excluded.name    ELSE leads.name    END,
+  email      = CASE WHEN excluded.email   <> '' THEN excluded.email   ELSE leads.email   END,
+  phone      = CASE WHEN excluded.phone   <> '' THEN excluded.phone   ELSE leads.phone   END,
+  reason     = CASE WHEN excluded.reason  <> '' THEN excluded.reason  ELSE leads.reason  END,
+  message    = CASE WHEN excluded.message <> '' THEN excluded.message ELSE leads.message END,
+  extra_json = COALESCE(excluded.extra_json, leads.extra_json),
+  updated_at = excluded.updated_at,
+  email_key  = CASE WHEN excluded.email_key <> '' THEN excluded.email_key ELSE leads.email_key END,
+  phone_key  = CASE WHEN excluded.phone_key <> '' THEN excluded.phone_key ELSE leads.phone_key END
+"""
+
+
+def init_db(con):
+    con.execute(LEADS_DDL)
+    _migrate(con)
+    if add_contact_keys(con, "leads"):
+        rows = con.execute("SELECT id, email, phone FROM leads").fetchall()
+        con.executemany("UPDATE leads SET email_key=?, phone_key=? WHERE id=?",
+                        [(*contact_keys({"email": r[1], "phone": r[2]})[:2], r[0]) for r in rows])
+    for ddl in LEADS_INDEXES + tuple(contact_key_indexes("leads")):
+        con.execute(ddl)
+
+
+def _migrate(con):
+    """Première version de la table (ingest de l'embed, sans empreinte) : colonnes ajoutées, doublons fusionnés."""
+    columns = {row[1] for row in con.execute("PRAGMA table_info(leads)")}
+    if "fingerprint" in columns:
+        return
+    con.execute("ALTER TABLE leads ADD COLUMN fingerprint TEXT NOT NULL DEFAULT ''")
+    con.execute("ALTER TABLE leads ADD COLUMN reason TEXT NOT NULL DEFAULT ''")
+    con.execute("ALTER TABLE leads ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+    rows = con.execute("SELECT id, email, phone FROM leads").fetchall()
+    con.executemany(
+        "UPDATE leads SET fingerprint=?, updated_at=created_at WHERE id=?",
+        [(lead_fingerprint({"email": r[1], "phone": r[2]}, str(r[0])), r[0]) for r in rows]
+    )
+    con.execute("""DELETE FROM leads WHERE id NOT IN
+                   (SELECT MIN(id) FROM leads GROUP BY fingerprint, public_id)""")
+
+
+def lead_row(lead: dict, now: float) -> tuple:
+    """Paramètres de UPSERT_SQL pour un lead ({public_id, name, email, phone, reason, message, source, extra})."""
+    extra = lead.get("extra")
+    created = lead.get("created_at") or now
+    keys = contact_keys(lead, lead.get("conv_id") or "")
+    return (
+        lead.get("public_id") or "",
+        lead_fingerprint(lead, lead.get("conv_id") or ""),
+        lead.get("name") or "",
+        lead.get("email") or "",
+        lead.get("phone") or "",
+        lead.get("reason") or "",
+        lead.get("message") or "",
+        lead.get("source") or "",
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+        created,
+        created,
+        *keys,
+    )
+
+
+def upsert_rows(con, rows: list[tuple]):
+    """
+    Écrit des lignes `lead_row` dans la transaction courante. Un lead qui retrouve un
+    lead existant du bot (même email, téléphone ou conversation) en reprend l'empreinte :
+    il le complète au lieu de créer une seconde ligne quand un champ arrive après coup.
+    """
+    fp_at, keys_at = LEAD_COLUMNS.index("fingerprint"), LEAD_COLUMNS.index("email_key")
+    for row in rows:
+        fp = known_fingerprint(con, "leads", row[0], row[keys_at:keys_at + 3])
+        if fp and fp != row[fp_at]:
+            row = row[:fp_at] + (fp,) + row[fp_at + 1:]
+        con.execute(UPSERT_SQL, row)
+
+
+def encode_cursor(row: dict) -> str:
+    return f"{row['created_at']!r}:{row['id']}"
+
+
+def decode_cursor(cursor: str | None) -> tuple[float, int]:
+    """Curseur "created_at:id" du dernier lead lu ; (0, 0) = depuis le début. ValueError si invalide."""
+    if not cursor:
+        return 0.0, 0
+    created_at, _, row_id = cursor.partition(":")
+    return float(created_at), int(row_id)
+
+
+def fetch_page(con, public_id: str, after: tuple[float, int] = (0.0, 0), limit: int = 100) -> list[dict]:
+    """Leads suivant `after` dans l'ordre (created_at, id) : parcours d'index, sans OFFSET."""
+    rows = con.execute(
+        f"""SELECT {', '.join(EXPORT_COLUMNS)} FROM leads
+            WHERE public_id = ? AND (created_at, id) > (?, ?)
+            ORDER BY created_at, id LIMIT ?""",
+        (public_id, after[0], after[1], limit)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def iter_leads(connect, public_id: str, after: tuple[float, int] = (0.0, 0), page_size: int = 1000):
+    """Tous les leads d'un bot, page par page (une lecture courte par page, rien n'est gardé en mémoire)."""
+    while True:
+        with connect() as con:
+            page = fetch_page(con, public_id, after, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = (page[-1]["created_at"], page[-1]["id"])
@@ -0,0 +1,148 @@
+# utils/llm_async.py — client Together asynchrone (mode ASGI), mêmes règles que LLMClient
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import asyncio
+
+import aiohttp
+
+from utils.llm_client import LLMClient, RETRYABLE_STATUS
+
+
+class AsyncLLMClient:
+    """
+    Version asyncio de LLMClient : même configuration, même budget de temps,
+    mêmes retries et *même disjoncteur* que le client synchrone qu'il enveloppe.
+    Une requête en attente du modèle ne bloque aucun thread : des milliers de
+    conversations partagent une boucle d'événements et un pool aiohttp.
+    """
+
+    def __init__(self, base: LLMClient, pool_size: int = 200):
+        self.base = base
+        self.breaker = base.breaker
+        self.pool_size = pool_size
+        self._http: aiohttp.ClientSession | None = None
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.prompt_tokens = 0
+
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        # Créée paresseusement : liée à la boucle d'événements du serveur ASGI
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                headers={"Authorization": f"Bearer {self.base.api_key}", "Content-Type": "application/json"},
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    async def complete(self, messages: list, max_tokens: int | None = None, deadline: float | None = None) -> str:
+        """Renvoie le texte du modèle, ou "" (pas de clé, disjoncteur ouvert, échec)."""
+        base = self.base
+        if not base.api_key:
+            return ""
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            return ""
+        self.calls += 1
+        end = time.monotonic() + (deadline or base.deadline)
+        payload = base.payload(messages, max_tokens)
+        last_err_text = None
+        for attempt in range(base.max_attempts):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            retry_after = None
+            try:
+                async with self.http.post(base.api_url, json=payload,
+                                          timeout=aiohttp.ClientTimeout(total=remaining)) as r:
+                    if r.ok:
+                        data = await r.json(content_type=None)
+                        content = (data.get("choices", [{}])[0].get("message", {}).get("content", "")).strip()
+                        self.prompt_tokens += int((data.get("usage") or {}).get("prompt_tokens") or 0)
+                        self.breaker.success()
+                        base.observe(attempt + 1, "async")
+                        return content
+                    last_err_text = f"HTTP {r.status}: {(await r.text())[:200]}"
+                    if r.status not in RETRYABLE_STATUS:
+                        self.failures += 1
+                        base.refused(r.status)
+                        base.observe(attempt + 1, "async")
+                        print("[LLM][Together][ASYNC][FAIL]", last_err_text)
+                        return ""
+                    retry_after = r.headers.get("Retry-After")
+            except Exception as e:
+                last_err_text = f"{type(e).__name__}: {e}"
+            if attempt + 1 >= base.max_attempts:
+                break
+            wait = base.retry_wait(attempt, end - time.monotonic(), retry_after)
+            if wait is None:
+                break
+            await asyncio.sleep(wait)
+            self.retries += 1
+        self.failures += 1
+        self.breaker.failure()
+        base.observe(attempt + 1, "async")
+        print("[LLM][Together][ASYNC][FAIL]", last_err_text or "deadline")
+        return ""
+
+    async def stream(self, messages: list, max_tokens: int | None = None, deadline: float | None = None):
+        """Générateur asynchrone des fragments de texte (SSE OpenAI)."""
+        base = self.base
+        if not base.api_key:
+            return
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            return
+        self.calls += 1
+        try:
+            async with self.http.post(base.api_url, json=base.payload(messages, max_tokens, stream=True),
+                                      timeout=aiohttp.ClientTimeout(total=deadline or base.deadline)) as r:
+                if not r.ok:
+                    self.failures += 1
+                    self.breaker.failure()
+                    print("[LLM][Together][ASYNC][STREAM][FAIL]", f"HTTP {r.status}")
+                    return
+                self.breaker.success()
+                async for raw in r.content:
+                    line = raw.decode("utf-8", "replace").strip()
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except Exception:
+                        continue
+                    delta = ((chunk.get("choices") or [{}])[0].get("delta") or {}).get("content") or ""
+                    if delta:
+                        yield delta
+        except Exception as e:
+            self.failures += 1
+            self.breaker.failure()
+            print("[LLM][Together][ASYNC][STREAM][EXC]", type(e).__name__, e)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "prompt_tokens": self.prompt_tokens,
+            "breaker": self.breaker.state,
+        }
+
+
+def get_async_client(base: LLMClient) -> AsyncLLMClient:
+    return AsyncLLMClient(base, pool_size=int(os.getenv("LLM_ASYNC_POOL_SIZE", "200")))
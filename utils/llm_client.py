@@ -0,0 +1,285 @@
+# utils/llm_client.py — client Together partagé : pool keep-alive, budget de temps, disjoncteur
+
+from __future__ import annotations
+
+import os
+import json
+import time
+import random
+import threading
+
+TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# Refus non retryables qui touchent tous les appels (clé invalide, crédit épuisé, modèle ou URL
+# inconnus) : comptés comme pannes par le disjoncteur. Les autres 4xx ne visent que la requête.
+CONFIG_ERROR_STATUS = {401, 402, 403, 404}
+
+
+class CircuitBreaker:
+    """
+    Ouvert après `threshold` échecs consécutifs : les appels sont refusés pendant
+    `cooldown` secondes, puis un seul appel d'essai est autorisé (semi-ouvert).
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.threshold:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Appel terminé sans verdict sur le fournisseur : libère l'essai semi-ouvert, compteur inchangé."""
+        with self._lock:
+            self._trial = False
+
+
+class LLMClient:
+    """
+    Client chat-completions (format OpenAI / Together) à session HTTP partagée.
+    - `deadline` : budget total par appel (tentatives + attentes comprises).
+    - Retry avec jitter uniquement sur erreurs réseau et codes HTTP retryables.
+    - Disjoncteur : si le fournisseur est en panne, on renvoie "" immédiatement
+      et l'appelant bascule sur son fallback sans attendre.
+    """
+
+    def __init__(self, api_url: str, api_key: str, model: str, max_tokens: int = 180,
+                 temperature: float = 0.3, deadline: float = 20.0, max_attempts: int = 3,
+                 backoff_base: float = 0.25, pool_size: int = 20,
+                 breaker: CircuitBreaker | None = None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.deadline = deadline
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self.pool_size = pool_size
+        self._http = None
+        self._http_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        # Tokens d'entrée facturés (champ `usage` de la réponse Together)
+        self.prompt_tokens = 0
+        # observer(tentatives, mode) appelé à la fin de chaque complete() / stream() (métriques)
+        self.observer = None
+
+    def refused(self, status: int):
+        """4xx non retryable : panne de configuration pour le disjoncteur, ou simple requête refusée."""
+        if status in CONFIG_ERROR_STATUS:
+            self.breaker.failure()
+        else:
+            self.breaker.release()
+
+    def observe(self, attempts: int, mode: str = "sync"):
+        if self.observer is not None:
+            self.observer(attempts, mode)
+
+    @property
+    def http(self):
+        """Session HTTP créée (et `requests` importé) au premier appel, pas au démarrage."""
+        if self._http is None:
+            with self._http_lock:
+                if self._http is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    http = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    http.mount("https://", adapter)
+                    http.mount("http://", adapter)
+                    http.headers.update({"Authorization": f"Bearer {self.api_key}",
+                                         "Content-Type": "application/json"})
+                    self._http = http
+        return self._http
+
+    @staticmethod
+    def build_messages(system_prompt: str, history: list, user_input: str) -> list:
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def payload(self, messages: list, max_tokens: int | None, stream: bool = False) -> dict:
+        payload = {
+            "model": self.model,
+            "max_tokens": max_tokens or self.max_tokens,
+            "temperature": self.temperature,
+            "messages": messages
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def retry_wait(self, attempt: int, remaining: float, retry_after: str | None) -> float | None:
+        """Attente jitterée bornée par le budget restant. None = plus le temps de réessayer."""
+        try:
+            wait = float(retry_after) if retry_after else 0.0
+        except ValueError:
+            wait = 0.0
+        wait = max(wait, random.uniform(0, self.backoff_base * (2 ** attempt)))
+        if wait >= remaining - 0.5:
+            return None
+        return wait
+
+    def _sleep_before_retry(self, attempt: int, remaining: float, retry_after: str | None) -> bool:
+        wait = self.retry_wait(attempt, remaining, retry_after)
+        if wait is None:
+            return False
+        time.sleep(wait)
+        return True
+
+    def complete(self, messages: list, max_tokens: int | None = None, deadline: float | None = None) -> str:
+        """Renvoie le texte du modèle, ou "" (pas de clé, disjoncteur ouvert, échec)."""
+        if not self.api_key:
+            return ""
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            return ""
+        self.calls += 1
+        end = time.monotonic() + (deadline or self.deadline)
+        payload = self.payload(messages, max_tokens)
+        last_err_text = None
+        for attempt in range(self.max_attempts):
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            retry_after = None
+            try:
+                r = self.http.post(self.api_url, json=payload, timeout=remaining)
+                if r.ok:
+                    data = r.json()
+                    content = (data.get("choices", [{}])[0].get("message", {}).get("content", "")).strip()
+                    self.prompt_tokens += int((data.get("usage") or {}).get("prompt_tokens") or 0)
+                    self.breaker.success()
+                    self.observe(attempt + 1)
+                    return content
+                try:
+                    err = r.json()
+                    last_err_text = f"HTTP {r.status_code}: {err.get('error',{}).get('message') or err}"
+                except Exception:
+                    last_err_text = f"HTTP {r.status_code}: {r.text[:200]}"
+                if r.status_code not in RETRYABLE_STATUS:
+                    self.failures += 1
+                    self.refused(r.status_code)
+                    self.observe(attempt + 1)
+                    print("[LLM][Together][FAIL]", last_err_text)
+                    return ""
+                retry_after = r.headers.get("Retry-After")
+            except Exception as e:
+                last_err_text = f"{type(e).__name__}: {e}"
+            if attempt + 1 >= self.max_attempts:
+                break
+            if not self._sleep_before_retry(attempt, end - time.monotonic(), retry_after):
+                break
+            self.retries += 1
+        self.failures += 1
+        self.breaker.failure()
+        self.observe(attempt + 1)
+        print("[LLM][Together][FAIL]", last_err_text or "deadline")
+        return ""
+
+    def stream(self, messages: list, max_tokens: int | None = None, deadline: float | None = None):
+        """Générateur des fragments de texte (mode `stream: true`, format SSE OpenAI)."""
+        if not self.api_key:
+            return
+        if not self.breaker.allow():
+            self.short_circuits += 1
+            return
+        self.calls += 1
+        # Une seule tentative en streaming ; observé à la sortie, y compris si le client coupe
+        try:
+            with self.http.post(self.api_url, json=self.payload(messages, max_tokens, stream=True),
+                                timeout=(deadline or self.deadline), stream=True) as r:
+                if not r.ok:
+                    self.failures += 1
+                    self.breaker.failure()
+                    print("[LLM][Together][STREAM][FAIL]", f"HTTP {r.status_code}: {r.text[:200]}")
+                    return
+                self.breaker.success()
+                for line in r.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except Exception:
+                        continue
+                    delta = ((chunk.get("choices") or [{}])[0].get("delta") or {}).get("content") or ""
+                    if delta:
+                        yield delta
+        except Exception as e:
+            self.failures += 1
+            self.breaker.failure()
+            print("[LLM][Together][STREAM][EXC]", type(e).__name__, e)
+        finally:
+            self.observe(1, "stream")
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "prompt_tokens": self.prompt_tokens,
+            "breaker": self.breaker.state,
+        }
+
+
+_default: LLMClient | None = None
+_default_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    """Client partagé du process, configuré par variables d'environnement."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = LLMClient(
+                    api_url=os.getenv("TOGETHER_API_URL", TOGETHER_API_URL).strip(),
+                    api_key=os.getenv("TOGETHER_API_KEY", "").strip(),
+                    model=os.getenv("LLM_MODEL", "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo").strip(),
+                    max_tokens=int(os.getenv("LLM_MAX_TOKENS", "180")),
+                    deadline=float(os.getenv("LLM_DEADLINE", "20")),
+                    max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+                    pool_size=int(os.getenv("LLM_POOL_SIZE", "20")),
+                    breaker=CircuitBreaker(
+                        threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                        cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+                    ),
+                )
+    return _default
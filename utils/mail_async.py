@@ -0,0 +1,93 @@
+# utils/mail_async.py — consommateur asyncio de la file d'emails (mode ASGI), envoi Mailjet via aiohttp
+
+from __future__ import annotations
+
+import json
+import asyncio
+
+import aiohttp
+
+from utils.outbox import MailOutbox, send_results
+
+
+class AsyncMailDispatcher:
+    """
+    Remplace le thread de MailOutbox quand l'app tourne sous asgi.py : même file
+    SQLite, mêmes lots, même backoff (`_claim` / `_settle` de l'outbox, exécutés dans
+    le pool de threads), mais l'appel Mailjet attend sur la boucle d'événements.
+    `enqueue()` (appelé depuis un thread) réveille la boucle via `wake()`.
+    """
+
+    def __init__(self, outbox: MailOutbox):
+        self.outbox = outbox
+        self._http: aiohttp.ClientSession | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """Prend la main sur la file (à appeler au démarrage du serveur, dans sa boucle)."""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        await asyncio.to_thread(self.outbox.stop)
+        self.outbox.dispatcher = self
+        self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(auth=aiohttp.BasicAuth(*self.outbox.auth))
+        return self._http
+
+    async def _post(self, messages: list) -> tuple[list[bool], str]:
+        try:
+            async with self.http.post(self.outbox.url, json={"Messages": messages},
+                                      timeout=aiohttp.ClientTimeout(total=self.outbox.http_timeout)) as r:
+                text = await r.text()
+                status = r.status
+        except Exception as e:
+            return [False] * len(messages), f"{type(e).__name__}: {e}"
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        return send_results(status, data, text, len(messages))
+
+    async def dispatch_once(self) -> int:
+        rows = await asyncio.to_thread(self.outbox._claim)
+        if not rows:
+            return 0
+        ok, err = await self._post([json.loads(r["message_json"]) for r in rows])
+        await asyncio.to_thread(self.outbox._settle, rows, ok, err)
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                while await self.dispatch_once():
+                    pass
+            except Exception as e:
+                print("[OUTBOX][ASYNC][EXC]", type(e).__name__, e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.outbox.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def aclose(self):
+        """Rend la file au thread de l'outbox (qui redémarre au prochain enqueue)."""
+        self.outbox.dispatcher = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
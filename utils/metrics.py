@@ -0,0 +1,194 @@
+# utils/metrics.py — histogrammes par étape du tour de chat, exposition au format texte Prometheus
+
+from __future__ import annotations
+
+import re
+import time
+import uuid
+import threading
+from bisect import bisect_left
+
+# Secondes : de la lecture SQLite (~ms) à l'appel LLM (plusieurs secondes)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+REQUEST_ID_RE = re.compile(r"[^A-Za-z0-9._:-]")
+
+
+def request_id_from(header: str | None) -> str:
+    """Identifiant de requête repris de l'en-tête entrant (nettoyé, borné) ou généré."""
+    rid = REQUEST_ID_RE.sub("", (header or "").strip())[:64]
+    return rid or uuid.uuid4().hex[:16]
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Histogramme cumulatif à seaux fixes, une série par combinaison de labels."""
+
+    def __init__(self, name: str, help: str, buckets: tuple = DURATION_BUCKETS, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labels = labels
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                # [compte par seau (+Inf en dernier), somme, nombre]
+                s = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in sorted(self._series.items())]
+        for values, counts, total, n in series:
+            cumulative = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                bucket = _labels(self.labels, values, 'le="%s"' % _fmt(le))
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {_fmt(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {n}")
+        return lines
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullTimer:
+    """Instrumentation désactivée : aucun appel d'horloge, aucun verrou."""
+    __slots__ = ("request_id",)
+    _stage = _NullStage()
+
+    def __init__(self, request_id: str = ""):
+        self.request_id = request_id
+
+    def stage(self, name: str):
+        return self._stage
+
+    def finish(self, route: str = ""):
+        return None
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "t0")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.timer.stages
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.t0
+        return False
+
+
+class StageTimer:
+    """
+    Durées des étapes d'une requête (`with timer.stage("llm"): ...`, cumulées si une étape
+    est ouverte plusieurs fois) ; `finish()` les verse dans les histogrammes avec la durée
+    totale et passe le détail sur une ligne au `log` du registre, s'il y en a un.
+    """
+    __slots__ = ("metrics", "request_id", "stages", "t0")
+
+    def __init__(self, metrics: "Metrics", request_id: str):
+        self.metrics = metrics
+        self.request_id = request_id
+        self.stages: dict[str, float] = {}
+        self.t0 = time.perf_counter()
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def finish(self, route: str = "") -> float:
+        total = time.perf_counter() - self.t0
+        for name, seconds in self.stages.items():
+            self.metrics.stage_seconds.observe(seconds, name)
+        self.metrics.request_seconds.observe(total, route)
+        if self.metrics.log is not None:
+            detail = " ".join(f"{k}={v * 1000:.1f}" for k, v in self.stages.items())
+            self.metrics.log(f"[TIMING] rid={self.request_id} {route} total={total * 1000:.1f}ms {detail}")
+        return total
+
+
+class Metrics:
+    """
+    Registre du process : histogrammes alimentés sur le chemin chaud, et valeurs
+    (compteurs des caches, profondeur de la file d'emails…) lues seulement au scrape.
+    `log(ligne)` reçoit le détail des durées de chaque requête (None : pas de log).
+    """
+
+    def __init__(self, enabled: bool = True, log=None):
+        self.enabled = enabled
+        self.log = log
+        self.stage_seconds = Histogram("betty_stage_seconds", "Durée des étapes d'un tour de chat.",
+                                       labels=("stage",))
+        self.request_seconds = Histogram("betty_request_seconds", "Durée totale des requêtes de chat.",
+                                         labels=("route",))
+        self.llm_attempts = Histogram("betty_llm_attempts", "Tentatives HTTP par appel LLM (1 = sans retry).",
+                                      buckets=(1, 2, 3, 4, 5), labels=("mode",))
+        self.histograms = [self.stage_seconds, self.request_seconds, self.llm_attempts]
+        self._collectors: list = []
+
+    def timer(self, request_id: str = ""):
+        return StageTimer(self, request_id) if self.enabled else _NullTimer(request_id)
+
+    def observe_llm(self, attempts: int, mode: str = "sync"):
+        if self.enabled:
+            self.llm_attempts.observe(attempts, mode)
+
+    def collector(self, name: str, help: str, kind: str, fn, labels: tuple = ()):
+        """
+        `fn()` renvoie une valeur, ou {(valeurs de labels): valeur} ; appelée au scrape.
+        `kind` : "gauge" ou "counter".
+        """
+        self._collectors.append((name, help, kind, fn, labels))
+
+    def render(self) -> str:
+        lines = []
+        for h in self.histograms:
+            lines.extend(h.render())
+        for name, help, kind, fn, labels in self._collectors:
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"[METRICS] {name}: {type(e).__name__}: {e}")
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            items = value.items() if isinstance(value, dict) else [((), value)]
+            for label_values, v in items:
+                lines.append(f"{name}{_labels(labels, label_values)} {_fmt(v)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,241 @@
+# utils/outbox.py — file d'attente durable des e-mails (SQLite) + envoi groupé Mailjet v3.1
+
+from __future__ import annotations
+
+import json
+import time
+import uuid
+import random
+import threading
+
+MAILJET_SEND_URL = "https://api.mailjet.com/v3.1/send"
+
+OUTBOX_DDL = """
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind            TEXT NOT NULL,
+    message_json    TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claim           TEXT,
+    claimed_at      REAL,
+    last_error      TEXT,
+    created_at      REAL NOT NULL,
+    sent_at         REAL
+)
+"""
+OUTBOX_INDEX = "CREATE INDEX IF NOT EXISTS idx_outbox_due ON mail_outbox(status, next_attempt_at)"
+
+
+def send_results(status: int, data, text: str, count: int) -> tuple[list[bool], str]:
+    """(succès par message, erreur globale éventuelle) d'après la réponse Mailjet à un lot."""
+    results = data.get("Messages") if isinstance(data, dict) else None
+    # Mailjet renvoie un statut par message, y compris en 400 quand une partie du lot échoue
+    if isinstance(results, list) and len(results) == count:
+        ok = [(m or {}).get("Status") == "success" for m in results]
+        return ok, "" if all(ok) else f"HTTP {status}: {text[:200]}"
+    if 200 <= status < 300:
+        return [True] * count, ""
+    return [False] * count, f"HTTP {status}: {text[:200]}"
+
+
+class MailOutbox:
+    """
+    Les routes appellent `enqueue()` (un INSERT) et rendent la main tout de suite.
+    Un thread de fond réclame les lignes dues, les regroupe dans un seul tableau
+    `Messages` Mailjet (jusqu'à `batch_size`), et replanifie les échecs avec un
+    backoff exponentiel jusqu'à `max_attempts`. Avec un `dispatcher` (mode ASGI,
+    utils/mail_async.py), c'est lui qui consomme la file à la place du thread.
+    `inline=True` (serverless : l'instance est gelée dès la réponse envoyée, un thread
+    n'y survit pas) : pas de thread, `enqueue()` vide la file dans la requête même ;
+    les messages différés (digests) partent avec le premier envoi qui suit leur échéance.
+    """
+
+    def __init__(self, connect, auth: tuple[str, str], url: str = MAILJET_SEND_URL,
+                 batch_size: int = 50, max_attempts: int = 6, base_delay: float = 2.0,
+                 max_delay: float = 600.0, poll_interval: float = 5.0, claim_timeout: float = 300.0,
+                 http_timeout: float = 15.0, inline: bool = False):
+        self.connect = connect
+        self.auth = auth
+        self.url = url
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.http_timeout = http_timeout
+        self.inline = inline
+        self._http = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.dispatcher = None
+
+    # ---- Schéma ----
+    def init_db(self, con):
+        con.execute(OUTBOX_DDL)
+        con.execute(OUTBOX_INDEX)
+
+    # ---- Producteur ----
+    def enqueue(self, message: dict, kind: str = "mail", delay: float = 0.0) -> int:
+        """
+        Ajoute un message Mailjet (format v3.1) à la file, envoyable dans `delay` secondes.
+        Renvoie l'id de la ligne.
+        """
+        now = time.time()
+        with self.connect() as con:
+            cur = con.execute(
+                "INSERT INTO mail_outbox(kind, message_json, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(message, ensure_ascii=False), now + max(0.0, delay), now)
+            )
+            con.commit()
+            row_id = cur.lastrowid
+        if self.dispatcher is not None:
+            if delay <= 0:
+                self.dispatcher.wake()
+            return row_id
+        if self.inline:
+            if delay <= 0:
+                self._drain_inline()
+            return row_id
+        self.start()
+        if delay <= 0:
+            self._wake.set()
+        return row_id
+
+    def replace_pending(self, row_id: int, message: dict) -> bool:
+        """Remplace le contenu d'un message encore en attente. False s'il est déjà parti (ou en cours)."""
+        with self.connect() as con:
+            cur = con.execute(
+                "UPDATE mail_outbox SET message_json=? WHERE id=? AND status='pending'",
+                (json.dumps(message, ensure_ascii=False), row_id)
+            )
+            con.commit()
+        return cur.rowcount == 1
+
+    def depth(self) -> int:
+        with self.connect() as con:
+            row = con.execute("SELECT COUNT(*) FROM mail_outbox WHERE status IN ('pending','sending')").fetchone()
+        return int(row[0]) if row else 0
+
+    # ---- Consommateur ----
+    def _claim(self) -> list:
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self.connect() as con:
+            # Lignes réclamées par un worker mort : on les remet en file
+            con.execute(
+                "UPDATE mail_outbox SET status='pending', claim=NULL WHERE status='sending' AND claimed_at < ?",
+                (now - self.claim_timeout,)
+            )
+            con.execute(
+                """UPDATE mail_outbox SET status='sending', claim=?, claimed_at=?
+                   WHERE id IN (SELECT id FROM mail_outbox WHERE status='pending' AND next_attempt_at <= ?
+                                ORDER BY id LIMIT ?)""",
+                (token, now, now, self.batch_size)
+            )
+            con.commit()
+            rows = con.execute(
+                "SELECT id, kind, message_json, attempts FROM mail_outbox WHERE claim=? ORDER BY id", (token,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _post(self, messages: list) -> tuple[list[bool], str]:
+        """Envoie un lot. Renvoie (succès par message, erreur globale éventuelle)."""
+        try:
+            if self._http is None:
+                import requests  # importé au premier envoi, pas au démarrage
+                self._http = requests.Session()
+            r = self._http.post(self.url, auth=self.auth, json={"Messages": messages}, timeout=self.http_timeout)
+        except Exception as e:
+            return [False] * len(messages), f"{type(e).__name__}: {e}"
+        try:
+            data = r.json()
+        except Exception:
+            data = None
+        return send_results(r.status_code, data, r.text, len(messages))
+
+    def dispatch_once(self) -> int:
+        """Traite un lot dû. Renvoie le nombre de lignes traitées (0 = rien à faire)."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        ok, err = self._post([json.loads(r["message_json"]) for r in rows])
+        self._settle(rows, ok, err)
+        return len(rows)
+
+    def _settle(self, rows: list, ok: list, err: str):
+        """Marque chaque ligne du lot envoyée, replanifiée (backoff) ou en échec définitif."""
+        now = time.time()
+        with self.connect() as con:
+            for row, sent in zip(rows, ok):
+                attempts = row["attempts"] + 1
+                if sent:
+                    con.execute(
+                        "UPDATE mail_outbox SET status='sent', attempts=?, sent_at=?, claim=NULL WHERE id=?",
+                        (attempts, now, row["id"])
+                    )
+                elif attempts >= self.max_attempts:
+                    con.execute(
+                        "UPDATE mail_outbox SET status='failed', attempts=?, last_error=?, claim=NULL WHERE id=?",
+                        (attempts, err, row["id"])
+                    )
+                else:
+                    con.execute(
+                        """UPDATE mail_outbox SET status='pending', attempts=?, last_error=?, claim=NULL,
+                           next_attempt_at=? WHERE id=?""",
+                        (attempts, err, now + self._backoff(attempts), row["id"])
+                    )
+            con.commit()
+        print("[OUTBOX][MAILJET]", f"{sum(ok)}/{len(rows)} OK" + (f" — {err}" if err else ""))
+
+    def drain(self, max_batches: int = 100) -> int:
+        """Vide la file de manière synchrone (utile en serverless ou en fin de process)."""
+        total = 0
+        for _ in range(max_batches):
+            n = self.dispatch_once()
+            if not n:
+                break
+            total += n
+        return total
+
+    def _drain_inline(self):
+        # Le message reste en file (backoff) si Mailjet échoue : la requête n'échoue pas pour autant
+        try:
+            self.drain()
+        except Exception as e:
+            print("[OUTBOX][INLINE][EXC]", type(e).__name__, e)
+
+    # ---- Thread de fond ----
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                while self.dispatch_once():
+                    pass
+            except Exception as e:
+                print("[OUTBOX][EXC]", type(e).__name__, e)
+            self._wake.wait(self.poll_interval)
+
+    def start(self):
+        if self.dispatcher is not None or self.inline:
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mail-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,135 @@
+# utils/pack_bundle.py — bundle précompilé des packs : schéma validé, version hashée, lecture en un bloc
+
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+
+BUNDLE_FORMAT = 1
+# Listes de chaînes attendues dans les packs structurés (betty_*.yaml)
+STR_LIST_KEYS = ("mandatory_fields", "optional_fields", "questions", "system_rules")
+STR_KEYS = ("id", "prompt", "name", "description", "avatar", "tone", "goal")
+
+
+class PackBundleError(ValueError):
+    """Bundle illisible, d'un autre format, ou pack invalide à la construction (`errors` = détail)."""
+
+    def __init__(self, message: str, errors: list | None = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def file_sha1(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def pack_names(packs_dir: str) -> list[str]:
+    try:
+        return sorted(f[:-5] for f in os.listdir(packs_dir) if f.endswith(".yaml"))
+    except OSError:
+        return []
+
+
+def validate_pack(data) -> list[str]:
+    """
+    Erreurs de schéma d'un pack (liste vide = valide). Deux formes acceptées :
+    prompt libre (`prompt`, packs historiques avocat/immo/medecin…) ou pack structuré
+    (`id`, `mandatory_fields`, `questions`, `system_rules`).
+    """
+    if not isinstance(data, dict):
+        return ["le pack doit être un mapping YAML"]
+    errors = []
+    for key in STR_KEYS:
+        if key in data and not isinstance(data[key], str):
+            errors.append(f"{key} : chaîne attendue")
+    for key in STR_LIST_KEYS:
+        value = data.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, list) or not all(isinstance(v, str) and v.strip() for v in value):
+            errors.append(f"{key} : liste de chaînes non vides attendue")
+    if "lead_format" in data and not isinstance(data["lead_format"], dict):
+        errors.append("lead_format : mapping attendu")
+    if errors:
+        return errors
+
+    if "prompt" in data:
+        if not data["prompt"].strip():
+            errors.append("prompt vide")
+        return errors
+    for key in ("id", "mandatory_fields", "questions", "system_rules"):
+        if not data.get(key):
+            errors.append(f"{key} manquant (ou `prompt` pour un pack à prompt libre)")
+    # Moins de questions que de champs : QualificationFlow complète par ses questions par défaut
+    return errors
+
+
+def bundle_version(sources: dict) -> str:
+    """Hash de version : dépend du format et du sha1 de chaque YAML source."""
+    raw = json.dumps([BUNDLE_FORMAT, sorted(sources.items())], separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def build_bundle(packs_dir: str) -> dict:
+    """
+    Lit et valide tous les YAML de `packs_dir`. Lève PackBundleError avec la liste
+    complète des erreurs ("fichier : erreur") si un seul pack est invalide.
+    """
+    import yaml
+
+    sources, packs, errors = {}, {}, []
+    for name in pack_names(packs_dir):
+        path = os.path.join(packs_dir, f"{name}.yaml")
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            data = yaml.safe_load(raw.decode("utf-8"))
+        except (UnicodeDecodeError, yaml.YAMLError) as e:
+            errors.append(f"{name}.yaml : YAML invalide ({e})")
+            continue
+        problems = validate_pack(data)
+        if problems:
+            errors.extend(f"{name}.yaml : {p}" for p in problems)
+            continue
+        sources[name] = hashlib.sha1(raw).hexdigest()
+        packs[name] = data
+    if errors:
+        raise PackBundleError(f"{len(errors)} erreur(s) de schéma dans {packs_dir}", errors)
+    return {"format": BUNDLE_FORMAT, "version": bundle_version(sources), "sources": sources, "packs": packs}
+
+
+def dump_bundle(bundle: dict) -> bytes:
+    return json.dumps(bundle, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def load_bundle(path: str) -> dict:
+    """Bundle lu en une seule lecture. Lève OSError si absent, PackBundleError s'il est invalide."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        bundle = json.loads(raw)
+    except ValueError as e:
+        raise PackBundleError(f"{path} : JSON invalide ({e})")
+    if not isinstance(bundle, dict) or bundle.get("format") != BUNDLE_FORMAT:
+        raise PackBundleError(f"{path} : format {bundle.get('format') if isinstance(bundle, dict) else '?'} "
+                              f"au lieu de {BUNDLE_FORMAT}")
+    sources, packs = bundle.get("sources"), bundle.get("packs")
+    if not isinstance(sources, dict) or not isinstance(packs, dict) or set(sources) != set(packs):
+        raise PackBundleError(f"{path} : sources/packs incohérents")
+    if bundle.get("version") != bundle_version(sources):
+        raise PackBundleError(f"{path} : version {bundle.get('version')} ne correspond pas aux sources")
+    return bundle
+
+
+def stale_packs(bundle: dict, packs_dir: str) -> list[str]:
+    """Packs ajoutés, supprimés ou modifiés depuis la construction du bundle."""
+    current = {}
+    for name in pack_names(packs_dir):
+        try:
+            current[name] = file_sha1(os.path.join(packs_dir, f"{name}.yaml"))
+        except OSError:
+            continue
+    sources = bundle.get("sources") or {}
+    return sorted(n for n in set(current) | set(sources) if current.get(n) != sources.get(n))
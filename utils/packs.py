@@ -0,0 +1,173 @@
+# utils/packs.py — registre des packs métier (bundle précompilé, ou YAML en dev) + cache des prompts compilés
+
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils.pack_bundle import PackBundleError, load_bundle, pack_names, stale_packs
+
+
+def profile_hash(profile: dict) -> str:
+    """Empreinte stable d'un profil établissement (ordre des clés ignoré)."""
+    raw = json.dumps(profile or {}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class PackRegistry:
+    """
+    Packs métier + LRU borné des prompts système compilés, clé = (pack, hash du
+    profil, message d'accueil).
+
+    Production : tous les packs viennent de `bundle_path` (construit et validé par
+    scripts/build_packs.py), lu en une seule fois, sans PyYAML ni stat par requête.
+    Mode `dev` (ou bundle absent/invalide) : lecture des YAML de `packs_dir`, un
+    fichier n'étant relu que si son mtime a changé.
+    """
+
+    def __init__(self, packs_dir: str, max_prompts: int = 512, bundle_path: str | None = None,
+                 dev: bool = False):
+        self.packs_dir = packs_dir
+        self.max_prompts = max_prompts
+        self.bundle_path = bundle_path
+        self.dev = dev
+        self.version = ""
+        self._loaded = False
+        self._from_bundle = False
+        self._packs: dict[str, tuple[float, dict]] = {}
+        self._prompts: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.packs_dir, f"{name}.yaml")
+
+    def _read(self, path: str) -> dict:
+        import yaml  # mode dev ou bundle indisponible uniquement
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f) or {}
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def _load_bundle(self) -> bool:
+        try:
+            bundle = load_bundle(self.bundle_path)
+        except (OSError, PackBundleError) as e:
+            print(f"[PACKS][BUNDLE] {e} — lecture des YAML de {self.packs_dir}")
+            return False
+        with self._lock:
+            self._packs = {name: (0.0, data) for name, data in bundle["packs"].items()}
+            self._from_bundle = True
+            self.version = bundle["version"]
+        return True
+
+    def load_all(self) -> int:
+        """Précharge tous les packs (bundle, ou YAML du dossier). Retourne le nombre de packs chargés."""
+        with self._load_lock:
+            self._load()
+        return len(self._packs)
+
+    def _load(self):
+        # `_loaded` n'est levé qu'une fois le registre rempli : un appelant concurrent attend
+        # le verrou au lieu de lire un registre vide, et un échec sera retenté
+        if self.bundle_path and not self.dev and self._load_bundle():
+            self._loaded = True
+            return
+        if self.dev and self.bundle_path:
+            try:
+                stale = stale_packs(load_bundle(self.bundle_path), self.packs_dir)
+            except (OSError, PackBundleError):
+                stale = ["(bundle absent)"]
+            if stale:
+                print(f"[PACKS][DEV] bundle à reconstruire (scripts/build_packs.py) : {', '.join(stale)}")
+        for name in pack_names(self.packs_dir):
+            self._get_file(name)
+        # Ni bundle ni YAML : rien à garder, on retentera au prochain appel
+        self._loaded = bool(self._packs)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self._load()
+
+    def names(self) -> list[str]:
+        self._ensure_loaded()
+        return sorted(self._packs)
+
+    def get(self, name: str) -> dict | None:
+        """Renvoie le contenu du pack (dict) ou None s'il n'existe pas."""
+        if not name or "/" in name or "\\" in name:
+            return None
+        self._ensure_loaded()
+        if self._from_bundle:
+            cached = self._packs.get(name)
+            return cached[1] if cached else None
+        return self._get_file(name)
+
+    def _get_file(self, name: str) -> dict | None:
+        """Pack lu depuis son YAML, relu seulement si le mtime a changé."""
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            with self._lock:
+                if self._packs.pop(name, None) is not None:
+                    self._drop_prompts(name)
+            return None
+        cached = self._packs.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        data = self._read(path)
+        with self._lock:
+            if cached:
+                self.reloads += 1
+                self._drop_prompts(name)
+            self._packs[name] = (mtime, data)
+        return data
+
+    def _drop_prompts(self, name: str):
+        for k in [k for k in self._prompts if k[0] == name]:
+            self._prompts.pop(k, None)
+
+    def system_prompt(self, name: str, profile: dict, greeting: str, render) -> str:
+        """
+        Prompt compilé depuis le cache, sinon `render(pack_data_ou_None, profile, greeting)`.
+        """
+        data = self.get(name)
+        key = (name, profile_hash(profile), greeting or "")
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is not None:
+                self._prompts.move_to_end(key)
+                self.hits += 1
+                return prompt
+            self.misses += 1
+        prompt = render(data, profile, greeting)
+        with self._lock:
+            self._prompts[key] = prompt
+            self._prompts.move_to_end(key)
+            while len(self._prompts) > self.max_prompts:
+                self._prompts.popitem(last=False)
+        return prompt
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "source": "bundle" if self._from_bundle else "yaml",
+            "version": self.version,
+            "packs": len(self._packs),
+            "prompts": len(self._prompts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,126 @@
+# utils/provisioning.py — import en masse de bots (JSON Lines / CSV) : validation ligne à ligne, écriture groupée
+
+from __future__ import annotations
+
+import io
+import re
+import csv
+import json
+import time
+
+EMAIL_RE = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]{2,}$")
+COLOR_RE = re.compile(r"^#[0-9A-Fa-f]{6}$")
+PUBLIC_ID_RE = re.compile(r"^[A-Za-z0-9_-]{3,64}$")
+AVATAR_RE = re.compile(r"^[A-Za-z0-9_.-]{1,80}$")
+# Bots modèles historiques (même bot_key que le parcours /inscription)
+PACK_BOT_KEYS = {"avocat": "avocat-001", "immo": "immo-002", "medecin": "medecin-003"}
+
+
+def parse_rows(data: str, fmt: str = "jsonl"):
+    """(numéro de ligne, dict | None, erreur | None) pour chaque ligne non vide."""
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(data))
+        for row in reader:
+            if not any((v or "").strip() for v in row.values() if isinstance(v, str)):
+                continue
+            yield reader.line_num, {k.strip(): (v or "").strip() for k, v in row.items() if k}, None
+        return
+    for n, line in enumerate(data.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield n, None, f"JSON invalide ({e.msg})"
+            continue
+        if not isinstance(row, dict):
+            yield n, None, "objet JSON attendu"
+            continue
+        yield n, row, None
+
+
+class BotImporter:
+    """
+    Valide des lignes {email, pack, name?, color?, avatar_file?, greeting?, contact?, owner_name?, public_id?}
+    avec les mêmes règles que le parcours /inscription (`parse_contact` pour le profil,
+    `gen_public_id` pour l'identifiant), puis écrit toutes les lignes valides d'un coup
+    via `write(bots)` (un executemany, une transaction) ; `known_pack(nom)` dit si le
+    pack existe. Les lignes invalides sont rapportées avec leur numéro et n'empêchent
+    pas l'import des autres.
+    """
+
+    def __init__(self, write, parse_contact, gen_public_id, known_pack, templates: dict, max_rows: int = 10000):
+        self.write = write
+        self.parse_contact = parse_contact
+        self.gen_public_id = gen_public_id
+        self.known_pack = known_pack
+        self.templates = templates
+        self.max_rows = max_rows
+
+    def validate(self, row: dict) -> tuple[dict | None, str | None]:
+        email = str(row.get("email") or row.get("buyer_email") or "").strip()
+        pack = str(row.get("pack") or "").strip().lower()
+        if not EMAIL_RE.match(email):
+            return None, "email invalide ou manquant"
+        if not self.known_pack(pack):
+            return None, f"pack inconnu : {pack or '(vide)'}"
+        color = str(row.get("color") or "").strip()
+        if color and not COLOR_RE.match(color):
+            return None, f"couleur invalide : {color}"
+        avatar = str(row.get("avatar_file") or row.get("avatar") or "").strip()
+        if avatar and not AVATAR_RE.match(avatar):
+            return None, f"avatar invalide : {avatar}"
+
+        bot_key = PACK_BOT_KEYS.get(pack, pack)
+        public_id = str(row.get("public_id") or "").strip() or self.gen_public_id(email, bot_key)
+        if not PUBLIC_ID_RE.match(public_id):
+            return None, f"public_id invalide : {public_id}"
+
+        base = self.templates.get(bot_key) or {}
+        return {
+            "public_id": public_id,
+            "bot_key": bot_key,
+            "pack": pack,
+            "name": str(row.get("name") or "").strip()[:120] or base.get("name") or f"Betty Bot ({pack})",
+            "color": color or base.get("color") or "#4F46E5",
+            "avatar_file": avatar or base.get("avatar_file") or "logo-Betty.png",
+            "greeting": str(row.get("greeting") or "").strip()[:500],
+            "buyer_email": email,
+            "owner_name": str(row.get("owner_name") or "").strip()[:120] or email.split("@")[0].title(),
+            "profile": self.parse_contact(str(row.get("contact") or "")[:2000]),
+        }, None
+
+    def run(self, data: str, fmt: str = "jsonl", dry_run: bool = False) -> dict:
+        """Valide puis écrit. Renvoie le rapport (compteurs, erreurs par ligne, débit)."""
+        t0 = time.perf_counter()
+        bots, errors, seen = [], [], {}
+        received = 0
+        for line, row, error in parse_rows(data, fmt):
+            received += 1
+            if received > self.max_rows:
+                errors.append({"line": line, "error": f"limite de {self.max_rows} lignes atteinte"})
+                break
+            if error is None:
+                bot, error = self.validate(row)
+            if error is None and bot["public_id"] in seen:
+                error = f"public_id en double (ligne {seen[bot['public_id']]})"
+            if error:
+                errors.append({"line": line, "error": error})
+                continue
+            seen[bot["public_id"]] = line
+            bots.append(bot)
+        t_valid = time.perf_counter()
+        written = 0 if dry_run or not bots else self.write(bots)
+        elapsed = time.perf_counter() - t0
+        return {
+            "received": received,
+            "valid": len(bots),
+            "written": written,
+            "dry_run": dry_run,
+            "errors": errors,
+            "public_ids": [b["public_id"] for b in bots],
+            "validate_ms": round((t_valid - t0) * 1000, 1),
+            "write_ms": round((elapsed - (t_valid - t0)) * 1000, 1),
+            "rows_per_s": round(len(bots) / elapsed, 1) if elapsed > 0 and bots else 0.0,
+        }
@@ -0,0 +1,85 @@
+# utils/qualification.py — parcours de qualification par pack (mandatory_fields / questions du YAML)
+
+from __future__ import annotations
+
+# Champs YAML -> clés du lead extraites par LeadState
+FIELD_ALIASES = {
+    "nom": "name", "name": "name", "nom_complet": "name",
+    "telephone": "phone", "téléphone": "phone", "tel": "phone", "phone": "phone",
+    "email": "email", "mail": "email", "e-mail": "email",
+    "besoin": "reason", "motif": "reason", "besoin_principal": "reason", "objectif": "reason",
+    "disponibilite": "availability", "disponibilité": "availability", "preference_horaire": "availability",
+}
+
+# Questions par défaut (packs sans mandatory_fields : avocat, immo, medecin…)
+DEFAULT_QUESTIONS = {
+    "name":  "Pour commencer, quel est votre nom et prénom complets ?",
+    "phone": "Merci. Quel est votre numéro de téléphone ?",
+    "email": "Parfait. Quelle est votre adresse e-mail ?",
+    "reason": "Pouvez-vous décrire votre besoin en quelques mots ?",
+    "availability": "Quelles sont vos disponibilités pour être rappelé ?",
+}
+DEFAULT_ORDER = ("name", "phone", "email")
+DEFAULT_DONE = "Parfait, je transmets vos coordonnées pour vous proposer un rendez-vous."
+
+
+class QualificationFlow:
+    """
+    Machine à états compilée : la prochaine question est celle de la première
+    étape dont le champ est encore vide dans le lead. Plus d'étape => terminé.
+    `skipped` liste les champs obligatoires du YAML non extractibles automatiquement
+    (adresse, date…), laissés à la conversation.
+    """
+
+    __slots__ = ("steps", "done_message", "skipped")
+
+    def __init__(self, steps, done_message: str = DEFAULT_DONE, skipped=()):
+        self.steps = tuple(steps)
+        self.done_message = done_message
+        self.skipped = tuple(skipped)
+
+    def next_step(self, lead: dict) -> tuple[str, str] | None:
+        for key, question in self.steps:
+            if not (lead or {}).get(key):
+                return key, question
+        return None
+
+    @classmethod
+    def from_pack(cls, pack_data: dict | None) -> "QualificationFlow":
+        data = pack_data or {}
+        fields = data.get("mandatory_fields") or []
+        if not fields:
+            return DEFAULT_FLOW
+        questions = data.get("questions") or []
+        steps, seen, skipped = [], set(), []
+        # Les questions du YAML sont alignées sur l'ordre des mandatory_fields
+        for i, field in enumerate(fields):
+            key = FIELD_ALIASES.get(str(field).strip().lower())
+            if not key:
+                skipped.append(field)
+                continue
+            if key in seen:
+                continue
+            seen.add(key)
+            question = questions[i] if i < len(questions) and questions[i] else DEFAULT_QUESTIONS[key]
+            steps.append((key, str(question).strip()))
+        # Les coordonnées restent indispensables à l'envoi du lead
+        for key in DEFAULT_ORDER:
+            if key not in seen:
+                steps.append((key, DEFAULT_QUESTIONS[key]))
+        return cls(steps, data.get("done_message") or DEFAULT_DONE, skipped)
+
+
+DEFAULT_FLOW = QualificationFlow([(k, DEFAULT_QUESTIONS[k]) for k in DEFAULT_ORDER])
+_flows: dict[str, tuple[dict, QualificationFlow]] = {}
+
+def flow_for_pack(name: str, pack_data: dict | None) -> QualificationFlow:
+    """Parcours compilé une fois par pack ; recompilé si le registre a rechargé le YAML."""
+    if not pack_data or not pack_data.get("mandatory_fields"):
+        return DEFAULT_FLOW
+    cached = _flows.get(name)
+    if cached and cached[0] is pack_data:
+        return cached[1]
+    flow = QualificationFlow.from_pack(pack_data)
+    _flows[name] = (pack_data, flow)
+    return flow
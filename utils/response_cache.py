@@ -0,0 +1,121 @@
+# utils/response_cache.py — cache des réponses LLM par pack (questions fréquentes, quasi-doublons)
+
+from __future__ import annotations
+
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+_PERSONAL_RE = re.compile(r"@|\d{4,}")
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces réduits."""
+    t = unicodedata.normalize("NFKD", (text or "").lower())
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    t = _PUNCT_RE.sub(" ", t)
+    return _SPACE_RE.sub(" ", t).strip()
+
+
+def trigrams(norm: str) -> frozenset:
+    padded = f" {norm} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ResponseCache:
+    """
+    Réponses indexées par (pack, empreinte du profil, texte normalisé), TTL + LRU.
+    Sans correspondance exacte, on cherche le quasi-doublon le plus proche du même
+    pack/profil (similarité de Jaccard sur les trigrammes de caractères >= `similarity`).
+    Les messages contenant des coordonnées (email, numéros) ne sont jamais cachés.
+    """
+
+    def __init__(self, max_items: int = 2048, ttl: float = 6 * 3600, similarity: float = 0.8,
+                 max_len: int = 200):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.similarity = similarity
+        self.max_len = max_len
+        self._data: OrderedDict = OrderedDict()   # (pack, profile, norm) -> (expires, grams, response)
+        self._buckets: dict[tuple, set] = {}      # (pack, profile) -> {norm}
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+
+    def cacheable(self, text: str) -> bool:
+        return bool(text) and len(text) <= self.max_len and not _PERSONAL_RE.search(text)
+
+    def _count(self, pack: str, field: str):
+        s = self._stats.setdefault(pack, {"hits": 0, "near_hits": 0, "misses": 0})
+        s[field] += 1
+
+    def _drop(self, key):
+        self._data.pop(key, None)
+        bucket = self._buckets.get(key[:2])
+        if bucket is not None:
+            bucket.discard(key[2])
+            if not bucket:
+                del self._buckets[key[:2]]
+
+    def get(self, pack: str, profile_key: str, text: str) -> str | None:
+        norm = normalize(text)
+        if not norm:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            key = (pack, profile_key, norm)
+            item = self._data.get(key)
+            if item and item[0] >= now:
+                self._data.move_to_end(key)
+                self._count(pack, "hits")
+                return item[2]
+            if item:
+                self._drop(key)
+
+            # Quasi-doublon : meilleur score dans le même pack/profil
+            grams = trigrams(norm)
+            best, best_score = None, self.similarity
+            for other in list(self._buckets.get((pack, profile_key), ())):
+                okey = (pack, profile_key, other)
+                expires, ograms, _ = self._data[okey]
+                if expires < now:
+                    self._drop(okey)
+                    continue
+                score = len(grams & ograms) / (len(grams | ograms) or 1)
+                if score >= best_score:
+                    best, best_score = okey, score
+            if best is not None:
+                self._data.move_to_end(best)
+                self._count(pack, "near_hits")
+                return self._data[best][2]
+            self._count(pack, "misses")
+            return None
+
+    def set(self, pack: str, profile_key: str, text: str, response: str):
+        norm = normalize(text)
+        if not norm or not response:
+            return
+        key = (pack, profile_key, norm)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, trigrams(norm), response)
+            self._data.move_to_end(key)
+            self._buckets.setdefault(key[:2], set()).add(norm)
+            while len(self._data) > self.max_items:
+                self._drop(next(iter(self._data)))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_pack = {}
+            for pack, s in self._stats.items():
+                total = s["hits"] + s["near_hits"] + s["misses"]
+                hit_ratio = round((s["hits"] + s["near_hits"]) / total, 4) if total else 0.0
+                per_pack[pack] = {**s, "hit_ratio": hit_ratio}
+            return {"size": len(self._data), "packs": per_pack}
@@ -0,0 +1,73 @@
+# utils/singleflight.py — regroupement des requêtes identiques en cours (un seul appel amont)
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+def turn_key(conv_id: str, message: str) -> str:
+    """Clé d'un tour de conversation : conversation + empreinte du message."""
+    digest = hashlib.sha1((message or "").strip().encode("utf-8")).hexdigest()[:16]
+    return f"{conv_id}:{digest}"
+
+
+class StillRunning(Exception):
+    """Un doublon a attendu plus que son délai : le tour de référence n'est pas terminé."""
+
+
+class SingleFlight:
+    """
+    Le premier appelant d'une clé exécute le travail ; les appelants concurrents de
+    la même clé attendent son résultat (ou son exception) au lieu de le refaire.
+    La clé est libérée dès la fin : un envoi ultérieur est un nouveau tour.
+
+    Le résultat est porté par un `concurrent.futures.Future` : attente bloquante
+    côté WSGI (`future.result()`), `asyncio.wrap_future()` côté ASGI.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def begin(self, key: str) -> tuple[Future, bool]:
+        """(future, True) si l'appelant doit faire le travail puis appeler `finish`."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def finish(self, key: str, future: Future, result=None, error: BaseException | None = None):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn, timeout: float | None = None):
+        """Résultat du tour ; StillRunning si l'on n'est qu'un doublon et que `timeout` expire."""
+        future, leader = self.begin(key)
+        if not leader:
+            try:
+                return future.result(timeout)
+            except FutureTimeout:
+                raise StillRunning(key) from None
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}